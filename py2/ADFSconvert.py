@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+
+"""
+ADFSconvert.py - Convert the contents of ADFS disc images to other formats.
+
+Copyright (C) 2026 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "David Boddie <david@boddie.org.uk>"
+__date__ = "2026-10-19"
+__version__ = "0.1"
+__license__ = "GNU General Public License (version 3 or later)"
+
+from ADFSlib import ADFSdirectory
+from diskutils import DiskError
+import makedfs, UEFfile
+
+
+def walk(objects, path = "$"):
+
+    """Yields (path, file) tuples for each ADFSfile in the list of objects and
+    the directories it contains, in catalogue order. The path of each file
+    includes the names of the directories containing it."""
+    
+    for obj in objects:
+    
+        obj_path = path + "." + obj.name
+        
+        if isinstance(obj, ADFSdirectory):
+            for item in walk(obj.files, obj_path):
+                yield item
+        else:
+            yield obj_path, obj
+
+
+def tape_files(disc, files = None):
+
+    """Yields (name, load, exec, data) tuples for the files in the disc, or in
+    the list of files and directories given, suitable for passing to the
+    UEFfile.import_files method. Tape file names are limited to ten
+    characters."""
+    
+    if files is None:
+        files = disc.files
+    
+    for path, obj in walk(files):
+        yield (obj.name[:10], obj.load_address, obj.execution_address, obj.data)
+
+
+def to_uef(disc, uef = None, files = None, gap = True):
+
+    """uef = to_uef(disc, uef = None, files = None, gap = True)
+    
+    Adds the files in the ADFSdisc, or the files and directories in the files
+    list, to the end of a UEFfile object as tape files, creating a new object
+    if uef is None, and returns the UEFfile. The files in directories are
+    included in catalogue order. Each file is preceded by a gap if gap is
+    True.
+    
+    The file data is passed directly from the disc to the UEF encoder, so no
+    temporary files are needed.
+    """
+    
+    if uef is None:
+        uef = UEFfile.UEFfile(creator = "ADFSconvert " + __version__)
+        uef.minor = 6
+        uef.target_machine = "Electron"
+    
+    infos = list(tape_files(disc, files))
+    if infos:
+        uef.import_files(len(uef.contents), infos, gap)
+    
+    return uef
+
+
+def dfs_name(path):
+
+    """Returns the DFS name corresponding to the ADFS path given. Files in the
+    root directory are placed in the $ directory. Files in other directories
+    are placed in the DFS directory named after the first character of the
+    directory containing them. Leaf names are limited to seven characters."""
+    
+    pieces = path.split(".")
+    
+    if len(pieces) > 2:
+        directory = pieces[-2][:1].upper()
+    else:
+        directory = "$"
+    
+    return directory + "." + pieces[-1][:7]
+
+
+def dfs_files(disc, files = None):
+
+    """Returns a list of makedfs File objects for the files in the disc, or in
+    the list of files and directories given. A DiskError is raised if two
+    files would have the same name on a DFS disk."""
+    
+    if files is None:
+        files = disc.files
+    
+    dfs_files = []
+    names = {}
+    
+    for path, obj in walk(files):
+    
+        name = dfs_name(path)
+        key = name.upper()
+        
+        if names.has_key(key):
+            raise DiskError("Files %s and %s would both be stored as %s." % (
+                names[key], path, name))
+        
+        names[key] = path
+        dfs_files.append(makedfs.File(name, obj.data, obj.load_address,
+                                      obj.execution_address, obj.length))
+    
+    return dfs_files
+
+
+def to_dfs(disc, format = None, files = None, title = None):
+
+    """disk = to_dfs(disc, format = None, files = None, title = None)
+    
+    Creates a new makedfs Disk object in the given format containing the files
+    in the ADFSdisc, or the files and directories in the files list, and
+    returns it. The disk title is taken from the name of the disc if no title
+    is given. The image can be obtained by reading the disk's file attribute.
+    
+    A DiskError is raised if the files cannot be stored on the disk.
+    """
+    
+    if title is None:
+        title = disc.disc_name
+        if title == "Untitled":
+            title = ""
+    
+    disk = makedfs.Disk(format)
+    disk.new()
+    disk.catalogue().write(title[:12], dfs_files(disc, files))
+    disk.file.seek(0, 0)
+    
+    return disk
@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+
+"""
+ADFSdefrag.py - Analyse fragmentation in ADFS disc images and compact them.
+
+Copyright (C) 2026 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "David Boddie <david@boddie.org.uk>"
+__date__ = "2026-10-19"
+__version__ = "0.1"
+__license__ = "GNU General Public License (version 3 or later)"
+
+import ADFSlib, makeadfs
+from ADFSlib import Utilities
+from diskutils import open_image
+
+
+class Fragmentation(Utilities):
+
+    """fragmentation = Fragmentation(path = None)
+    
+    Contains the results of analysing the disc image with the given path. The
+    objects attribute contains a list of (path, fragments) tuples giving the
+    number of fragments used to store each file, in the order of the paths.
+    The free attribute contains a list of (start, end) tuples giving the
+    addresses in bytes of the extents of free space, in address order.
+    """
+    
+    def __init__(self, path = None):
+    
+        self.path = path
+        self.format = None
+        self.objects = []
+        self.free = []
+    
+    def fragmented(self):
+    
+        """Returns a list of the (path, fragments) tuples for the files that
+        are stored in more than one fragment."""
+        
+        return [(path, n) for path, n in self.objects if n > 1]
+    
+    def fragments(self):
+    
+        """Returns the total number of fragments used to store files."""
+        
+        return sum([n for path, n in self.objects])
+    
+    def free_space(self):
+    
+        """Returns the total amount of free space in bytes."""
+        
+        return sum([end - start for start, end in self.free])
+    
+    def largest_free(self):
+    
+        """Returns the length in bytes of the largest free extent, or zero if
+        there is no free space."""
+        
+        if not self.free:
+            return 0
+        
+        return max([end - start for start, end in self.free])
+    
+    def free_fragmentation(self):
+    
+        """Returns a value between 0 and 1 describing how fragmented the free
+        space is. This is zero if all the free space is in one extent and
+        approaches one as the largest extent becomes a smaller part of it."""
+        
+        total = self.free_space()
+        if total == 0:
+            return 0.0
+        
+        return 1.0 - float(self.largest_free()) / total
+    
+    def summary(self):
+    
+        """Returns a line of text summarising the results."""
+        
+        files = len(self.objects)
+        extents = len(self.free)
+        fragmented = len(self.fragmented())
+        
+        text = self._plural(
+            "%i %s, %i %s", [files, extents],
+            [("files", "file", "files"),
+             ("free extents", "free extent", "free extents")]
+            )
+        
+        return text + " (%i fragmented, %i bytes free, largest %i bytes, " \
+                      "%i%% free space fragmentation)" % (
+            fragmented, self.free_space(), self.largest_free(),
+            int(self.free_fragmentation() * 100 + 0.5))
+    
+    def as_dict(self):
+    
+        """Returns a dictionary describing the results, suitable for encoding
+        as JSON."""
+        
+        return {"path": self.path, "format": self.format,
+                "files": len(self.objects), "fragments": self.fragments(),
+                "fragmented": [{"path": path, "fragments": n}
+                               for path, n in self.fragmented()],
+                "free space": self.free_space(),
+                "free extents": len(self.free),
+                "largest free extent": self.largest_free(),
+                "free fragmentation": self.free_fragmentation()}
+
+
+def _count_fragments(disc_map, obj):
+
+    # Return the number of fragments of a file on a disc with a new map,
+    # using the pieces of the map entry given by its SIN that are needed to
+    # hold its data. The low byte of the SIN is the sector offset plus one
+    # of a file that shares its fragment with others.
+    
+    if obj.length == 0:
+        return 0
+    
+    pieces = disc_map._find_in_new_map(obj.addr >> 8)
+    offset = obj.addr & 0xff
+    if offset != 0:
+        offset = (offset - 1) * disc_map.sector_size
+    
+    remaining = obj.length
+    fragments = 0
+    
+    for start, end in pieces:
+    
+        if remaining <= 0:
+            break
+        
+        if fragments == 0:
+            start = start + offset
+        
+        remaining = remaining - (end - start)
+        fragments += 1
+    
+    return fragments
+
+
+def _walk(objects, prefix):
+
+    for obj in objects:
+    
+        path = prefix + obj.name
+        
+        if isinstance(obj, ADFSlib.ADFSdirectory):
+            for item in _walk(obj.files, path + "."):
+                yield item
+        else:
+            yield path, obj
+
+
+def analyse(disc, path = None):
+
+    """fragmentation = analyse(disc, path = None)
+    
+    Returns a Fragmentation object describing the files and free space of
+    the ADFSdisc object given. Files on discs that use the old map are always
+    stored in a single fragment, so only their free space can be fragmented.
+    """
+    
+    report = Fragmentation(path)
+    report.format = disc.disc_type
+    
+    if hasattr(disc, "old_map"):
+    
+        for name, obj in _walk(disc.files, "$."):
+            report.objects.append((name, min(obj.length, 1)))
+        
+        free = disc.old_map.free()
+    
+    else:
+    
+        for name, obj in _walk(disc.files, "$."):
+            report.objects.append((name, _count_fragments(disc.disc_map, obj)))
+        
+        free = disc.disc_map.free()
+    
+    report.free = free.extents()
+    return report
+
+
+def analyse_image(path):
+
+    """fragmentation = analyse_image(path)
+    
+    Returns a Fragmentation object describing the disc image with the given
+    path, which may be compressed. An ADFS_exception is raised if the image
+    cannot be read.
+    """
+    
+    f = open_image(path)
+    try:
+        return analyse(ADFSlib.ADFSdisc(f), path)
+    finally:
+        f.close()
+
+
+def compact(disc, format = None):
+
+    """image = compact(disc, format = None)
+    
+    Returns the contents of a new disc image containing the files in the
+    ADFSdisc object given, stored in as few fragments as possible with the
+    free space gathered at the end of each zone of the disc. The image has
+    the same format as the original disc unless another format is given.
+    The title, boot option and disc ID of the original disc are preserved.
+    A DiskError is raised if the files cannot be stored in the new image.
+    """
+    
+    if hasattr(disc, "old_map"):
+        boot_option = disc.old_map.boot_option
+        disc_id = disc.old_map.disc_id
+    else:
+        boot_option = disc.record["boot option"]
+        disc_id = disc.record["disc ID"]
+    
+    if format is None:
+        format = disc.disc_type
+    
+    return makeadfs.create_image(disc.files, format, disc.disc_name,
+                                 boot_option, disc_id)
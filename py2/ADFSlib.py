@@ -25,7 +25,9 @@ __version__ = "0.42"
 __license__ = "GNU General Public License (version 3)"
 
 
-import os, string, struct, time
+import os, re, string, struct, time
+from diskutils import FreeSpace, Geometry, Index, SectorView, wildcard
+import INFfile
 
 
 INFORM = 0
@@ -227,6 +229,20 @@ class Utilities:
                 )
         
         return name
+    
+    def _directory(self, name, read_catalogue, address):
+    
+        # Return a directory whose contents are read from the given address
+        # using the read_catalogue method. When verifying the disc, the
+        # contents are read immediately so that any problems are logged;
+        # otherwise they are only read when first needed.
+        if self.verify:
+            return ADFSdirectory(name, read_catalogue(address)[1])
+        
+        directory = ADFSdirectory(name,
+            loader = lambda: read_catalogue(address)[1])
+        directory.source = self.sectors
+        return directory
 
 
 class ADFS_exception(Exception):
@@ -236,16 +252,56 @@ class ADFS_exception(Exception):
 
 class ADFSdirectory:
 
-    """directory = ADFSdirectory(name, files)
+    """directory = ADFSdirectory(name, files = None, loader = None)
     
     The directory created contains name and files attributes containing the
     directory name and the objects it contains.
+    
+    If a loader is given instead of a list of files, it is called without
+    arguments to obtain the list of files when the files attribute is first
+    accessed. The source attribute refers to the disc image data that the
+    loader reads, if known, or None.
     """
     
-    def __init__(self, name, files):
+    def __init__(self, name, files = None, loader = None):
     
         self.name = name
-        self.files = files
+        self._loader = loader
+        self._index = None
+        self.source = None
+        
+        if loader is None:
+            if files is None:
+                files = []
+            self.files = files
+    
+    def __getattr__(self, name):
+    
+        # Only called for attributes that have not been set, so this is used
+        # to read the files in the directory on demand.
+        if name == "files" and self.__dict__.get("_loader") is not None:
+        
+            self.files = self._loader()
+            self._loader = None
+            return self.files
+        
+        raise AttributeError, name
+    
+    def loaded(self):
+    
+        """Returns True if the files in the directory have been read."""
+        
+        return self.__dict__.has_key("files")
+    
+    def index(self):
+    
+        """Returns an Index of the objects in the directory, reading them if
+        necessary, which can be used to find objects by name."""
+        
+        if self._index is None:
+            self._index = Index(self.files)
+        
+        return self._index
     
     def __repr__(self):
     
@@ -254,16 +310,49 @@ class ADFSdirectory:
 
 class ADFSfile:
 
-    """file = ADFSfile(name, data, load_address, execution_address, length)
+    """file = ADFSfile(name, data, load_address, execution_address, length,
+                       reader = None)
+    
+    If a reader is given instead of the file's data, it is called without
+    arguments to obtain the data when the data attribute is first accessed.
+    The source attribute refers to the disc image data that the reader
+    reads, if known, or None.
+    
+    The access attribute contains the file's access flags, using the values
+    found in .inf files, or None if they are not known.
     """
     
-    def __init__(self, name, data, load_address, execution_address, length):
+    def __init__(self, name, data, load_address, execution_address, length,
+                       reader = None):
     
         self.name = name
-        self.data = data
+        self._reader = reader
         self.load_address = load_address
         self.execution_address = execution_address
         self.length = length
+        self.access = None
+        self.source = None
+        
+        if reader is None:
+            self.data = data
+    
+    def __getattr__(self, name):
+    
+        # Only called for attributes that have not been set, so this is used
+        # to read the file's data on demand.
+        if name == "data" and self.__dict__.get("_reader") is not None:
+        
+            self.data = self._reader()
+            self._reader = None
+            return self.data
+        
+        raise AttributeError, name
+    
+    def loaded(self):
+    
+        """Returns True if the file's data has been read."""
+        
+        return self.__dict__.has_key("data")
     
     def __repr__(self):
     
@@ -306,6 +395,232 @@ class ADFSfile:
             return ()
 
 
+class ADFSfilter:
+
+    """filter = ADFSfilter(patterns = None, regex = None, filetypes = None,
+                           min_length = None, max_length = None)
+    
+    Selects files using the information in the disc catalogue. A file is
+    accepted if it matches all of the criteria given:
+    
+    patterns is a list of wildcard patterns, one of which must match the file.
+    In each pattern, * matches any sequence of characters and # matches a
+    single character. Patterns containing a "." are matched against the
+    file's full path, such as "$.Games.Elite"; others are matched against its
+    name. Case is ignored.
+    
+    regex is a regular expression which must be found in the file's full path.
+    
+    filetypes is a list of file types, given as numbers or hexadecimal
+    strings such as "FFB", one of which the file must have.
+    
+    min_length and max_length limit the length of the file in bytes.
+    """
+    
+    def __init__(self, patterns = None, regex = None, filetypes = None,
+                       min_length = None, max_length = None):
+    
+        self.patterns = []
+        for pattern in patterns or []:
+        
+            if "." in pattern:
+                if pattern[:2] != "$.":
+                    pattern = "$." + pattern
+                self.patterns.append((True, wildcard(pattern)))
+            else:
+                self.patterns.append((False, wildcard(pattern)))
+        
+        if regex is not None and isinstance(regex, str):
+            regex = re.compile(regex)
+        self.regex = regex
+        
+        if filetypes is None:
+            self.filetypes = None
+        else:
+            self.filetypes = {}
+            for filetype in filetypes:
+                if isinstance(filetype, str):
+                    filetype = int(filetype, 16)
+                self.filetypes[filetype] = None
+        
+        self.min_length = min_length
+        self.max_length = max_length
+    
+    def matches(self, path, file):
+    
+        """Returns True if the ADFSfile with the given path is accepted by the
+        filter. The file's data is not read."""
+        
+        if self.patterns:
+        
+            for full_path, match in self.patterns:
+            
+                if full_path and match(path):
+                    break
+                elif not full_path and match(file.name):
+                    break
+            else:
+                return False
+        
+        if self.regex is not None and not self.regex.search(path):
+            return False
+        
+        if self.filetypes is not None:
+        
+            if not file.has_filetype():
+                return False
+            if not self.filetypes.has_key((file.load_address >> 8) & 0xfff):
+                return False
+        
+        if self.min_length is not None and file.length < self.min_length:
+            return False
+        
+        if self.max_length is not None and file.length > self.max_length:
+            return False
+        
+        return True
+
+
+def access_flags(atts):
+
+    """Returns the access flags used in .inf files for the attributes stored
+    in a directory entry. The read and write flags are the same in both, but
+    the locked flag is stored in bit 2 of the attributes and bit 3 of the
+    access flags."""
+    
+    return (atts & 0x03) | ((atts & 0x04) << 1)
+
+
+def old_map_checksum(sector):
+
+    """Returns the checksum of the 256 byte old map sector given, calculated
+    from its first 255 bytes in the way that ADFS does."""
+    
+    total = 255
+    
+    for i in range(254, -1, -1):
+    
+        if total > 255:
+            total = (total + 1) & 0xff
+        total += ord(sector[i])
+    
+    return total & 0xff
+
+
+def zone_check(zone):
+
+    """Returns the check byte for the new map zone given, calculated from all
+    of its bytes except the check byte itself, which is the first byte.
+    
+    RISC OS adds the bytes of the zone into four accumulators, each passing
+    its carry to the next and the last passing its carry back to the first,
+    then combines the accumulators with exclusive-or. This is equivalent to
+    adding the zone as 32-bit little-endian words with end-around carry, so
+    the whole zone is summed at once instead of a byte at a time.
+    """
+    
+    words = len(zone) >> 2
+    total = sum(struct.unpack("<%iI" % (words - 1), zone[4:words << 2]))
+    
+    # Fold the carries back into the lowest 32 bits, leaving a value of zero
+    # only if every word was zero.
+    if total != 0:
+        total = ((total - 1) % 0xffffffff) + 1
+    
+    # Add the first word of the zone, omitting the check byte. The final
+    # carry is discarded.
+    total = (total + (struct.unpack("<I", zone[:4])[0] & 0xffffff00)) & 0xffffffff
+    
+    return (total ^ (total >> 8) ^ (total >> 16) ^ (total >> 24)) & 0xff
+
+
+def old_map_problems(sectors):
+
+    """Returns a list of (address, message) tuples describing problems with
+    the checksums of the old map at the start of the disc image data given.
+    An empty list is returned if the checksums are correct."""
+    
+    problems = []
+    
+    for sector in 0, 1:
+    
+        data = sectors[sector * 256:(sector + 1) * 256]
+        stored = ord(data[255])
+        checksum = old_map_checksum(data)
+        
+        if checksum != stored:
+            problems.append((sector * 256 + 255,
+                "Map sector %i has checksum %02x but should have %02x" % (
+                sector, stored, checksum)))
+    
+    return problems
+
+
+def new_map_problems(sectors, header, zone_size, zones):
+
+    """Returns a list of (address, message) tuples describing problems with
+    the check bytes of the new map with the given number of zones, each of
+    zone_size bytes, starting at the header offset in the disc image data
+    given. An empty list is returned if the check bytes are correct.
+    
+    Each zone starts with a check byte calculated from the zone's contents,
+    and the cross check bytes in the fourth byte of each zone must combine
+    to give 0xff when exclusive-ored together.
+    """
+    
+    problems = []
+    cross_check = 0
+    
+    for i in range(zones):
+    
+        address = header + (i * zone_size)
+        zone = sectors[address:address + zone_size]
+        
+        if len(zone) < zone_size:
+            problems.append((address, "Zone %i lies beyond the end of the disc" % i))
+            return problems
+        
+        stored = ord(zone[0])
+        checksum = zone_check(zone)
+        
+        if checksum != stored:
+            problems.append((address,
+                "Zone %i has check byte %02x but should have %02x" % (
+                i, stored, checksum)))
+        
+        cross_check = cross_check ^ ord(zone[3])
+    
+    if zones > 0 and cross_check != 0xff:
+        problems.append((header + 3,
+            "Zone cross check bytes combine to give %02x instead of ff" % cross_check))
+    
+    return problems
+
+
+def zone_count_problems(zone, length):
+
+    """Returns a list of (address, message) tuples describing a problem with
+    the number of zones given in the disc record of the first zone of a new
+    map, which is 1024 bytes long, for a disc of the given length in bytes.
+    An empty list is returned if the number of zones is plausible.
+    
+    There must be at least one zone, and the zones before the last one must
+    not describe more of the disc than there is.
+    """
+    
+    zones = ord(zone[13])
+    zone_spare = struct.unpack("<H", zone[14:16])[0]
+    log2_bytes_per_bit = ord(zone[9])
+    
+    bits_per_zone = 8 * 1024 - zone_spare
+    disc_bits = length >> min(log2_bytes_per_bit, 31)
+    
+    if zones < 1 or bits_per_zone <= 0 or (zones - 1) * bits_per_zone >= disc_bits:
+        return [(13, "The disc record gives an invalid number of zones: %i" % zones)]
+    
+    return []
+
+
 class ADFSmap(Utilities):
 
     def __getitem__(self, index):
@@ -322,7 +637,8 @@ class ADFSnewMap(ADFSmap):
     dir_markers = ('Hugo', 'Nick')
     root_dir_address = 0x800
     
-    def __init__(self, header, begin, end, sectors, sector_size, record):
+    def __init__(self, header, begin, end, sectors, sector_size, record,
+                       verify = 0, verify_log = None):
     
         self.header = header
         self.begin = begin
@@ -331,9 +647,30 @@ class ADFSnewMap(ADFSmap):
         self.sector_size = sector_size
         self.record = record
         
+        # Log problems in the given list if the verify flag is set.
+        self.verify = verify
+        if verify_log is None:
+            verify_log = []
+        self.verify_log = verify_log
+        
+        # Check the zones before reading the map so that any problems with
+        # them are logged first.
+        if verify:
+            for address, message in self.check_zones():
+                self.verify_log.append((ERROR, message))
+        
         self.free_space = self._read_free_space()
         self.disc_map = self._read_disc_map()
     
+    def check_zones(self):
+    
+        """Returns a list of (address, message) tuples describing problems
+        with the check bytes of the zones in the map. An empty list is
+        returned if the check bytes are correct."""
+        
+        return new_map_problems(self.sectors, self.header, self.sector_size,
+                                self.record["zones"])
+    
     def _read_disc_map(self):
     
         # See ADFS/EMaps.htm, ADFS/EFormat.htm and ADFS/DiscMap.htm for details.
@@ -486,6 +823,18 @@ class ADFSnewMap(ADFSmap):
         
         return disc_map
     
+    def free(self):
+    
+        """Returns a FreeSpace object describing the free space in the map,
+        with addresses in bytes."""
+        
+        extents = []
+        for start, end in self.free_space:
+            extents.append((self.find_address_from_map(start, self.begin, 0),
+                            self.find_address_from_map(end, self.begin, 0)))
+        
+        return FreeSpace(extents)
+    
     def _read_free_space(self):
     
         free_space = []
@@ -644,7 +993,9 @@ class ADFSnewMap(ADFSmap):
                 
                     # Store a zero length file. This appears to be the
                     # standard behaviour for storing empty files.
-                    files.append(ADFSfile(name, "", load, exe, length))
+                    file_obj = ADFSfile(name, "", load, exe, length)
+                    file_obj.access = access_flags(newdiratts)
+                    files.append(file_obj)
             
             else:
             
@@ -656,31 +1007,22 @@ class ADFSnewMap(ADFSmap):
                     for start, end in inddiscadd:
                     
                         # Try to interpret the data at the referenced address
-                        # as a directory.
-                        
-                        lower_dir_name, lower_files = \
-                            self.read_catalogue(start)
-                        
-                        # Store the directory name and file found therein.
-                        files.append(ADFSdirectory(name, lower_files))
+                        # as a directory, storing the directory name and the
+                        # means to read the files found therein.
+                        files.append(
+                            self._directory(name, self.read_catalogue, start)
+                            )
                 
                 else:
                 
                     # Remember that inddiscadd will be a sequence of
-                    # pairs of addresses.
-                    
-                    file = ""
-                    remaining = length
-                    
-                    for start, end in inddiscadd:
-                    
-                        amount = min(remaining, end - start)
-                        file = file + self.sectors[start : (start + amount)]
-                        remaining = remaining - amount
+                    # pairs of addresses. The data is only read from them
+                    # when it is first needed.
                     
-                    file_obj = ADFSfile(name, file, load, exe, length)
+                    file_obj = self._file(name, inddiscadd, load, exe, length)
                     # Store the SIN (System Internal Number) for debugging.
                     file_obj.addr = self._str2num(3, self.sectors[head+p+22:head+p+25])
+                    file_obj.access = access_flags(newdiratts)
                     files.append(file_obj)
             
             p = p + 26
@@ -732,6 +1074,28 @@ class ADFSnewMap(ADFSmap):
         
         return dir_name, files
     
+    def _file(self, name, addresses, load, exe, length):
+    
+        # Return a file whose data is read from the sequence of (start, end)
+        # pairs of addresses given when it is first needed.
+        file_obj = ADFSfile(name, None, load, exe, length,
+            lambda: self._read_fragments(addresses, length))
+        file_obj.source = self.sectors
+        return file_obj
+    
+    def _read_fragments(self, addresses, length):
+    
+        pieces = []
+        remaining = length
+        
+        for start, end in addresses:
+        
+            amount = min(remaining, end - start)
+            pieces.append(self.sectors[start : (start + amount)])
+            remaining = remaining - amount
+        
+        return "".join(pieces)
+    
     def _read_new_address(self, s):
     
         # From the three character string passed, determine the address on the
@@ -785,17 +1149,16 @@ class ADFSbigNewMap(ADFSnewMap):
     
     def find_address_from_map(self, addr, begin, entry):
     
-        # I can't remember where the rationale for this calculation
-        # came from or where the necessary information was obtained.
-        # It probably came from one of the WSS files, such as
-        # Formats.htm or Formats2.htm which imply that the F format
-        # uses 512 byte sectors (see the 0x200 value below) and
-        # indicate that F format uses 4 zones rather than 1.
+        # Each byte of an F format map describes 0x200 bytes of the disc, and
+        # each of the four zones ends with 0xc8 spare bytes. Fragments cannot
+        # cross zone boundaries, so the zone is found from the byte before
+        # the address given, which is either the start of a fragment or the
+        # byte after its end. Fragment numbers do not determine the zone.
         
-        upper = (entry & 0x7f00) >> 8
+        upper = (addr - 1 - self.header) / self.sector_size
         
-        if upper > 1:
-            upper = upper - 1
+        if upper < 0:
+            upper = 0
         if upper > 3:
             upper = 3
         
@@ -804,44 +1167,108 @@ class ADFSbigNewMap(ADFSnewMap):
 
 class ADFSoldMap(ADFSmap):
 
-    def _read_free_space(self):
+    """map = ADFSoldMap(sectors, verify = 0, verify_log = None)
+    
+    Reads the free space map used by S, M, L and D format discs, held in the
+    first two 256 byte sectors of the sectors string. The first sector holds
+    the start addresses of the areas of free space and the second their
+    lengths, both in units of 256 bytes, followed by information about the
+    disc.
+    
+    The free_space attribute contains a list of (start, end) tuples giving the
+    byte addresses of each area of free space, in the order in which they are
+    stored in the map. The free() method returns a FreeSpace object that can
+    be used to allocate space.
+    
+    Old maps do not record the locations of files, so the disc_map
+    dictionary is always empty. If verify is set, problems with the map are
+    recorded in the verify_log list.
+    """
+    
+    # The maximum number of free space entries in the map and the unit used
+    # for addresses and lengths.
+    max_entries = 82
+    unit = 256
     
-        # Currently unused
+    def __init__(self, sectors, verify = 0, verify_log = None):
+    
+        self.sectors = sectors
+        self.disc_map = {}
         
-        base = 0
-        free_space = []
-        p = 0
-        while self.sectors[base+p] != 0:
+        self.verify = verify
+        if verify_log is None:
+            verify_log = []
+        self.verify_log = verify_log
         
-            free.append(self._str2num(3, self.sectors[base+p:base+p+3]))
+        self._read_map()
+    
+    def _read_map(self):
+    
+        sectors = self.sectors
         
-        name = self.sectors[self.sector_size-9:self.sector_size-4]
+        # The disc name is stored in two parts, with its even characters in
+        # the first sector and its odd characters in the second.
+        even = sectors[0xf7:0xfc]
+        odd = sectors[0x1f6:0x1fb]
+        self.disc_name = self._safe("".join(map(lambda a, b: a + b, even, odd)),
+                                    with_space = 1)
         
-        disc_size = self._str2num(
-            3, self.sectors[self.sector_size-4:self.sector_size-1]
-            )
+        self.disc_size = self._str2num(3, sectors[0xfc:0xff]) * self.unit
+        self.disc_id = self._read_unsigned_half_word(sectors[0x1fb:0x1fd])
+        self.boot_option = self._read_unsigned_byte(sectors[0x1fd])
         
-        checksum0 = self._read_unsigned_byte(self.sectors[self.sector_size-1])
+        # The end of the list of entries is given as an offset into each
+        # sector.
+        end = self._read_unsigned_byte(sectors[0x1fe])
         
-        base = self.sector_size
+        if end % 3 != 0 or end > self.max_entries * 3:
+            if self.verify:
+                self.verify_log.append(
+                    (ERROR, "Invalid free space pointer %02x in the map." % end))
+            end = min(end - (end % 3), self.max_entries * 3)
         
-        p = 0
-        while self.sectors[base+p] != 0:
+        self.free_space = []
         
-            free.append(self._str2num(3, self.sectors[base+p:base+p+3]))
+        for i in range(0, end, 3):
         
-        name = name + \
-            self.sectors[base+self.sector_size-10:base+self.sector_size-5]
+            start = self._str2num(3, sectors[i:i + 3]) * self.unit
+            length = self._str2num(3, sectors[0x100 + i:0x103 + i]) * self.unit
+            
+            if length == 0:
+                if self.verify:
+                    self.verify_log.append(
+                        (WARNING, "Empty free space entry at %x in the map." % i))
+                continue
+            
+            if self.verify and start + length > max(self.disc_size, len(sectors)):
+                self.verify_log.append(
+                    (ERROR, "Free space at %x lies beyond the end of the disc." % start))
+            
+            self.free_space.append((start, start + length))
         
-        disc_id = self._str2num(
-            2, self.sectors[base+self.sector_size-5:base+self.sector_size-3]
-            )
+        if self.verify:
         
-        boot = self._read_unsigned_byte(self.sectors[base+self.sector_size-3])
+            # Entries should be in address order and should not overlap.
+            previous = 0
+            for start, end in self.free_space:
+                if start < previous:
+                    self.verify_log.append(
+                        (WARNING, "Free space at %x is out of order or overlaps other free space." % start))
+                previous = max(previous, end)
+    
+    def free(self):
+    
+        """Returns a FreeSpace object describing the free space in the map,
+        with addresses in bytes. Overlapping entries are merged."""
         
-        checksum1 = self._read_unsigned_byte(self.sectors[base+self.sector_size-1])
+        extents = []
+        for start, end in sorted(self.free_space):
+            if extents and start <= extents[-1][1]:
+                extents[-1] = (extents[-1][0], max(end, extents[-1][1]))
+            else:
+                extents.append((start, end))
         
-        return free_space
+        return FreeSpace(extents)
 
 
 class ADFSdisc(Utilities):
@@ -957,6 +1384,10 @@ class ADFSdisc(Utilities):
         # Close the ADF file
         adf.close()
         
+        # Read the free space map of discs that use the old map.
+        if self.disc_type in ('ads', 'adm', 'adl', 'adD'):
+            self.old_map = ADFSoldMap(self.sectors, verify, self.verify_log)
+        
         # Set the default disc name.
         self.disc_name = 'Untitled'
         
@@ -1183,6 +1614,7 @@ class ADFSdisc(Utilities):
         #print "Bit size: %s" % hex(bit_size)
         # RASkew
         # BootOpt
+        boot_option = ord(self.sectors[offset + 7])
         # Zones
         zones = ord(self.sectors[offset + 9])
         # ZoneSpare
@@ -1202,7 +1634,8 @@ class ADFSdisc(Utilities):
             'sector size': 2**log2_sector_size, 'heads': heads,
             'density': density,
             'disc size': disc_size, 'disc ID': disc_id,
-            'disc name': disc_name, 'zones': zones, 'root dir': root }
+            'disc name': disc_name, 'zones': zones, 'root dir': root,
+            'boot option': boot_option }
     
     def _read_disc_info(self):
     
@@ -1219,7 +1652,8 @@ class ADFSdisc(Utilities):
             self.map_start, self.map_end = 0x40, 0x400
             self.disc_map = ADFSnewMap(self.map_header, self.map_start,
                                        self.map_end, self.sectors,
-                                       self.sector_size, self.record)
+                                       self.sector_size, self.record,
+                                       self.verify, self.verify_log)
             
             return self.record['disc name']
         
@@ -1233,7 +1667,8 @@ class ADFSdisc(Utilities):
             self.map_start, self.map_end = 0xc6840, 0xc7800
             self.disc_map = ADFSbigNewMap(self.map_header, self.map_start,
                                           self.map_end, self.sectors,
-                                          self.sector_size, self.record)
+                                          self.sector_size, self.record,
+                                          self.verify, self.verify_log)
             
             return self.record['disc name']
         
@@ -1242,48 +1677,36 @@ class ADFSdisc(Utilities):
     
     def _read_tracks(self, f, inter):
     
-        t = ""
-        
         f.seek(0, 0)
         
-        if inter==0:
-            try:
-                for i in range(0, self.ntracks):
-                
-                    t = t + f.read(self.nsectors * self.sector_size)
-            
-            except IOError:
-                print 'Less than %i tracks found.' % self.ntracks
-                f.close()
-                raise ADFS_exception, \
-                    'Less than %i tracks found.' % self.ntracks
+        try:
+            t = f.read(self.ntracks * self.nsectors * self.sector_size)
         
-        else:
+        except IOError:
+            print 'Less than %i tracks found.' % self.ntracks
+            f.close()
+            raise ADFS_exception, \
+                'Less than %i tracks found.' % self.ntracks
         
-            # Tracks are interleaved (0 80 1 81 2 82 ... 79 159) so rearrange
-            # them into the form (0 1 2 3 ... 159)
-            
-            try:
-            
-                for i in range(0, self.ntracks):
-                
-                    if i < (self.ntracks >> 1):
-                        f.seek(i*2*self.nsectors*self.sector_size, 0)
-                        t = t + f.read(self.nsectors*self.sector_size)
-                    else:
-                        j = i - (self.ntracks >> 1)
-                        f.seek(((j*2)+1)*self.nsectors*self.sector_size, 0)
-                        t = t + f.read(self.nsectors*self.sector_size)
-            
-            except IOError:
-            
-                print 'Less than %i tracks found.' % self.ntracks
-                f.close()
-                raise ADFS_exception, \
-                    'Less than %i tracks found.' % self.ntracks
+        if inter != 0:
+        
+            # Tracks are interleaved (0 80 1 81 2 82 ... 79 159) so present
+            # them in the form (0 1 2 3 ... 159) using a table of sector
+            # addresses instead of rearranging the data.
+            t = SectorView(t, Geometry(self.ntracks >> 1, self.nsectors,
+                                       self.sector_size, 2, True))
         
         return t
     
+    def _file(self, name, address, load, exe, length):
+    
+        # Return a file whose data is read from the given address when it is
+        # first needed.
+        file_obj = ADFSfile(name, None, load, exe, length,
+            lambda: self.sectors[address:address + length])
+        file_obj.source = self.sectors
+        return file_obj
+    
     def _read_old_catalogue(self, base):
     
         head = base
@@ -1338,16 +1761,16 @@ class ADFSdisc(Utilities):
                 if (olddirobseq & 0x8) == 0x8:
                 
                     # A directory has been found.
-                    lower_dir_name, lower_files = \
-                        self._read_old_catalogue(inddiscadd)
-                        
-                    files.append(ADFSdirectory(name, lower_files))
+                    files.append(self._directory(
+                        name, self._read_old_catalogue, inddiscadd
+                        ))
                 
                 else:
                 
                     # A file has been found.
-                    data = self.sectors[inddiscadd:inddiscadd+length]
-                    files.append(ADFSfile(name, data, load, exe, length))
+                    file_obj = self._file(name, inddiscadd, load, exe, length)
+                    file_obj.access = access_flags(olddirobseq)
+                    files.append(file_obj)
             
             else:
             
@@ -1357,16 +1780,22 @@ class ADFSdisc(Utilities):
                     (top_set > 0 and length == (self.sector_size * 5)):
                 
                     # A directory has been found.
-                    lower_dir_name, lower_files = \
-                        self._read_old_catalogue(inddiscadd)
-                    
-                    files.append(ADFSdirectory(name, lower_files))
+                    files.append(self._directory(
+                        name, self._read_old_catalogue, inddiscadd
+                        ))
                 
                 else:
                 
-                    # A file has been found.
-                    data = self.sectors[inddiscadd:inddiscadd+length]
-                    files.append(ADFSfile(name, data, load, exe, length))
+                    # A file has been found. Its attributes are stored in
+                    # the top bits of the first characters of its name.
+                    atts = 0
+                    for i in range(5):
+                        if ord(old_name[i]) & 128:
+                            atts = atts | (1 << i)
+                    
+                    file_obj = self._file(name, inddiscadd, load, exe, length)
+                    file_obj.access = access_flags(atts)
+                    files.append(file_obj)
             
             p = p + 26
         
@@ -1417,7 +1846,8 @@ class ADFSdisc(Utilities):
                 )
             
             dir_title = self._safe(
-                self.sectors[tail+self.sector_size-39:tail+self.sector_size-20]
+                self.sectors[tail+self.sector_size-39:tail+self.sector_size-20],
+                with_space = 1
                 )
         
         if parent == head:
@@ -1442,6 +1872,113 @@ class ADFSdisc(Utilities):
         
         return dir_name, files
     
+    def _root_directory(self):
+    
+        # Return a directory object for the root directory, creating it when
+        # first needed.
+        if not self.__dict__.has_key("_root"):
+            self._root = ADFSdirectory("$", self.files)
+        
+        return self._root
+    
+    def _path_elements(self, path):
+    
+        elements = string.split(path, ".")
+        if elements[0] == "$":
+            elements = elements[1:]
+        
+        return elements
+    
+    def lookup(self, path):
+    
+        """Returns the ADFSfile or ADFSdirectory object with the given path,
+        such as "$.Games.Elite", or None if there is no such object. Names are
+        compared without regard to case. Only the directories along the path
+        are read from the disc image, and each directory is indexed the first
+        time it is searched.
+        """
+        
+        obj = self._root_directory()
+        
+        for element in self._path_elements(path):
+        
+            if not isinstance(obj, ADFSdirectory):
+                return None
+            
+            obj = obj.index().lookup(element)
+            
+            if obj is None:
+                return None
+        
+        return obj
+    
+    def exists(self, path):
+    
+        """Returns True if an object with the given path exists on the disc."""
+        
+        return self.lookup(path) is not None
+    
+    def glob(self, pattern):
+    
+        """Returns a list of (path, object) tuples for the files and
+        directories with paths matching the pattern, such as "$.Games.*".
+        Each element of the pattern may contain the * and # wildcards. Only
+        the directories that match the leading elements of the pattern are
+        read from the disc image.
+        """
+        
+        matches = [("$", self._root_directory())]
+        
+        for element in self._path_elements(pattern):
+        
+            found = []
+            
+            for path, obj in matches:
+            
+                if isinstance(obj, ADFSdirectory):
+                
+                    for child in obj.index().glob(element):
+                        found.append((path + "." + child.name, child))
+            
+            matches = found
+        
+        return matches
+    
+    def select(self, filter, files = None, path = "$"):
+    
+        """Returns a list of the files in the disc, or in the list of files
+        and directories given, that are accepted by the ADFSfilter passed as
+        filter. Directories containing accepted files are represented in the
+        list by new ADFSdirectory objects that only contain the accepted
+        files, so the list can be passed to the extract_files and
+        print_catalogue methods.
+        
+        The path parameter specifies the path of the directory containing
+        the files. Only the catalogue is examined, so no file data is read.
+        """
+        
+        if files is None:
+        
+            files = self.files
+        
+        selected = []
+        
+        for obj in files:
+        
+            obj_path = path + "." + obj.name
+            
+            if isinstance(obj, ADFSdirectory):
+            
+                contents = self.select(filter, obj.files, obj_path)
+                if contents:
+                    selected.append(ADFSdirectory(obj.name, contents))
+            
+            elif filter.matches(obj_path, obj):
+            
+                selected.append(obj)
+        
+        return selected
+    
     def print_catalogue(self, files = None, path = "$", filetypes = 0):
     
         """Prints the contents of the disc catalogue to standard output.
@@ -1552,12 +2089,10 @@ class ADFSdisc(Utilities):
                         print "Couldn't open the file: %s" % out_file
                     
                     try:
-                        inf = open(inf_file, "w")
-                        inf.write("$.%s\t%X\t%X\t%X" % (
-                            name, obj.load_address, obj.execution_address,
-                            obj.length
-                            ))
-                        inf.close()
+                        INFfile.write(out_file, INFfile.INFfile(
+                            "$." + name, obj.load_address,
+                            obj.execution_address, obj.length
+                            ), separator)
                     except IOError:
                         print "Couldn't open the file: %s" % inf_file
                 
@@ -1621,12 +2156,10 @@ class ADFSdisc(Utilities):
                         print "Couldn't open the file: %s" % out_file
                     
                     try:
-                        inf = open(inf_file, "w")
-                        inf.write("$.%s\t%X\t%X\t%X" % (
-                            name, obj.load_address, obj.execution_address,
-                            obj.length
-                            ))
-                        inf.close()
+                        INFfile.write(out_file, INFfile.INFfile(
+                            "$." + name, obj.load_address,
+                            obj.execution_address, obj.length
+                            ), separator)
                     except IOError:
                         print "Couldn't open the file: %s" % inf_file
                 else:
@@ -1650,7 +2183,7 @@ class ADFSdisc(Utilities):
     
     def extract_files(self, out_path, files = None, filetypes = 0,
                       separator = ",", convert_dict = {},
-                      with_time_stamps = False):
+                      with_time_stamps = False, filter = None):
     
         """Extracts the files stored in the disc image into a directory
         structure stored on the path specified by out_path.
@@ -1669,12 +2202,20 @@ class ADFSdisc(Utilities):
         
         If with_time_stamps is set, each extracted file will be given the time
         stamp on the target file system that it has in the disc image.
+        
+        If an ADFSfilter is passed as the filter parameter, only the files it
+        accepts are extracted. The filter is applied to the catalogue, so the
+        data of other files is not read.
         """
         
         if files is None:
         
             files = self.files
         
+        if filter is not None:
+        
+            files = self.select(filter, files)
+        
         if self.disc_type == 'adD':
         
             self._extract_old_files(
@@ -1739,3 +2280,63 @@ class ADFSdisc(Utilities):
     def disc_format(self):
     
         return self._format_names[self.disc_type]
+
+
+def check_map(adf):
+
+    """problems = check_map(adf)
+    
+    Checks the checksums of the map of the ADFS disc image in the file with
+    the given handle, reading only the map itself. Returns a list of
+    (address, message) tuples describing any problems found; an empty list
+    means that the map looks sane and that the image is worth opening with
+    ADFSdisc.
+    
+    If the image is not a recognised size, an ADFS_exception is raised.
+    """
+    
+    adf.seek(0, 2)
+    length = adf.tell()
+    adf.seek(0, 0)
+    
+    try:
+        if length in (163840, 327680, 655360):
+        
+            return old_map_problems(adf.read(512))
+        
+        elif length == 819200:
+        
+            # E format discs start with a map zone containing a disc record
+            # describing double density discs with 1024 byte sectors; D
+            # format discs start with an old map.
+            data = adf.read(1024)
+            
+            if ord(data[4]) == 10 and ord(data[7]) == 2:
+                problems = zone_count_problems(data, length)
+                if problems:
+                    return problems
+                return new_map_problems(data, 0, 1024, ord(data[13]))
+            else:
+                return old_map_problems(data)
+        
+        elif length == 1638400:
+        
+            # The map of an F format disc is in the middle of the disc, with
+            # the disc record in its first zone.
+            adf.seek(0xc6800, 0)
+            data = adf.read(1024)
+            
+            problems = zone_count_problems(data, length)
+            if problems:
+                return problems
+            
+            zones = ord(data[13])
+            data = data + adf.read((zones - 1) * 1024)
+            
+            return new_map_problems(data, 0, 1024, zones)
+    
+    finally:
+        adf.seek(0, 0)
+    
+    raise ADFS_exception, 'Please supply a .adf, .adl or .adD file.'
+
@@ -0,0 +1,591 @@
+#!/usr/bin/env python
+
+"""
+ADFSverify.py - Check the structure of ADFS disc images.
+
+Copyright (C) 2026 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "David Boddie <david@boddie.org.uk>"
+__date__ = "2026-10-19"
+__version__ = "0.1"
+__license__ = "GNU General Public License (version 3 or later)"
+
+import ADFSlib
+from ADFSlib import INFORM, WARNING, ERROR, Utilities, old_map_problems
+from diskutils import DiskError, open_image
+
+severity_names = {INFORM: "info", WARNING: "warning", ERROR: "error"}
+
+# The formats that use the new map and those that use the larger directories
+# introduced with the D format.
+new_map_formats = ("adE", "adEbig")
+big_directory_formats = ("adD", "adE", "adEbig")
+
+
+class Problem:
+
+    """problem = Problem(severity, kind, message, path = None, address = None)
+    
+    Describes a problem found in a disc image. The severity is one of the
+    INFORM, WARNING and ERROR values defined in ADFSlib. The kind is a short
+    string identifying the type of problem, such as "overlap" or "sequence",
+    and the message describes it. The path of the object concerned and the
+    address in the image where the problem was found are given if known.
+    """
+    
+    def __init__(self, severity, kind, message, path = None, address = None):
+    
+        self.severity = severity
+        self.kind = kind
+        self.message = message
+        self.path = path
+        self.address = address
+    
+    def __repr__(self):
+    
+        return "<%s instance, %s %s, at %x>" % (
+            self.__class__, severity_names[self.severity], self.kind, id(self))
+    
+    def __str__(self):
+    
+        text = "%s: %s" % (severity_names[self.severity], self.message)
+        if self.path is not None:
+            text += " (%s)" % self.path
+        if self.address is not None:
+            text += " at %x" % self.address
+        
+        return text
+    
+    def as_dict(self):
+    
+        """Returns a dictionary describing the problem, suitable for encoding
+        as JSON."""
+        
+        return {"severity": severity_names[self.severity], "kind": self.kind,
+                "message": self.message, "path": self.path,
+                "address": self.address}
+
+
+class Report(Utilities):
+
+    """report = Report(path = None)
+    
+    Contains the results of verifying the disc image with the given path. The
+    problems attribute contains a list of Problem objects in the order in
+    which they were found. The format attribute contains a description of the
+    disc format, and the files and directories attributes record the numbers
+    of objects found in the catalogue.
+    """
+    
+    def __init__(self, path = None):
+    
+        self.path = path
+        self.format = None
+        self.files = 0
+        self.directories = 0
+        self.problems = []
+    
+    def add(self, severity, kind, message, path = None, address = None):
+    
+        """Records a problem with the given details."""
+        
+        self.problems.append(Problem(severity, kind, message, path, address))
+    
+    def errors(self):
+    
+        """Returns a list of the problems that are errors."""
+        
+        return [p for p in self.problems if p.severity == ERROR]
+    
+    def warnings(self):
+    
+        """Returns a list of the problems that are warnings."""
+        
+        return [p for p in self.problems if p.severity == WARNING]
+    
+    def ok(self):
+    
+        """Returns True if no errors were found."""
+        
+        return not self.errors()
+    
+    def summary(self):
+    
+        """Returns a line of text summarising the results."""
+        
+        errors = len(self.errors())
+        warnings = len(self.warnings())
+        
+        if errors + warnings == 0:
+            return "OK (%i files, %i directories)" % (self.files, self.directories)
+        
+        return self._plural(
+            "%i %s, %i %s", [errors, warnings],
+            [("errors", "error", "errors"), ("warnings", "warning", "warnings")]
+            )
+    
+    def as_dict(self):
+    
+        """Returns a dictionary describing the results, suitable for encoding
+        as JSON."""
+        
+        return {"path": self.path, "format": self.format, "ok": self.ok(),
+                "files": self.files, "directories": self.directories,
+                "problems": [p.as_dict() for p in self.problems]}
+
+
+class Entry:
+
+    # A catalogue entry read from a directory block.
+    
+    def __init__(self, name, load, exe, length, address, atts, top_set):
+    
+        self.name = name
+        self.load_address = load
+        self.execution_address = exe
+        self.length = length
+        self.address = address
+        self.atts = atts
+        self.top_set = top_set
+
+
+class Verifier(Utilities):
+
+    """verifier = Verifier(disc, report = None)
+    
+    Checks the structure of the ADFSdisc given by reading its map and
+    directories directly from the disc image, recording any problems found
+    in a Report. Call the run() method to perform the checks.
+    
+    The checks performed are:
+    
+      * the sequence numbers and identifying strings at the start and end of
+        each directory must match;
+      * the checksums of the old map or the check bytes of the zones in the
+        new map must be correct;
+      * the free space described by the old map must lie on the disc;
+      * every object in the catalogue must be found in the map (new map
+        formats) and lie within the image;
+      * no two objects may occupy the same part of the disc, and no object
+        may occupy free space;
+      * space that is neither free nor used by an object is reported as
+        unreachable (old map formats), and fragments in the map that do not
+        belong to any object are reported as orphans (new map formats).
+    """
+    
+    def __init__(self, disc, report = None):
+    
+        self.disc = disc
+        self.sectors = disc.sectors
+        self.disc_type = disc.disc_type
+        self.sector_size = disc.sector_size
+        self.dir_markers = disc.dir_markers
+        
+        # Find the size of each directory and the offset of the information
+        # at the end of it, which follows the last possible entry.
+        if disc.disc_type in big_directory_formats:
+            self.dir_size = 2 * disc.sector_size
+            self.entries_end = self.dir_size - 0x29
+        else:
+            self.dir_size = 5 * disc.sector_size
+            self.entries_end = self.dir_size - 0x34
+        
+        if report is None:
+            report = Report()
+        self.report = report
+        
+        # Lists of (start, end, path) extents used by objects and free space.
+        self.used = []
+        self.free = []
+        
+        # Lists of (path, offset, size) tuples for each fragment ID in the
+        # new map.
+        self.references = {}
+    
+    def run(self):
+    
+        """Verifies the disc and returns the report."""
+        
+        self.report.format = self.disc.disc_format()
+        
+        if self.disc_type in new_map_formats:
+        
+            self._check_new_map()
+            root = self.disc.disc_map.root_dir_address
+            self._check_directory("$", self._read_at(root), root, {})
+            self._check_references()
+        
+        else:
+        
+            self._check_old_map()
+            if self.disc_type == "adD":
+                root = 0x400
+            else:
+                root = 2 * self.sector_size
+            
+            self.used.append((0, root, "map"))
+            self._add_extent(root, self.dir_size, "$")
+            self._check_directory("$", self._read_at(root), root, {})
+            self._check_unreachable()
+        
+        self._check_overlaps(self.used + self.free)
+        return self.report
+    
+    def _read_at(self, address):
+    
+        return self.sectors[address:address + self.dir_size]
+    
+    def _add_extent(self, start, length, path):
+    
+        # Record the extent of an object in the old map, rounded up to whole
+        # 256 byte sectors.
+        if length > 0:
+            end = start + ((length + 0xff) & ~0xff)
+            self.used.append((start, end, path))
+            
+            if end > len(self.sectors):
+                self.report.add(ERROR, "range", "Object lies beyond the end of the disc",
+                                path, start)
+    
+    def _check_old_map(self):
+    
+        # The old map occupies the first two 256 byte sectors, each ending
+        # with a checksum. The first sector contains the start addresses of
+        # areas of free space and the second their lengths, in sectors.
+        for address, message in old_map_problems(self.sectors):
+            self.report.add(ERROR, "checksum", message, address = address)
+        
+        disc_size = self._str2num(3, self.sectors[0xfc:0xff]) * 256
+        if disc_size > len(self.sectors):
+            self.report.add(ERROR, "range",
+                "Map gives a disc size of %x bytes but the image holds %x" % (
+                disc_size, len(self.sectors)), address = 0xfc)
+        
+        end = ord(self.sectors[0x1fe])
+        if end % 3 != 0 or end > 0xf6:
+            self.report.add(ERROR, "map",
+                "Invalid free space pointer %02x" % end, address = 0x1fe)
+            return
+        
+        for i in range(0, end, 3):
+        
+            start = self._str2num(3, self.sectors[i:i + 3]) * 256
+            length = self._str2num(3, self.sectors[0x100 + i:0x103 + i]) * 256
+            
+            if length == 0:
+                self.report.add(WARNING, "map", "Empty free space entry",
+                                address = i)
+                continue
+            
+            self.free.append((start, start + length, "free space"))
+            
+            if start + length > len(self.sectors):
+                self.report.add(ERROR, "range",
+                    "Free space lies beyond the end of the disc", address = start)
+    
+    def _check_new_map(self):
+    
+        for address, message in self.disc.disc_map.check_zones():
+            self.report.add(ERROR, "checksum", message, address = address)
+        
+        # Check that the fragments in the map lie on the disc.
+        disc_map = self.disc.disc_map.disc_map
+        
+        for file_no, pieces in disc_map.items():
+        
+            # The map reader may record the same fragment more than once.
+            for start, end in dict.fromkeys(pieces).keys():
+            
+                if file_no == 1:
+                    path = "defect"
+                else:
+                    path = "fragment %x" % file_no
+                
+                self.used.append((start, end, path))
+                
+                if start < 0 or end > len(self.sectors) or end <= start:
+                    self.report.add(ERROR, "range",
+                        "Fragment %x has an invalid extent %x-%x" % (
+                        file_no, start, end), address = start)
+    
+    def _read_directory(self, block):
+    
+        # Read the entries in a directory block, returning a list of Entry
+        # objects.
+        entries = []
+        p = 5
+        
+        while p + 26 <= self.entries_end and ord(block[p]) != 0:
+        
+            name_bytes = block[p:p + 10]
+            top_set = 0
+            for i in range(10):
+                if ord(name_bytes[i]) & 0x80:
+                    top_set = i + 1
+            
+            entries.append(Entry(
+                self._safe(name_bytes),
+                self._read_unsigned_word(block[p + 10:p + 14]),
+                self._read_unsigned_word(block[p + 14:p + 18]),
+                self._read_unsigned_word(block[p + 18:p + 22]),
+                self._str2num(3, block[p + 22:p + 25]),
+                ord(block[p + 25]), top_set
+                ))
+            p += 26
+        
+        return entries
+    
+    def _is_directory(self, entry):
+    
+        # Use the same rules as ADFSlib to identify directories.
+        if self.disc_type in big_directory_formats:
+            return (entry.atts & 0x8) != 0
+        
+        return (entry.load_address == 0 and entry.execution_address == 0 and \
+                entry.top_set > 2) or \
+               (entry.top_set > 0 and entry.length == self.dir_size)
+    
+    def _check_directory(self, path, block, address, visited):
+    
+        if len(block) < self.dir_size:
+            self.report.add(ERROR, "range", "Directory lies beyond the end of the disc",
+                            path, address)
+            return
+        
+        if visited.has_key(address):
+            self.report.add(ERROR, "loop", "Directory contains itself", path, address)
+            return
+        
+        visited[address] = None
+        self.report.directories += 1
+        
+        # Check the identifying strings and sequence numbers at the start and
+        # end of the directory.
+        tail = self.dir_size
+        
+        if block[1:5] not in self.dir_markers:
+            self.report.add(ERROR, "directory", "Not a directory", path, address)
+            return
+        
+        if block[tail - 5:tail - 1] not in self.dir_markers:
+            self.report.add(ERROR, "directory",
+                "Directory has an invalid tail", path, address + tail - 5)
+        
+        elif block[0] != block[tail - 6]:
+            self.report.add(ERROR, "sequence",
+                "Directory has sequence numbers %02x and %02x" % (
+                ord(block[0]), ord(block[tail - 6])), path, address)
+        
+        for entry in self._read_directory(block):
+        
+            entry_path = path + "." + entry.name
+            is_dir = self._is_directory(entry)
+            
+            if is_dir:
+                length = self.dir_size
+            else:
+                length = entry.length
+                self.report.files += 1
+            
+            if self.disc_type in new_map_formats:
+                entry_address = self._check_new_entry(entry, entry_path, length, is_dir)
+                if entry_address is None:
+                    continue
+                if is_dir:
+                    self._check_directory(entry_path,
+                        self.disc.disc_map._read_fragments(entry_address, length),
+                        entry_address[0][0], visited)
+            
+            else:
+                if self.disc_type == "adD":
+                    entry_address = entry.address * 256
+                else:
+                    entry_address = entry.address * self.sector_size
+                
+                self._add_extent(entry_address, length, entry_path)
+                
+                if is_dir:
+                    self._check_directory(entry_path, self._read_at(entry_address),
+                                          entry_address, visited)
+    
+    def _check_new_entry(self, entry, path, length, is_dir):
+    
+        # Find the fragments used by an object in the new map, recording the
+        # part of them that it uses, and return them with the first fragment
+        # adjusted to start at the object's data.
+        file_no = entry.address >> 8
+        offset = entry.address & 0xff
+        if offset != 0:
+            offset = (offset - 1) * self.sector_size
+        
+        pieces = self.disc.disc_map.disc_map.get(file_no, [])
+        
+        if not pieces:
+            if is_dir or length != 0:
+                self.report.add(ERROR, "missing",
+                    "Object %x is not in the map" % file_no, path)
+            return None
+        
+        self.references.setdefault(file_no, []).append((path, offset, length))
+        
+        total = 0
+        for start, end in pieces:
+            total += end - start
+        
+        if offset + length > total:
+            self.report.add(ERROR, "length",
+                "Object needs %x bytes but only %x are allocated" % (
+                offset + length, total), path, pieces[0][0])
+            return None
+        
+        pieces = pieces[:]
+        pieces[0] = (pieces[0][0] + offset, pieces[0][1])
+        return pieces
+    
+    def _check_references(self):
+    
+        # Objects that share fragments must not overlap each other.
+        for file_no, objects in self.references.items():
+        
+            objects.sort(key = lambda obj: obj[1])
+            
+            for i in range(1, len(objects)):
+                path, offset, length = objects[i]
+                previous, prev_offset, prev_length = objects[i - 1]
+                
+                if offset < prev_offset + prev_length:
+                    self.report.add(ERROR, "overlap",
+                        "Object overlaps %s in fragment %x" % (previous, file_no),
+                        path)
+        
+        # Fragments that are not used by any object cannot be reached. The
+        # object with ID 2 contains the map and root directory.
+        for file_no, pieces in self.disc.disc_map.disc_map.items():
+        
+            if file_no > 2 and not self.references.has_key(file_no) and pieces:
+            
+                size = 0
+                for start, end in pieces:
+                    size += end - start
+                
+                self.report.add(WARNING, "orphan",
+                    "Fragment %x (%x bytes) is not used by any object" % (
+                    file_no, size), address = pieces[0][0])
+    
+    def _check_unreachable(self):
+    
+        # Report the parts of the disc that are neither free nor in use.
+        extents = self.used + self.free
+        extents.sort()
+        
+        end = 0
+        for start, finish, path in extents:
+        
+            if start > end:
+                self.report.add(WARNING, "unreachable",
+                    "%x bytes are neither free nor in use" % (start - end),
+                    address = end)
+            end = max(end, finish)
+        
+        disc_size = min(self._str2num(3, self.sectors[0xfc:0xff]) * 256,
+                        len(self.sectors))
+        if end < disc_size:
+            self.report.add(WARNING, "unreachable",
+                "%x bytes are neither free nor in use" % (disc_size - end),
+                address = end)
+    
+    def _check_overlaps(self, extents):
+    
+        # Sort the extents and compare each with the one that reaches
+        # furthest among those before it.
+        extents = extents[:]
+        extents.sort()
+        
+        furthest = None
+        
+        for extent in extents:
+        
+            start, end, path = extent
+            
+            if furthest is not None and start < furthest[1]:
+                self.report.add(ERROR, "overlap",
+                    "%s overlaps %s" % (path, furthest[2]), path, start)
+            
+            if furthest is None or end > furthest[1]:
+                furthest = extent
+
+
+def verify(disc, path = None):
+
+    """report = verify(disc, path = None)
+    
+    Checks the structure of the ADFSdisc given and returns a Report describing
+    any problems found. The path of the image can be given for reference.
+    """
+    
+    return Verifier(disc, Report(path)).run()
+
+
+def verify_image(path):
+
+    """Opens the disc image with the given path, which may be compressed, and
+    verifies it, returning a Report. Images that cannot be read are reported
+    as having errors."""
+    
+    report = Report(path)
+    
+    try:
+        disc = ADFSlib.ADFSdisc(open_image(path))
+    except (ADFSlib.ADFS_exception, DiskError), e:
+        report.add(ERROR, "format", "Unrecognised disc image: %s" % e)
+        return report
+    except EnvironmentError, e:
+        report.add(ERROR, "format", "Couldn't read the image: %s" % e)
+        return report
+    
+    try:
+        return Verifier(disc, report).run()
+    except Exception, e:
+        # Badly corrupted images can cause the checks themselves to fail.
+        report.add(ERROR, "format", "%s: %s" % (e.__class__.__name__, e))
+        return report
+
+
+def verify_images(paths, jobs = None):
+
+    """Verifies each of the disc images with the given paths using a pool of
+    jobs worker processes, or one per processor if jobs is None, and yields a
+    Report for each image as it is completed. Reports may be produced in a
+    different order to the paths."""
+    
+    if jobs == 1 or len(paths) <= 1:
+        for path in paths:
+            yield verify_image(path)
+        return
+    
+    from multiprocessing import Pool
+    
+    # Send the paths to the workers in small batches to reduce the overhead
+    # of verifying large numbers of small images.
+    pool = Pool(jobs)
+    try:
+        for report in pool.imap_unordered(verify_image, paths, 8):
+            yield report
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
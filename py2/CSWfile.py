@@ -0,0 +1,389 @@
+#!/usr/bin/env python
+
+"""
+CSWfile.py - Read and write CSW (compressed square wave) tape files.
+
+Copyright (C) 2026 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "David Boddie <david@boddie.org.uk>"
+__date__ = "2026-10-19"
+__version__ = "0.1"
+__license__ = "GNU General Public License (version 3 or later)"
+
+import struct, zlib
+import UEFaudio
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class CSWfile_error(Exception):
+
+    pass
+
+
+signature = "Compressed Square Wave\x1a"
+
+# Compression types
+RLE = 1
+Z_RLE = 2
+
+
+class CSWfile:
+
+    """csw = CSWfile(filename = None, creator = "CSWfile " + __version__)
+    
+    Represents a CSW file, which stores a tape signal as the lengths of the
+    pulses of a square wave, in samples. If a file name is given, the header
+    of the file is read; otherwise, a new file with a sample rate of 44100 Hz
+    using version 2 of the format and zlib compression is described. The
+    sample_rate, major, minor, compression and polarity attributes can be
+    changed before a new file is written.
+    
+    The pulses are not held in memory. Instead, they are read in blocks by
+    the pulses() method and written from any sequence of blocks by the
+    write() method.
+    """
+    
+    def __init__(self, filename = None, creator = "CSWfile " + __version__):
+    
+        self.filename = filename
+        self.creator = creator
+        
+        self.major = 2
+        self.minor = 0
+        self.sample_rate = 44100
+        self.compression = Z_RLE
+        
+        # The initial level of the signal: 1 for high, 0 for low.
+        self.polarity = 1
+        
+        # The number of pulses is only recorded in version 2 files.
+        self.pulse_count = None
+        self.extension = ""
+        
+        if filename is not None:
+            self.read_header()
+    
+    def read_header(self):
+    
+        """Reads the header of the file, setting the attributes that
+        describe the format of the pulses."""
+        
+        try:
+            f = open(self.filename, "rb")
+        except IOError:
+            raise CSWfile_error, "The input file, %s could not be read." % self.filename
+        
+        try:
+            header = f.read(0x34)
+        finally:
+            f.close()
+        
+        if header[:len(signature)] != signature or len(header) < 0x20:
+            raise CSWfile_error, "The input file, %s is not a CSW file." % self.filename
+        
+        self.major, self.minor = struct.unpack("<BB", header[0x17:0x19])
+        
+        if self.major == 1:
+        
+            self.sample_rate, self.compression, flags = \
+                struct.unpack("<HBB", header[0x19:0x1d])
+            self.pulse_count = None
+            self.creator = ""
+            self.extension = ""
+            self._data_offset = 0x20
+        
+        elif self.major == 2:
+        
+            if len(header) < 0x34:
+                raise CSWfile_error, "The input file, %s is truncated." % self.filename
+            
+            self.sample_rate, self.pulse_count, self.compression, flags, \
+                extension_length = struct.unpack("<IIBBB", header[0x19:0x24])
+            self.creator = header[0x24:0x34].rstrip("\x00")
+            
+            f = open(self.filename, "rb")
+            try:
+                f.seek(0x34)
+                self.extension = f.read(extension_length)
+            finally:
+                f.close()
+            
+            self._data_offset = 0x34 + extension_length
+        
+        else:
+            raise CSWfile_error, "Unsupported CSW version: %i.%i" % (self.major, self.minor)
+        
+        if self.compression not in (RLE, Z_RLE) or \
+           (self.major == 1 and self.compression != RLE):
+            raise CSWfile_error, "Unsupported compression type: %i" % self.compression
+        
+        if self.sample_rate == 0:
+            raise CSWfile_error, "The input file, %s has no sample rate." % self.filename
+        
+        self.polarity = flags & 1
+    
+    def _blocks(self, buffer_size):
+    
+        # Return an iterator over the decompressed RLE data.
+        f = open(self.filename, "rb")
+        try:
+            f.seek(self._data_offset)
+            
+            if self.compression == Z_RLE:
+                decompressor = zlib.decompressobj()
+            else:
+                decompressor = None
+            
+            while True:
+            
+                data = f.read(buffer_size)
+                if not data:
+                    break
+                
+                if decompressor:
+                    try:
+                        data = decompressor.decompress(data)
+                    except zlib.error, e:
+                        raise CSWfile_error, "Failed to decompress %s: %s" % (self.filename, e)
+                
+                if data:
+                    yield data
+            
+            if decompressor:
+                data = decompressor.flush()
+                if data:
+                    yield data
+        finally:
+            f.close()
+    
+    def pulses(self, buffer_size = 65536, use_numpy = True):
+    
+        """Returns an iterator over blocks of pulse lengths read from the
+        file, buffer_size bytes of the file at a time. Each block is a NumPy
+        array if NumPy is available and use_numpy is True, or a list."""
+        
+        use_numpy = use_numpy and numpy is not None
+        rest = ""
+        
+        for data in self._blocks(buffer_size):
+        
+            pulses, rest = decode_rle(rest + data, use_numpy)
+            if len(pulses):
+                yield pulses
+        
+        if rest:
+            raise CSWfile_error, "The input file, %s ends with an incomplete pulse." % self.filename
+    
+    def decode(self, use_numpy = True):
+    
+        """Decodes the pulses in the file, returning the PulseDecoder used.
+        Its chunks attribute contains the UEF chunks found and its other
+        attributes describe any errors."""
+        
+        decoder = UEFaudio.PulseDecoder(self.sample_rate, use_numpy = use_numpy)
+        
+        for pulses in self.pulses(use_numpy = use_numpy):
+            decoder.feed(pulses)
+        
+        decoder.finish()
+        return decoder
+    
+    def to_uef(self, creator = "CSWfile " + __version__):
+    
+        """Returns a new UEFfile object containing the chunks decoded from
+        the pulses in the file."""
+        
+        return UEFaudio.to_uef(self.decode().chunks, creator)
+    
+    def write(self, filename, pulses):
+    
+        """Writes a CSW file with the given file name containing the pulses
+        given, which can be any sequence of blocks of pulse lengths, using
+        the format described by the attributes of this object. Pulses of zero
+        length are omitted."""
+        
+        if self.major == 1 and self.compression != RLE:
+            raise CSWfile_error, "Version 1 CSW files cannot be compressed."
+        
+        # Version 1 files store the sample rate in 16 bits.
+        if self.major == 1 and self.sample_rate > 0xffff:
+            raise CSWfile_error, "Version 1 CSW files cannot use a sample rate of %i Hz." % self.sample_rate
+        
+        try:
+            f = open(filename, "wb")
+        except IOError:
+            raise CSWfile_error, "Couldn't open %s for writing." % filename
+        
+        try:
+            f.write(self._header(0))
+            
+            if self.compression == Z_RLE:
+                compressor = zlib.compressobj()
+            else:
+                compressor = None
+            
+            count = 0
+            
+            for block in pulses:
+            
+                data, n = encode_rle(block)
+                count += n
+                
+                if compressor:
+                    data = compressor.compress(data)
+                f.write(data)
+            
+            if compressor:
+                f.write(compressor.flush())
+            
+            # Version 2 files record the number of pulses in the header.
+            if self.major == 2:
+                f.seek(0)
+                f.write(self._header(count))
+        finally:
+            f.close()
+        
+        self.filename = filename
+        self.pulse_count = count
+    
+    def _header(self, count):
+    
+        if self.major == 1:
+            return signature + struct.pack("<BBHBB3x", 1, 1, self.sample_rate,
+                                           RLE, self.polarity & 1)
+        
+        return signature + struct.pack("<BBIIBBB16s", 2, self.minor,
+            self.sample_rate, count, self.compression, self.polarity & 1,
+            len(self.extension), self.creator[:16]) + self.extension
+    
+    def write_chunks(self, filename, chunks, minor = 9, major = 0):
+    
+        """Writes a CSW file with the given file name containing the pulses
+        for the UEF chunks given, which can be any sequence of (chunk ID,
+        data) tuples such as the chunks attribute of a UEFfile object. The
+        minor and major version numbers of the UEF file are used to interpret
+        the chunks."""
+        
+        renderer = UEFaudio.PulseRenderer(self.sample_rate)
+        renderer.minor = minor
+        renderer.major = major
+        
+        self.write(filename, renderer.pulses(chunks))
+
+
+def decode_rle(data, use_numpy = True):
+
+    """pulses, rest = decode_rle(data, use_numpy = True)
+    
+    Decodes the pulse lengths stored in the string of RLE data given. Each
+    pulse is stored as a byte unless it is longer than 255 samples, when it
+    is stored as a zero byte followed by a 32-bit little endian length.
+    Returns the pulse lengths as a NumPy array, if NumPy is available and
+    use_numpy is True, or a list, and any incomplete pulse at the end of the
+    data, which should be prepended to the following data."""
+    
+    use_numpy = use_numpy and numpy is not None
+    
+    # Pulses stored as single bytes are converted in bulk, in the runs
+    # between long pulses, which are usually rare.
+    pieces = []
+    pos = 0
+    
+    while True:
+    
+        zero = data.find("\x00", pos)
+        
+        if zero == -1:
+            pieces.append(data[pos:])
+            pos = len(data)
+            break
+        
+        pieces.append(data[pos:zero])
+        
+        if zero + 5 > len(data):
+            pos = zero
+            break
+        
+        pieces.append(struct.unpack("<I", data[zero + 1:zero + 5])[0])
+        pos = zero + 5
+    
+    if use_numpy:
+        arrays = []
+        for piece in pieces:
+            if isinstance(piece, str):
+                arrays.append(numpy.frombuffer(piece, dtype = numpy.uint8))
+            else:
+                arrays.append(numpy.array([piece], dtype = numpy.uint32))
+        pulses = numpy.concatenate(arrays).astype(numpy.int64)
+    else:
+        pulses = []
+        for piece in pieces:
+            if isinstance(piece, str):
+                pulses.extend(map(ord, piece))
+            else:
+                pulses.append(piece)
+    
+    return pulses, data[pos:]
+
+
+def encode_rle(pulses):
+
+    """data, count = encode_rle(pulses)
+    
+    Encodes the sequence of pulse lengths given as a string of RLE data,
+    omitting pulses of zero length, and returns it with the number of pulses
+    encoded."""
+    
+    if numpy is not None:
+    
+        pulses = numpy.asarray(pulses, dtype = numpy.int64)
+        pulses = pulses[pulses > 0]
+        
+        # Short pulses occupy one byte and long pulses five.
+        short = pulses < 256
+        sizes = numpy.where(short, 1, 5)
+        offsets = numpy.cumsum(sizes) - sizes
+        
+        data = numpy.zeros(int(sizes.sum()), dtype = numpy.uint8)
+        data[offsets[short]] = pulses[short]
+        
+        long_offsets = offsets[~short]
+        if len(long_offsets):
+            values = pulses[~short].astype("<u4").view(numpy.uint8).reshape(-1, 4)
+            data[long_offsets[:, None] + numpy.arange(1, 5)] = values
+        
+        return data.tobytes(), len(pulses)
+    
+    pieces = []
+    count = 0
+    
+    for pulse in pulses:
+    
+        if pulse <= 0:
+            continue
+        elif pulse < 256:
+            pieces.append(chr(pulse))
+        else:
+            pieces.append("\x00" + struct.pack("<I", pulse))
+        
+        count += 1
+    
+    return "".join(pieces), count
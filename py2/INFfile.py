@@ -0,0 +1,415 @@
+#!/usr/bin/env python
+
+"""
+INFfile.py - Read and write .inf meta-data files.
+
+Copyright (C) 2026 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "David Boddie <david@boddie.org.uk>"
+__date__ = "2026-10-19"
+__version__ = "0.1"
+__license__ = "GNU General Public License (version 3 or later)"
+
+import os, sys
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+# Determine the platform on which the program is running
+
+if sys.platform == 'RISCOS':
+    suffix = '/'
+else:
+    suffix = '.'
+
+
+class INFfile_error(Exception):
+
+    pass
+
+
+class INFfile:
+
+    """info = INFfile(name, load = 0, exec_ = 0, length = None, access = None,
+                      next = None, crc = None, path = None)
+    
+    Represents the meta-data stored in a .inf file for a file called name with
+    the given load and execution addresses. The length, access attributes, the
+    name of the file that follows this one on tape (next) and the CRC of the
+    file's data are optional. If the information was read from a file, path
+    contains the path of the corresponding data file.
+    
+    Any other keyword=value fields are stored in the extra dictionary.
+    """
+    
+    def __init__(self, name, load = 0, exec_ = 0, length = None, access = None,
+                       next = None, crc = None, path = None):
+    
+        self.name = name
+        self.load_address = load
+        self.execution_address = exec_
+        self.length = length
+        self.access = access
+        self.next = next
+        self.crc = crc
+        self.path = path
+        self.extra = {}
+    
+    def __repr__(self):
+    
+        return '<%s instance, "%s", at %x>' % (self.__class__, self.name, id(self))
+    
+    def locked(self):
+    
+        """Returns True if the access attributes indicate that the file is
+        locked."""
+        
+        return self.access is not None and (self.access & 0x08) != 0
+    
+    def line(self):
+    
+        """Returns the information as a line of text suitable for writing to a
+        .inf file."""
+        
+        fields = [self.name, "%X" % self.load_address,
+                  "%X" % self.execution_address]
+        
+        if self.length is not None:
+        
+            fields.append("%X" % self.length)
+            
+            if self.access is not None:
+                fields.append("%02X" % self.access)
+        
+        if self.next is not None:
+            fields.append("NEXT " + self.next)
+        
+        if self.crc is not None:
+            fields.append("CRC=%04X" % self.crc)
+        
+        keys = self.extra.keys()
+        keys.sort()
+        for key in keys:
+            fields.append("%s=%s" % (key, self.extra[key]))
+        
+        return "\t".join(fields)
+
+
+def _hex(s):
+
+    try:
+        return int(s, 16)
+    except ValueError:
+        return None
+
+
+def parse(line, default_name = None, path = None):
+
+    """Parses a line of text from a .inf file and returns an INFfile object.
+    
+    If the line does not start with a file name, the default_name is used
+    instead. The first field is treated as a file name if it contains a "."
+    character, is not a hexadecimal number or matches the default_name.
+    """
+    
+    fields = line.split()
+    
+    if not fields:
+        raise INFfile_error("Empty information file.")
+    
+    first = fields[0]
+    
+    if "." in first or _hex(first) is None or \
+        (default_name is not None and first.upper() == default_name.upper()):
+        name = fields.pop(0)
+    else:
+        name = default_name
+    
+    # The load and execution addresses are required. The length and access
+    # attributes are optional.
+    numbers = []
+    
+    while fields and len(numbers) < 4:
+    
+        value = _hex(fields[0])
+        
+        if value is None:
+        
+            # Older files use L or Locked in place of an access value.
+            if len(numbers) >= 2 and fields[0].upper() in ("L", "LOCKED"):
+                while len(numbers) < 3:
+                    numbers.append(None)
+                numbers.append(0x08)
+                fields.pop(0)
+            break
+        
+        numbers.append(value)
+        fields.pop(0)
+    
+    if len(numbers) < 2:
+        raise INFfile_error("Missing load or execution address: %s" % line.strip())
+    
+    while len(numbers) < 4:
+        numbers.append(None)
+    
+    load, exec_, length, access = numbers
+    info = INFfile(name, load, exec_, length, access, path = path)
+    
+    # Read the remaining fields, which may be keyword=value pairs or a NEXT
+    # keyword followed by a file name.
+    while fields:
+    
+        field = fields.pop(0)
+        upper = field.upper()
+        
+        if upper == "NEXT" and fields:
+            info.next = fields.pop(0)
+        
+        elif "=" in field:
+        
+            key, value = field.split("=", 1)
+            key = key.upper()
+            
+            if key == "NEXT":
+                info.next = value
+            elif key == "CRC" and _hex(value) is not None:
+                info.crc = _hex(value)
+            else:
+                info.extra[key] = value
+        
+        elif upper in ("L", "LOCKED"):
+            info.access = (info.access or 0) | 0x08
+    
+    return info
+
+
+def _key(name):
+
+    # Return a key for comparing file names, assuming that names without a
+    # directory are in the root directory and that names are not case
+    # sensitive.
+    if "." not in name:
+        name = "$." + name
+    
+    return name.upper()
+
+
+def order(infos):
+
+    """Returns a new list containing the INFfile objects in the order given by
+    their NEXT fields.
+    
+    Each file that is not named as the next file of another file starts a
+    chain, and chains are returned in the order in which their first files
+    appear in the list. Files that refer to each other in a loop are placed
+    after all the other files, starting with the first in the list. Every
+    object is returned exactly once.
+    """
+    
+    # Map each name to the position of the first file with that name.
+    positions = {}
+    for i in range(len(infos)):
+        positions.setdefault(_key(infos[i].name), i)
+    
+    # Record the file that follows each file, ignoring references to missing
+    # files and letting only the first file that refers to a given file claim
+    # it as its successor.
+    following = [None] * len(infos)
+    preceded = [False] * len(infos)
+    
+    for i in range(len(infos)):
+    
+        if infos[i].next is None:
+            continue
+        
+        j = positions.get(_key(infos[i].next))
+        
+        if j is not None and j != i and not preceded[j]:
+            following[i] = j
+            preceded[j] = True
+    
+    ordered = []
+    visited = [False] * len(infos)
+    
+    # Follow the chains from the files with no predecessors, then from any
+    # files that remain, which can only be members of loops.
+    starts = [i for i in range(len(infos)) if not preceded[i]]
+    starts += range(len(infos))
+    
+    for i in starts:
+    
+        while i is not None and not visited[i]:
+            visited[i] = True
+            ordered.append(infos[i])
+            i = following[i]
+    
+    return ordered
+
+
+def inf_path(path, separator = suffix):
+
+    """Returns the path of the .inf file corresponding to the data file with
+    the given path. The separator is used to join the path to the suffix."""
+    
+    return path + separator + "inf"
+
+
+def read(path):
+
+    """Reads the .inf file corresponding to the data file with the given path
+    and returns an INFfile object. The upper case .INF suffix is tried if no
+    file with the lower case suffix exists."""
+    
+    for name in (inf_path(path), path + suffix + "INF"):
+    
+        try:
+            f = open(name, "r")
+        except IOError:
+            continue
+        
+        try:
+            line = f.readline()
+        finally:
+            f.close()
+        
+        return parse(line, os.path.split(path)[1], path)
+    
+    raise INFfile_error("Couldn't read the information file for %s" % path)
+
+
+def write(path, info, separator = suffix):
+
+    """Writes the information in the INFfile object to the .inf file
+    corresponding to the data file with the given path. The separator is used
+    to join the path to the suffix."""
+    
+    f = open(inf_path(path, separator), "w")
+    try:
+        f.write(info.line() + "\n")
+    finally:
+        f.close()
+
+
+def _list_directory(directory):
+
+    # Return (name, is directory) pairs for the entries in the directory,
+    # using scandir if available to avoid checking the type of each entry
+    # separately.
+    if scandir is not None:
+        return [(entry.name, entry.is_dir()) for entry in scandir(directory)]
+    
+    entries = []
+    for name in os.listdir(directory):
+        entries.append((name, os.path.isdir(os.path.join(directory, name))))
+    
+    return entries
+
+
+def find(directory, recursive = False):
+
+    """Returns a sorted list of paths of the data files in the directory that
+    have corresponding .inf files. If recursive is True, subdirectories are
+    also searched."""
+    
+    paths = []
+    pending = [directory]
+    ending = (suffix + "inf").lower()
+    
+    while pending:
+    
+        current = pending.pop()
+        
+        for name, is_dir in _list_directory(current):
+        
+            if is_dir:
+                if recursive:
+                    pending.append(os.path.join(current, name))
+            
+            elif name.lower().endswith(ending):
+                paths.append(os.path.join(current, name[:-len(ending)]))
+    
+    paths.sort()
+    return paths
+
+
+def _read_inf(path):
+
+    # Read the .inf file for the given data file, returning the error instead
+    # of raising it so that a single bad file does not stop a bulk scan.
+    try:
+        f = open(inf_path(path), "r")
+    except IOError:
+        try:
+            f = open(path + suffix + "INF", "r")
+        except IOError:
+            return INFfile_error("Couldn't read the information file for %s" % path)
+    
+    try:
+        line = f.readline()
+    finally:
+        f.close()
+    
+    try:
+        return parse(line, os.path.split(path)[1], path)
+    except INFfile_error, e:
+        return INFfile_error("%s: %s" % (inf_path(path), e))
+
+
+def scan(directory, recursive = False, threads = 0):
+
+    """Returns a list of INFfile objects for the data files in the directory
+    that have corresponding .inf files, sorted by path. If recursive is True,
+    subdirectories are also scanned.
+    
+    If threads is greater than one, the .inf files are read using a pool of
+    that many threads. An INFfile_error is raised if any file cannot be read.
+    """
+    
+    return read_all(find(directory, recursive), threads)
+
+
+def read_all(paths, threads = 0):
+
+    """Reads the .inf files corresponding to the data files with the given
+    paths and returns a list of INFfile objects in the same order. If threads
+    is greater than one, the files are read using a pool of that many threads.
+    An INFfile_error is raised if any file cannot be read.
+    """
+    
+    if threads > 1 and len(paths) > 1:
+    
+        from multiprocessing.pool import ThreadPool
+        
+        pool = ThreadPool(threads)
+        try:
+            infos = pool.map(_read_inf, paths)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        infos = map(_read_inf, paths)
+    
+    for info in infos:
+        if isinstance(info, INFfile_error):
+            raise info
+    
+    return infos
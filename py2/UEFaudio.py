@@ -0,0 +1,894 @@
+#!/usr/bin/env python
+
+"""
+UEFaudio.py - Convert UEF files to and from audio.
+
+Copyright (C) 2026 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "David Boddie <david@boddie.org.uk>"
+__date__ = "2026-10-19"
+__version__ = "0.2"
+__license__ = "GNU General Public License (version 3 or later)"
+
+import itertools, math, struct, wave
+import UEFfile
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class UEFaudio_error(Exception):
+
+    pass
+
+
+# The start, data and stop bits for each byte stored in the implicit 8N1
+# format, least significant data bit first.
+_byte_bits = []
+for _byte in range(256):
+    _byte_bits.append((0,) + tuple([(_byte >> _i) & 1 for _i in range(8)]) + (1,))
+
+
+def _parity_bit(byte, parity):
+
+    # Return the parity bit for a byte, or None if there is no parity bit.
+    if parity == "E":
+        return bin(byte).count("1") & 1
+    elif parity == "O":
+        return (bin(byte).count("1") & 1) ^ 1
+    return None
+
+
+class Renderer:
+
+    """renderer = Renderer(sample_rate = 44100, sample_width = 2,
+                           amplitude = 0.8, square = False, use_numpy = True)
+    
+    Converts UEF chunks to audio samples. Samples are signed 16-bit values if
+    sample_width is 2 or unsigned 8-bit values if it is 1, and their peak
+    value is given as a fraction of the largest possible value by amplitude.
+    Sine waves are produced unless square is True.
+    
+    The waveform of each bit, carrier cycle and tone is calculated once for
+    each length in samples that it needs and stored in a table. Bits are then
+    converted to samples by copying from the table, using NumPy if it is
+    available and use_numpy is True. The start of each bit is placed on the
+    sample nearest to its ideal time, so that timing errors do not accumulate.
+    """
+    
+    def __init__(self, sample_rate = 44100, sample_width = 2, amplitude = 0.8,
+                       square = False, use_numpy = True):
+    
+        if sample_width not in (1, 2):
+            raise UEFaudio_error, "Unsupported sample width: %i" % sample_width
+        
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.amplitude = amplitude
+        self.square = square
+        self.use_numpy = use_numpy and numpy is not None
+        
+        # The version of the UEF file, used to interpret 0x102 chunks.
+        self.minor = 9
+        self.major = 0
+        
+        self.reset()
+    
+    def reset(self):
+    
+        """Resets the base frequency, baud rate and current time to their
+        initial values."""
+        
+        self.base_frequency = 1200.0
+        self.baud = 1200
+        
+        # The ideal time, in samples, at which the next sound starts, and
+        # the number of samples produced so far.
+        self.time = 0.0
+        self.position = 0
+        
+        self._tables = {}
+        self._arrays = {}
+    
+    def _end(self, time):
+    
+        # Return the sample nearest to the given time.
+        return int(math.floor(time + 0.5))
+    
+    def _wave(self, cycles, length):
+    
+        # Return a string containing samples for the given number of cycles
+        # spread over length samples, creating it if necessary.
+        key = (cycles, length)
+        
+        try:
+            return self._tables[key]
+        except KeyError:
+            pass
+        
+        scale = self.amplitude * ((1 << (self.sample_width * 8 - 1)) - 1)
+        values = []
+        
+        for i in range(length):
+        
+            value = math.sin(2 * math.pi * cycles * (i + 0.5) / length)
+            if self.square:
+                value = cmp(value, 0)
+            values.append(int(round(scale * value)))
+        
+        if self.sample_width == 2:
+            samples = struct.pack("<%ih" % length, *values)
+        else:
+            samples = struct.pack("%iB" % length, *[v + 128 for v in values])
+        
+        self._tables[key] = samples
+        return samples
+    
+    def _wave_array(self, cycles, length):
+    
+        key = (cycles, length)
+        
+        try:
+            return self._arrays[key]
+        except KeyError:
+            pass
+        
+        if self.sample_width == 2:
+            array = numpy.frombuffer(self._wave(cycles, length), dtype = "<i2")
+        else:
+            array = numpy.frombuffer(self._wave(cycles, length), dtype = numpy.uint8)
+        
+        self._arrays[key] = array
+        return array
+    
+    def _symbols(self, symbols, cycles, duration):
+    
+        """Returns samples for a sequence of sounds of equal duration, given
+        in samples. Each item in symbols is an index into the cycles list,
+        which contains the number of cycles in each kind of sound."""
+        
+        if self.use_numpy:
+            return self._symbols_numpy(symbols, cycles, duration)
+        
+        pieces = []
+        start = self.time
+        position = self.position
+        
+        for i in xrange(len(symbols)):
+        
+            end = self._end(start + ((i + 1) * duration))
+            pieces.append(self._wave(cycles[symbols[i]], end - position))
+            position = end
+        
+        self.time = start + (len(symbols) * duration)
+        self.position = position
+        
+        return "".join(pieces)
+    
+    def _symbols_numpy(self, symbols, cycles, duration):
+    
+        symbols = numpy.asarray(symbols, dtype = numpy.intp)
+        n = len(symbols)
+        if n == 0:
+            return ""
+        
+        # Find the sample at which each sound ends and its length.
+        ends = numpy.floor(self.time + (numpy.arange(1, n + 1) * duration) + 0.5)
+        ends = ends.astype(numpy.int64)
+        lengths = numpy.diff(numpy.concatenate(([self.position], ends)))
+        
+        # Each kind of sound only has a few different lengths, so collect
+        # the waveforms needed into a single array and find where each
+        # sound's waveform starts in it.
+        longest = int(lengths.max()) + 1
+        keys, inverse = numpy.unique(symbols * longest + lengths,
+                                     return_inverse = True)
+        
+        waves = []
+        offsets = []
+        offset = 0
+        
+        for key in keys:
+            symbol, length = divmod(int(key), longest)
+            waves.append(self._wave_array(cycles[symbol], length))
+            offsets.append(offset)
+            offset += length
+        
+        table = numpy.concatenate(waves)
+        sources = numpy.array(offsets, dtype = numpy.int64)[inverse]
+        
+        # Copy the samples for each sound from the table to the output.
+        outputs = ends - lengths - self.position
+        indices = numpy.repeat(sources - outputs, lengths) + \
+                  numpy.arange(ends[-1] - self.position)
+        
+        self.time = self.time + (n * duration)
+        self.position = int(ends[-1])
+        
+        return table[indices].tobytes()
+    
+    def bits(self, bits):
+    
+        """Returns samples for the sequence of bits given, using the current
+        base frequency and baud rate."""
+        
+        # A zero bit contains cycles at the base frequency and a one bit
+        # contains cycles at twice that frequency.
+        cycles_per_bit = self.base_frequency / self.baud
+        cycles = (cycles_per_bit, 2 * cycles_per_bit)
+        
+        return self._symbols(bits, cycles, float(self.sample_rate) / self.baud)
+    
+    def data(self, data, data_bits = 8, parity = "N", stop_bits = 1):
+    
+        """Returns samples for the bytes in the data string, each of which is
+        sent as a start bit, the given number of data bits, a parity bit if
+        parity is "E" or "O" and the given number of stop bits."""
+        
+        if self.use_numpy and data_bits == 8 and parity == "N":
+        
+            # Arrange the bits of each byte in a row with its start and stop
+            # bits.
+            values = numpy.frombuffer(data, dtype = numpy.uint8)
+            frames = numpy.zeros((len(values), 9 + stop_bits), dtype = numpy.uint8)
+            frames[:, 1:9] = numpy.unpackbits(values[:, None], axis = 1)[:, ::-1]
+            frames[:, 9:] = 1
+            return self.bits(frames.ravel())
+        
+        bits = []
+        
+        for c in data:
+        
+            byte = ord(c)
+            
+            if data_bits == 8 and parity == "N" and stop_bits == 1:
+                bits.extend(_byte_bits[byte])
+                continue
+            
+            bits.append(0)
+            for i in range(data_bits):
+                bits.append((byte >> i) & 1)
+            
+            parity_bit = _parity_bit(byte & ((1 << data_bits) - 1), parity)
+            if parity_bit is not None:
+                bits.append(parity_bit)
+            
+            bits.extend([1] * stop_bits)
+        
+        return self.bits(bits)
+    
+    def tone(self, cycles):
+    
+        """Returns samples for the given number of cycles of carrier tone at
+        twice the base frequency."""
+        
+        duration = self.sample_rate / (2 * self.base_frequency)
+        return self._symbols([0] * cycles, (1,), duration)
+    
+    def gap(self, seconds):
+    
+        """Returns samples of silence lasting the given number of seconds."""
+        
+        self.time = self.time + (seconds * self.sample_rate)
+        end = self._end(self.time)
+        length = max(end - self.position, 0)
+        self.position = self.position + length
+        
+        if self.sample_width == 2:
+            return "\x00\x00" * length
+        else:
+            return "\x80" * length
+    
+    def render_chunk(self, chunk_id, data):
+    
+        """Returns samples for the UEF chunk with the given ID and data.
+        Chunks that do not produce sound may change the base frequency or
+        baud rate, and return an empty string. Unsupported chunks are
+        ignored."""
+        
+        if chunk_id == 0x100:
+        
+            return self.data(data)
+        
+        elif chunk_id == 0x102:
+        
+            # Explicit bits, least significant bit of each byte first, with
+            # a number of unused bits at the end given by the first byte.
+            if self.major == 0 and self.minor < 9:
+                ignore = 0
+            else:
+                ignore, data = ord(data[0]), data[1:]
+            
+            bits = []
+            for c in data:
+                bits.extend(_byte_bits[ord(c)][1:9])
+            
+            return self.bits(bits[:len(bits) - ignore])
+        
+        elif chunk_id == 0x104:
+        
+            # Data with a defined format. A negative number of stop bits
+            # indicates an extra short wave, which is not reproduced.
+            data_bits, parity, stop_bits = struct.unpack("<Bcb", data[:3])
+            return self.data(data[3:], data_bits, parity.upper(), abs(stop_bits))
+        
+        elif chunk_id == 0x110:
+        
+            return self.tone(struct.unpack("<H", data[:2])[0])
+        
+        elif chunk_id == 0x111:
+        
+            # Carrier tone with a dummy byte in the middle.
+            before, after = struct.unpack("<HH", data[:4])
+            return self.tone(before) + self.data("\xaa") + self.tone(after)
+        
+        elif chunk_id == 0x112:
+        
+            # Gaps are given in units of half a bit.
+            n = struct.unpack("<H", data[:2])[0]
+            return self.gap(n / (2.0 * self.baud))
+        
+        elif chunk_id == 0x113:
+        
+            self.base_frequency = struct.unpack("<f", data[:4])[0]
+        
+        elif chunk_id == 0x116:
+        
+            return self.gap(struct.unpack("<f", data[:4])[0])
+        
+        elif chunk_id == 0x117:
+        
+            self.baud = struct.unpack("<H", data[:2])[0]
+        
+        return ""
+    
+    def write(self, chunks, wav_file):
+    
+        """Writes a WAV file containing the sound for the chunks given, which
+        can be any sequence of (chunk ID, data) tuples. The wav_file can be a
+        file name or a file object. Each chunk is converted and written in
+        turn, so only a small amount of audio is held in memory at once."""
+        
+        out = wave.open(wav_file, "wb")
+        try:
+            out.setnchannels(1)
+            out.setsampwidth(self.sample_width)
+            out.setframerate(self.sample_rate)
+            
+            for chunk_id, data in chunks:
+            
+                samples = self.render_chunk(chunk_id, data)
+                
+                # Write long gaps and tones in pieces.
+                for i in xrange(0, len(samples), 1 << 20):
+                    out.writeframesraw(samples[i:i + (1 << 20)])
+        finally:
+            out.close()
+
+
+def write_wav(uef, wav_file, sample_rate = 44100, sample_width = 2,
+              amplitude = 0.8, square = False):
+
+    """Writes the tape stored in the UEFfile object to a WAV file with the
+    given file name or file object, using a Renderer with the options
+    given."""
+    
+    renderer = Renderer(sample_rate, sample_width, amplitude, square)
+    renderer.minor = uef.minor
+    renderer.major = uef.major
+    renderer.write(uef.chunks, wav_file)
+
+
+class PulseRenderer(Renderer):
+
+    """renderer = PulseRenderer(sample_rate = 44100, use_numpy = True)
+    
+    Converts UEF chunks to the lengths of the half cycles, or pulses, of a
+    square wave, measured in samples at the given sample rate, for formats
+    such as CSW that store tapes in this form. The render_chunk() method
+    returns a list of pulse lengths for each chunk and the pulses() method
+    returns the pulse lengths for a sequence of chunks. Gaps are represented
+    by single long pulses.
+    """
+    
+    def __init__(self, sample_rate = 44100, use_numpy = True):
+    
+        Renderer.__init__(self, sample_rate, square = True, use_numpy = use_numpy)
+    
+    def _symbols(self, symbols, cycles, duration):
+    
+        # Each cycle contains two pulses. Place the end of each pulse on the
+        # sample nearest to its ideal time, as for the samples of sounds.
+        counts = [max(int(round(2 * c)), 1) for c in cycles]
+        
+        if self.use_numpy:
+            return self._symbols_numpy(symbols, counts, duration)
+        
+        lengths = []
+        start = self.time
+        position = self.position
+        
+        for i in xrange(len(symbols)):
+        
+            count = counts[symbols[i]]
+            step = duration / count
+            symbol_start = start + (i * duration)
+            
+            for j in range(1, count + 1):
+                end = self._end(symbol_start + (j * step))
+                lengths.append(end - position)
+                position = end
+        
+        self.time = start + (len(symbols) * duration)
+        self.position = position
+        
+        return lengths
+    
+    def _symbols_numpy(self, symbols, counts, duration):
+    
+        symbols = numpy.asarray(symbols, dtype = numpy.intp)
+        n = len(symbols)
+        if n == 0:
+            return []
+        
+        counts = numpy.array(counts, dtype = numpy.int64)[symbols]
+        total = int(counts.sum())
+        
+        # Find the start of the symbol containing each pulse and the
+        # position of each pulse within its symbol.
+        starts = self.time + (numpy.arange(n) * duration)
+        first = numpy.cumsum(counts) - counts
+        within = numpy.arange(1, total + 1) - numpy.repeat(first, counts)
+        
+        times = numpy.repeat(starts, counts) + (within * numpy.repeat(duration / counts, counts))
+        ends = numpy.floor(times + 0.5).astype(numpy.int64)
+        lengths = numpy.diff(numpy.concatenate(([self.position], ends)))
+        
+        self.time = self.time + (n * duration)
+        self.position = int(ends[-1])
+        
+        return lengths.tolist()
+    
+    def gap(self, seconds):
+    
+        """Returns a list containing a single pulse lasting the given number
+        of seconds, or an empty list if the gap is shorter than a sample."""
+        
+        self.time = self.time + (seconds * self.sample_rate)
+        end = self._end(self.time)
+        length = max(end - self.position, 0)
+        self.position = self.position + length
+        
+        if length == 0:
+            return []
+        return [length]
+    
+    def pulses(self, chunks):
+    
+        """Returns an iterator over lists of pulse lengths, one for each of
+        the chunks given, which can be any sequence of (chunk ID, data)
+        tuples. Chunks that do not produce pulses are skipped."""
+        
+        for chunk_id, data in chunks:
+        
+            lengths = self.render_chunk(chunk_id, data)
+            if lengths:
+                yield lengths
+
+
+class PulseDecoder:
+
+    """decoder = PulseDecoder(sample_rate, base_frequency = 1200.0, baud = 1200,
+                              use_numpy = True)
+    
+    Decodes the lengths of the half cycles, or pulses, of a tape signal into
+    UEF chunks. Pulse lengths are given in samples at the sample rate given.
+    Pass sequences of lengths to the feed() method as they are obtained, then
+    call the finish() method. The chunks attribute contains the list of
+    (chunk ID, data) tuples decoded.
+    
+    Short pulses are half cycles of carrier tone, or parts of one bits, and
+    long pulses are half cycles of zero bits. Pulses much longer than these
+    are treated as gaps. The bits are then divided into bytes, each with a
+    start and stop bit. Sequences of bytes are stored in 0x100 chunks,
+    carrier tone in 0x110 chunks and gaps in 0x112 chunks.
+    
+    The blocks attribute records the number of file blocks found, and the
+    bad_blocks attribute the number of those with incorrect CRCs or invalid
+    headers; the errors attribute contains a message for each of these.
+    Blocks with invalid headers are not stored in the chunks attribute. The
+    framing_errors attribute counts the bytes without a valid stop bit.
+    """
+    
+    # The number of idle bits between bytes that separate blocks
+    idle_bits = 20
+    
+    def __init__(self, sample_rate, base_frequency = 1200.0, baud = 1200,
+                       use_numpy = True):
+    
+        self.sample_rate = float(sample_rate)
+        self.base_frequency = base_frequency
+        self.baud = baud
+        self.use_numpy = use_numpy and numpy is not None
+        
+        # Classify pulses using thresholds between the lengths of short and
+        # long pulses, and between long pulses and gaps.
+        long_pulse = self.sample_rate / (2 * base_frequency)
+        self.threshold = 0.75 * long_pulse
+        self.gap_threshold = 3 * long_pulse
+        
+        self.chunks = []
+        self.blocks = 0
+        self.bad_blocks = 0
+        self.framing_errors = 0
+        self.errors = []
+        
+        # The pulses in a run that may not have ended, the bits that have
+        # not been divided into bytes and the bytes of the current block.
+        self._pending = []
+        self._bits = ""
+        self._data = []
+    
+    def feed(self, pulses):
+    
+        """Decodes the sequence of pulse lengths given, adding any complete
+        chunks to the chunks attribute."""
+        
+        if self.use_numpy:
+            pulses = numpy.concatenate((numpy.asarray(self._pending, dtype = numpy.float64),
+                                        numpy.asarray(pulses, dtype = numpy.float64)))
+            values, counts, durations = self._runs_numpy(pulses)
+        else:
+            pulses = list(self._pending) + list(pulses)
+            values, counts, durations = self._runs(pulses)
+        
+        if len(values) == 0:
+            return
+        
+        # The last run may continue in the next sequence, so keep its pulses.
+        self._pending = pulses[len(pulses) - counts[-1]:]
+        self._decode(values[:-1], counts[:-1], durations[:-1])
+    
+    def finish(self):
+    
+        """Decodes any remaining pulses and returns the chunks attribute."""
+        
+        if self.use_numpy:
+            values, counts, durations = self._runs_numpy(
+                numpy.asarray(self._pending, dtype = numpy.float64))
+        else:
+            values, counts, durations = self._runs(list(self._pending))
+        
+        self._pending = []
+        self._decode(values, counts, durations)
+        self._frame(True)
+        self._flush()
+        
+        return self.chunks
+    
+    def _classify(self, pulse):
+    
+        if pulse > self.gap_threshold:
+            return 2
+        elif pulse >= self.threshold:
+            return 0
+        else:
+            return 1
+    
+    def _runs(self, pulses):
+    
+        # Return the class of each run of pulses of the same class, the
+        # number of pulses in each run and its duration.
+        values = []
+        counts = []
+        durations = []
+        
+        for value, run in itertools.groupby(pulses, self._classify):
+            run = list(run)
+            values.append(value)
+            counts.append(len(run))
+            durations.append(sum(run))
+        
+        return values, counts, durations
+    
+    def _runs_numpy(self, pulses):
+    
+        if len(pulses) == 0:
+            return [], [], []
+        
+        classes = numpy.where(pulses > self.gap_threshold, 2,
+                              numpy.where(pulses >= self.threshold, 0, 1))
+        
+        starts = numpy.concatenate(([0], numpy.flatnonzero(classes[1:] != classes[:-1]) + 1))
+        counts = numpy.diff(numpy.concatenate((starts, [len(classes)])))
+        durations = numpy.add.reduceat(pulses, starts)
+        
+        return classes[starts], counts, durations
+    
+    def _decode(self, values, counts, durations):
+    
+        # Convert runs of pulses to bits, treating four short pulses as a
+        # one bit and two long pulses as a zero bit, and handle gaps.
+        if self.use_numpy:
+        
+            values = numpy.asarray(values)
+            counts = numpy.asarray(counts)
+            bits = numpy.where(values == 1, (counts + 2) // 4, (counts + 1) // 2)
+            bits[values == 2] = 0
+            chars = numpy.where(values == 1, ord("1"), ord("0")).astype(numpy.uint8)
+            
+            start = 0
+            for gap in list(numpy.flatnonzero(values == 2)) + [len(values)]:
+                self._bits += numpy.repeat(chars[start:gap], bits[start:gap]).tobytes()
+                if gap < len(values):
+                    self._frame(True)
+                    self._gap(durations[gap])
+                start = gap + 1
+        
+        else:
+            for value, count, duration in zip(values, counts, durations):
+            
+                if value == 1:
+                    self._bits += "1" * ((count + 2) // 4)
+                elif value == 0:
+                    self._bits += "0" * ((count + 1) // 2)
+                else:
+                    self._frame(True)
+                    self._gap(duration)
+        
+        self._frame(False)
+    
+    def _frame(self, final):
+    
+        # Divide the bits into bytes, keeping any incomplete byte or run of
+        # idle bits at the end unless this is the end of a signal.
+        bits = self._bits
+        pos = 0
+        
+        while True:
+        
+            start = bits.find("0", pos)
+            
+            if start == -1:
+                if final:
+                    self._idle(len(bits) - pos)
+                    pos = len(bits)
+                break
+            
+            if start - pos >= self.idle_bits:
+                self._idle(start - pos)
+            
+            if start + 10 > len(bits):
+                if final:
+                    self.framing_errors += 1
+                    pos = len(bits)
+                else:
+                    pos = start
+                break
+            
+            if bits[start + 9] != "1":
+                self.framing_errors += 1
+            
+            self._data.append(chr(int(bits[start + 8:start:-1], 2)))
+            pos = start + 10
+        
+        self._bits = bits[pos:]
+    
+    def _idle(self, count):
+    
+        # Finish the current block, if any, and record the carrier tone in
+        # a run of idle bits, each of which contains two cycles.
+        self._flush()
+        
+        if count < self.idle_bits:
+            return
+        
+        cycles = 2 * count
+        
+        if self.chunks and self.chunks[-1][0] == 0x110:
+            cycles += struct.unpack("<H", self.chunks[-1][1])[0]
+            self.chunks.pop()
+        
+        while cycles > 0:
+            self.chunks.append((0x110, struct.pack("<H", min(cycles, 0xffff))))
+            cycles -= 0xffff
+    
+    def _gap(self, duration):
+    
+        # Record a gap with the duration given in samples, in units of half
+        # a bit.
+        self._flush()
+        
+        n = int(round(duration * 2 * self.baud / self.sample_rate))
+        
+        while n > 0:
+            self.chunks.append((0x112, struct.pack("<H", min(n, 0xffff))))
+            n -= 0xffff
+    
+    def _flush(self):
+    
+        # Store the bytes of the current block in a chunk and check the CRCs
+        # of file blocks. Blocks without a valid header are discarded because
+        # the chunks that contain them cannot be read from UEF files.
+        if not self._data:
+            return
+        
+        data = "".join(self._data)
+        self._data = []
+        
+        if len(data) < 2:
+            self.chunks.append((0x100, data))
+            return
+        
+        try:
+            name, load, exec_addr, block_data, number, last, crc_ok = \
+                UEFfile.decode_block(0x100, data)
+        except UEFfile.UEFfile_error:
+            if data[:1] == "*":
+                self.blocks += 1
+                self.bad_blocks += 1
+            self.errors.append("Discarded %i bytes with an invalid block header before chunk %i" % (
+                len(data), len(self.chunks)))
+            return
+        
+        self.chunks.append((0x100, data))
+        
+        if data[:1] != "*":
+            return
+        
+        self.blocks += 1
+        
+        if not crc_ok:
+            self.bad_blocks += 1
+            self.errors.append("Bad CRC in block %i of %s in chunk %i" % (
+                number, name, len(self.chunks) - 1))
+
+
+class Demodulator:
+
+    """demodulator = Demodulator(sample_rate, channels = 1, sample_width = 2,
+                                 threshold = 0.02)
+    
+    Finds the lengths of the half cycles in a tape signal recorded as PCM
+    audio with the given format, passed to the pulses() method in blocks of
+    frames. NumPy is required.
+    
+    Zero crossings are found with hysteresis: the signal must move beyond a
+    level given by threshold, as a fraction of the largest sample value, on
+    the other side of zero for a crossing to be detected. This prevents
+    noise from producing crossings during silence.
+    """
+    
+    def __init__(self, sample_rate, channels = 1, sample_width = 2,
+                       threshold = 0.02):
+    
+        if numpy is None:
+            raise UEFaudio_error, "NumPy is required to demodulate audio."
+        
+        if sample_width not in (1, 2, 4):
+            raise UEFaudio_error, "Unsupported sample width: %i" % sample_width
+        
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.level = threshold * (1 << (sample_width * 8 - 1))
+        
+        # The sign of the signal at the end of the previous block, the
+        # position of the last crossing and of the start of the next block.
+        self._sign = 0
+        self._last = None
+        self._offset = 0
+    
+    def pulses(self, frames):
+    
+        """Returns an array containing the lengths of the half cycles that
+        end in the string of frames given. Half cycles that continue at the
+        end of the frames are completed by the next call."""
+        
+        if self.sample_width == 1:
+            samples = numpy.frombuffer(frames, dtype = numpy.uint8).astype(numpy.int32) - 128
+        elif self.sample_width == 2:
+            samples = numpy.frombuffer(frames, dtype = "<i2")
+        else:
+            samples = numpy.frombuffer(frames, dtype = "<i4")
+        
+        if self.channels > 1:
+            samples = samples[:len(samples) - (len(samples) % self.channels)]
+            samples = samples.reshape(-1, self.channels).mean(axis = 1)
+        
+        n = len(samples)
+        if n == 0:
+            return numpy.zeros(0, dtype = numpy.int64)
+        
+        # Remove any DC offset from the block.
+        samples = samples - samples.mean()
+        
+        # Find the sign of each sample beyond the threshold and carry it
+        # forward through the samples within the threshold, starting with
+        # the sign at the end of the previous block.
+        signs = numpy.zeros(n + 1, dtype = numpy.int8)
+        signs[0] = self._sign
+        signs[1:][samples > self.level] = 1
+        signs[1:][samples < -self.level] = -1
+        
+        indices = numpy.where(signs != 0, numpy.arange(n + 1), 0)
+        numpy.maximum.accumulate(indices, out = indices)
+        signs = signs[indices]
+        
+        # Crossings occur where the sign changes, but not where it is first
+        # established.
+        changes = numpy.flatnonzero((signs[1:] != signs[:-1]) & (signs[:-1] != 0))
+        positions = changes + self._offset
+        
+        self._sign = signs[-1]
+        self._offset += n
+        
+        if len(positions) == 0:
+            return numpy.zeros(0, dtype = numpy.int64)
+        
+        if self._last is None:
+            lengths = numpy.diff(positions)
+        else:
+            lengths = numpy.diff(numpy.concatenate(([self._last], positions)))
+        
+        self._last = positions[-1]
+        return lengths
+
+
+def read_wav(wav_file, threshold = 0.02, block_size = 65536):
+
+    """decoder = read_wav(wav_file, threshold = 0.02, block_size = 65536)
+    
+    Demodulates the tape signal in the WAV file with the given file name or
+    file object, reading block_size frames at a time, and returns the
+    PulseDecoder used. Its chunks attribute contains the UEF chunks found and
+    its other attributes describe any errors. NumPy is required.
+    """
+    
+    f = wave.open(wav_file, "rb")
+    
+    try:
+        demodulator = Demodulator(f.getframerate(), f.getnchannels(),
+                                  f.getsampwidth(), threshold)
+        decoder = PulseDecoder(f.getframerate())
+        
+        while True:
+        
+            frames = f.readframes(block_size)
+            if not frames:
+                break
+            
+            decoder.feed(demodulator.pulses(frames))
+    finally:
+        f.close()
+    
+    decoder.finish()
+    return decoder
+
+
+def to_uef(chunks, creator = "UEFaudio " + __version__):
+
+    """Returns a new UEFfile object containing the chunks given."""
+    
+    uef = UEFfile.UEFfile(creator = creator)
+    uef.chunks = list(chunks)
+    uef.read_contents()
+    
+    return uef
+
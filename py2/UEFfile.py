@@ -19,7 +19,7 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-import exceptions, sys, string, os, gzip, types
+import binascii, exceptions, sys, string, os, gzip, io, struct, types
 
 class UEFfile_error(exceptions.Exception):
 
@@ -36,6 +36,160 @@ else:
 
 version = '0.30'
 date = '2019-04-07'
+
+
+def crc(s):
+    """Return the CRC of a string of data in the form used by the tape format.
+    
+    The tape format uses the CCITT polynomial with an initial value of zero,
+    which is the variant implemented by binascii.crc_hqx. The high byte of
+    the result is stored first."""
+    
+    n = binascii.crc_hqx(s, 0)
+    
+    return (n >> 8) | ((n & 0xff) << 8)
+
+
+def open_stream(filename, buffer_size = 65536):
+    """in_f, minor, major = open_stream(filename, buffer_size = 65536)
+    
+    Open the UEF file with the specified filename for reading, decompressing
+    it if it was compressed with gzip, and read its header. Returns a buffered
+    file object positioned at the first chunk and the minor and major version
+    numbers of the file format."""
+    
+    try:
+        in_f = io.open(filename, 'rb', buffering = buffer_size)
+    except IOError:
+        raise UEFfile_error, 'The input file, '+filename+' could not be found.'
+    
+    # Is it gzipped?
+    if in_f.peek(2)[:2] == '\037\213':
+    
+        in_f.close()
+        in_f = io.BufferedReader(gzip.open(filename, 'rb'), buffer_size)
+    
+    try:
+        magic = in_f.read(10)
+        version = in_f.read(2)
+    except IOError:
+        in_f.close()
+        raise UEFfile_error, 'The input file, '+filename+' could not be read.'
+    
+    if magic != 'UEF File!\000' or len(version) != 2:
+        in_f.close()
+        raise UEFfile_error, 'The input file, '+filename+' is not a UEF file.'
+    
+    return in_f, ord(version[0]), ord(version[1])
+
+
+def read_chunks(in_f):
+    """Read chunks from an open UEF file, positioned after its header, and
+    yield (chunk ID, data) tuples one at a time."""
+    
+    while 1:
+    
+        header = in_f.read(6)
+        if not header:
+            break
+        
+        if len(header) != 6:
+            raise UEFfile_error, 'Unexpected end of file.'
+        
+        chunk_id, length = struct.unpack('<HI', header)
+        
+        data = in_f.read(length)
+        if len(data) != length:
+            raise UEFfile_error, 'Unexpected end of file.'
+        
+        yield chunk_id, data
+
+
+def decode_block(chunk_id, data, minor = 9, major = 0):
+    """name, load, exec_addr, data, block_number, last, crc_ok = \
+           decode_block(chunk_id, data, minor = 9, major = 0)
+    
+    Decode a file data block stored in a 0x100 or 0x102 tape chunk from a
+    UEF file with the given version numbers. The last value is 1 if the
+    block is marked as the last in the file and crc_ok is True if the CRC of
+    the block data is correct."""
+    
+    # For the implicit tape data chunk, just read the block as a series
+    # of bytes, as before
+    if chunk_id == 0x100:
+    
+        block = data
+    
+    else:   # 0x102
+    
+        if major == 0 and minor < 9:
+        
+            # For UEF file versions earlier than 0.9, the number of
+            # excess bits to be ignored at the end of the stream is
+            # set to zero implicitly
+            ignore = 0
+            bit_ptr = 0
+        else:
+            # For later versions, the number of excess bits is
+            # specified in the first byte of the stream
+            ignore = ord(data[0])
+            bit_ptr = 8
+        
+        # Treat the stream as a single little endian number so that each
+        # byte, which is preceded by a start bit and followed by a stop bit,
+        # can be extracted with a shift
+        bits = long(binascii.hexlify(data[::-1]) or '0', 16)
+        
+        after_end = (len(data)*8) - ignore
+        block = []
+        
+        while bit_ptr + 10 <= after_end:
+        
+            # Skip the start bit, read eight bits of data and skip the
+            # stop bit
+            block.append(chr((bits >> (bit_ptr + 1)) & 0xff))
+            bit_ptr = bit_ptr + 10
+        
+        block = ''.join(block)
+    
+    # Read the block
+    a = block.find('\000', 1)
+    if a == -1:
+        raise UEFfile_error, 'Invalid block header.'
+    
+    name = block[1:a]
+    a = a + 1
+    
+    if len(block) < a + 19:
+        raise UEFfile_error, 'Invalid block header.'
+    
+    load, exec_addr, block_number, length, last = \
+        struct.unpack('<IIHHB', block[a:a+13])
+    
+    if last & 0x80 != 0:
+        last = 1
+    else:
+        last = 0
+    
+    # Try to cope with UEFs that contain junk data at the end of blocks.
+    rest = block[a+19:][:258]
+    data = rest[:-2]
+    crc_ok = len(rest) >= 2 and crc(data) == struct.unpack('<H', rest[-2:])[0]
+    
+    return (name, load, exec_addr, data, block_number, last, crc_ok)
+
+
+def read_blocks(in_f, minor = 9, major = 0):
+    """Read chunks from an open UEF file, positioned after its header, and
+    yield the decoded file data blocks one at a time, as returned by the
+    decode_block function."""
+    
+    for chunk_id, data in read_chunks(in_f):
+    
+        if (chunk_id == 0x100 or chunk_id == 0x102) and len(data) > 1:
+        
+            yield decode_block(chunk_id, data, minor, major)
+
     
     
 class UEFfile:
@@ -78,52 +232,16 @@ class UEFfile:
         else:
             # Read in the chunks from the file
 
-            # Open the input file
+            # Open the input file and read the version number of the file
+            # format
+            in_f, self.minor, self.major = open_stream(filename)
+            
+            # Decode the UEF file
             try:
-                in_f = open(filename, 'rb')
+                self.chunks = list(read_chunks(in_f))
             except IOError:
-                raise UEFfile_error, 'The input file, '+filename+' could not be found.'
-
-            # Is it gzipped?
-            if in_f.read(10) != 'UEF File!\000':
-            
                 in_f.close()
-                in_f = gzip.open(filename, 'rb')
-            
-                try:
-                    if in_f.read(10) != 'UEF File!\000':
-                        in_f.close()
-                        raise UEFfile_error, 'The input file, '+filename+' is not a UEF file.'
-                except:
-                    in_f.close()
-                    raise UEFfile_error, 'The input file, '+filename+' could not be read.'
-            
-            # Read version self.number of the file format
-            self.minor = self.str2num(1, in_f.read(1))
-            self.major = self.str2num(1, in_f.read(1))
-
-            # Decode the UEF file
-            
-            # List of chunks
-            self.chunks = []
-            
-            # Read chunks
-            
-            while 1:
-            
-                # Read chunk ID
-                chunk_id = in_f.read(2)
-                if not chunk_id:
-                    break
-            
-                chunk_id = self.str2num(2, chunk_id)
-            
-                length = self.str2num(4, in_f.read(4))
-            
-                if length != 0:
-                    self.chunks.append((chunk_id, in_f.read(length)))
-                else:
-                    self.chunks.append((chunk_id, ''))
+                raise UEFfile_error, 'The input file, '+filename+' could not be read.'
 
             # Close the input file
             in_f.close()
@@ -137,7 +255,8 @@ class UEFfile:
 
 
     def write(self, filename, write_creator_info = True,
-              write_machine_info = True, write_emulator_info = True):
+              write_machine_info = True, write_emulator_info = True,
+              compress = True):
         """
         Write a UEF file containing all the information stored in an
         instance of UEFfile to the file with the specified filename.
@@ -145,11 +264,16 @@ class UEFfile:
         By default, information about the file's creator, target machine and
         emulator is written to the file. These can be omitted by calling this
         method with individual arguments set to False.
+        
+        The file is compressed with gzip unless compress is False.
         """
 
         # Open the UEF file for writing
         try:
-            uef = gzip.open(filename, 'wb')
+            if compress:
+                uef = gzip.open(filename, 'wb')
+            else:
+                uef = open(filename, 'wb')
         except IOError:
             raise UEFfile_error, "Couldn't open %s for writing." % filename
     
@@ -243,25 +367,7 @@ class UEFfile:
 
     def crc(self, s):
 
-        high = 0
-        low = 0
-
-        for i in s:
-
-            high = high ^ ord(i)
-
-            for j in range(0,8):
-
-                a, carry = self.rol(high, 0)
-
-                if carry == 1:
-                    high = high ^ 8
-                    low = low ^ 16
-
-                low, carry = self.rol(low, carry)
-                high, carry = self.rol(high, carry)
-
-        return high | (low << 8)
+        return crc(s)
 
     # CRC calculation routines (end)
 
@@ -284,6 +390,7 @@ class UEFfile:
                 # No more blocks, so store the details of the last file in
                 # the contents list
                 if current_file != {}:
+                    current_file['data'] = ''.join(current_file['data'])
                     self.contents.append(current_file)
                 break
         
@@ -295,7 +402,7 @@ class UEFfile:
                 if current_file == {}:
         
                     # No current file, so store details
-                    current_file = {'name': name, 'load': load, 'exec': exec_addr, 'blocks': block_number, 'data': data}
+                    current_file = {'name': name, 'load': load, 'exec': exec_addr, 'blocks': block_number, 'data': [data]}
         
                     # Locate the first non-block chunk before the block
                     # and store the position of the file
@@ -314,10 +421,11 @@ class UEFfile:
                         # the file
         
                         if current_file != {}:
+                            current_file['data'] = ''.join(current_file['data'])
                             self.contents.append(current_file)
         
                         # Store details of this new file
-                        current_file = {'name': name, 'load': load, 'exec': exec_addr, 'blocks': block_number, 'data': data}
+                        current_file = {'name': name, 'load': load, 'exec': exec_addr, 'blocks': block_number, 'data': [data]}
         
                         # Locate the first non-block chunk before the block
                         # and store the position of the file
@@ -328,9 +436,10 @@ class UEFfile:
                     else:
                         # Not a new file, so update the number of
                         # blocks and append the block data to the
-                        # data entry
+                        # list of pieces of data, which are joined when
+                        # the file is complete
                         current_file['blocks'] = block_number
-                        current_file['data'] = current_file['data'] + data
+                        current_file['data'].append(data)
         
                         # Update the last position information to mark the end of the file
                         current_file['last position'] = position
@@ -361,109 +470,13 @@ class UEFfile:
         """Read a data block from a tape chunk and return the program name, load and execution addresses,
         block data, block number and whether the block is supposedly the last in the file."""
 
-        # Chunk number and data
-        chunk_id = chunk[0]
-        data = chunk[1]
-
-        # For the implicit tape data chunk, just read the block as a series
-        # of bytes, as before
-        if chunk_id == 0x100:
-
-            block = data
-
-        else:   # 0x102
+        name, load, exec_addr, data, block_number, last, crc_ok = \
+            decode_block(chunk[0], chunk[1], self.minor, self.major)
 
-            if self.major == 0 and self.minor < 9:
-
-                # For UEF file versions earlier than 0.9, the number of
-                # excess bits to be ignored at the end of the stream is
-                # set to zero implicitly
-                ignore = 0
-                bit_ptr = 0
-            else:
-                # For later versions, the number of excess bits is
-                # specified in the first byte of the stream
-                ignore = data[0]
-                bit_ptr = 8
-
-            # Convert the data to the implicit format
-            block = []
-            write_ptr = 0
-
-            after_end = (len(data)*8) - ignore
-            if after_end % 10 != 0:
-
-                # Ensure that the number of bits to be read is a
-                # multiple of ten
-                after_end = after_end - (after_end % 10)
-
-            while bit_ptr < after_end:
-
-                # Skip start bit
-                bit_ptr = bit_ptr + 1
-
-                # Read eight bits of data
-                bit_offset = bit_ptr % 8
-                if bit_offset == 0:
-                    # Write the byte to the block
-                    block[write_ptr] = data[bit_ptr >> 3]
-                else:
-                    # Read the byte containing the first bits
-                    b1 = data[bit_ptr >> 3]
-                    # Read the byte containing the rest
-                    b2 = data[(bit_ptr >> 3) + 1]
-
-                    # Construct a byte of data
-                    # Shift the first byte right by the bit offset
-                    # in that byte
-                    b1 = b1 >> bit_offset
-
-                    # Shift the rest of the bits from the second
-                    # byte to the left and ensure that the result
-                    # fits in a byte
-                    b2 = (b2 << (8 - bit_offset)) & 0xff
-
-                    # OR the two bytes together and write it to
-                    # the block
-                    block[write_ptr] = b1 | b2
-
-                # Increment the block pointer
-                write_ptr = write_ptr + 1
-
-                # Move the data pointer on eight bits and skip the
-                # stop bit
-                bit_ptr = bit_ptr + 9
-
-        # Read the block
-        name = ''
-        a = 1
-        while 1:
-            c = block[a]
-            if ord(c) != 0:     # was > 32:
-                name = name + c
-            a = a + 1
-            if ord(c) == 0:
-                break
-
-        load = self.str2num(4, block[a:a+4])
-        exec_addr = self.str2num(4, block[a+4:a+8])
-        block_number = self.str2num(2, block[a+8:a+10])
-        last = self.str2num(1, block[a+12])
-
-        if last & 0x80 != 0:
-            last = 1
-        else:
-            last = 0
-
-        # Try to cope with UEFs that contain junk data at the end of blocks.
-        rest = block[a+19:][:258]
-        in_crc = self.crc(rest[:-2])
-        if in_crc != self.str2num(2, rest[-2:]):
+        if not crc_ok:
             print "Warning: block %x of file %s has mismatching CRC." % (
                 block_number, repr(name))
 
-        data = rest[:-2]
-
         return (name, load, exec_addr, data, block_number, last)
 
 
@@ -472,41 +485,19 @@ class UEFfile:
         """Write data to a string as a file data block in preparation to be written
         as chunk data to a UEF file."""
 
-        # Write the alignment character
-        out = "*"+name[:10]+"\000"
-
-        # Load address
-        out = out + self.number(4, load)
-
-        # Execution address
-        out = out + self.number(4, exe)
-
-        # Block number
-        out = out + self.number(2, n)
-
-        # Block length
-        out = out + self.number(2, len(block))
-
         # Block flag (last block)
-        if flags:
-            out = out + self.number(1, flags)
-        elif last:
-            out = out + self.number(1, 128)
-        else:
-            out = out + self.number(1, 0)
-
-        # Next address
-        out = out + self.number(4, 0)
+        if not flags and last:
+            flags = 128
 
-        # Header CRC
-        out = out + self.number(2, self.crc(out[1:]))
+        # Name, load and execution addresses, block number, block length,
+        # block flag and next address
+        header = name[:10] + "\000" + struct.pack("<IIHHBI", load & 0xffffffff,
+            exe & 0xffffffff, n, len(block), flags, 0)
 
-        out = out + block
-
-        # Block CRC
-        out = out + self.number(2, self.crc(block))
-
-        return out
+        # The alignment character is followed by the header, header CRC,
+        # block data and block CRC
+        return "".join(["*", header, self.number(2, self.crc(header)),
+                        block, self.number(2, self.crc(block))])
 
 
     def get_leafname(self, path):
@@ -713,7 +704,7 @@ class UEFfile:
 
         if keyboards.has_key(self.keyboard_layout):
 
-            keyboard = keyboards[keyboard_layout]
+            keyboard = keyboards[self.keyboard_layout]
         else:
             keyboard = 0
 
@@ -742,7 +733,11 @@ class UEFfile:
 
     def create_chunks(self, name, load, exe, data):
         """Create suitable chunks, and insert them into
-        the list of chunks."""
+        the list of chunks.
+        
+        The data can be a string or any object that supports slicing, such
+        as a memory-mapped file, and is encoded in 256 byte blocks without
+        being copied as a whole."""
 
         # Reset the block number to zero
         block_number = 0
@@ -751,16 +746,18 @@ class UEFfile:
         gap = 1
 
         new_chunks = []
+        offset = 0
+        length = len(data)
     
         # Write block details
         while True:
         
-            last = (len(data) <= 256)
-            block = self.write_block(data[:256], name, load, exe, block_number,
-                                     last)
+            last = (length - offset <= 256)
+            block = self.write_block(data[offset:offset + 256], name, load,
+                                     exe, block_number, last)
 
-            # Remove the leading 256 bytes as they have been encoded
-            data = data[256:]
+            # Move past the 256 bytes that have been encoded
+            offset = offset + 256
 
             if gap == 1:
                 new_chunks.append((0x110, self.number(2,0x05dc)))
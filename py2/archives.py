@@ -0,0 +1,680 @@
+#!/usr/bin/env python
+
+"""
+archives.py - Convert between disc and tape images and zip and tar files.
+
+Copyright (C) 2026 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "David Boddie <david@boddie.org.uk>"
+__date__ = "2026-10-19"
+__version__ = "0.1"
+__license__ = "GNU General Public License (version 3 or later)"
+
+import re, StringIO, struct, tarfile, time, zipfile
+
+from ADFSconvert import dfs_name, walk
+from diskutils import DiskError, between_epochs
+import INFfile, makedfs, UEFfile
+
+# Suffixes containing filetypes, or load and execution addresses, that are
+# appended to the names of files on other systems.
+filetype_suffix = re.compile(r",([0-9a-fA-F]{3})$")
+address_suffix = re.compile(r",([0-9a-fA-F]{1,8})-([0-9a-fA-F]{1,8})$")
+
+# The header ID and signature of the zip extra field used by RISC OS to
+# store the load and execution addresses and attributes of files.
+riscos_extra_id = 0x4341
+riscos_signature = "ARC0"
+
+
+class ArchiveError(Exception):
+
+    pass
+
+
+class Member:
+
+    """member = Member(path, info, data, date_time = None)
+    
+    Represents a file to be stored in an archive at the given path, using
+    "/" to separate directories, with the given data. The info attribute is
+    an INFfile object containing the file's name in the image, its load and
+    execution addresses and other meta-data. The date_time is a time tuple
+    containing the file's time stamp, if it has one.
+    """
+    
+    def __init__(self, path, info, data, date_time = None):
+    
+        self.path = path
+        self.info = info
+        self.data = data
+        self.date_time = date_time
+    
+    def __repr__(self):
+    
+        return '<%s instance, "%s", at %x>' % (self.__class__, self.path, id(self))
+    
+    def has_filetype(self):
+    
+        """Returns True if the file's load address contains a filetype."""
+        
+        return self.info.load_address & 0xfff00000 == 0xfff00000
+    
+    def filetype(self):
+    
+        """Returns the filetype stored in the file's load address as a string
+        of three hexadecimal digits."""
+        
+        return "%03x" % ((self.info.load_address >> 8) & 0xfff)
+
+
+def _host_name(name):
+
+    # Acorn file names use "/" where other systems use ".", so swap them to
+    # keep the pieces of paths in archives separate.
+    return name.replace("/", ".")
+
+
+def adfs_members(disc, files = None):
+
+    """Yields Member objects for the files in the ADFSdisc, or in the list of
+    files and directories given, in catalogue order. Directories become
+    directories in the archive. The data of each file is only read when its
+    member is produced."""
+    
+    if files is None:
+        files = disc.files
+    
+    for path, obj in walk(files):
+    
+        pieces = map(_host_name, path.split(".")[1:])
+        info = INFfile.INFfile(path, obj.load_address, obj.execution_address,
+                               obj.length)
+        
+        if obj.has_filetype():
+            date_time = obj.time_stamp() or None
+        else:
+            date_time = None
+        
+        yield Member("/".join(pieces), info, obj.data, date_time)
+
+
+def dfs_members(files):
+
+    """Yields Member objects for the list of files read from a DFS catalogue.
+    Files in the $ directory are stored at the top level of the archive and
+    files in other directories are stored in directories named after them."""
+    
+    for file in files:
+    
+        directory, name = file.name.split(".", 1)
+        
+        if directory == "$":
+            path = _host_name(name)
+        else:
+            path = _host_name(directory) + "/" + _host_name(name)
+        
+        if file.locked:
+            access = 0x08
+        else:
+            access = None
+        
+        info = INFfile.INFfile(file.name, file.load_address,
+                               file.execution_address, file.length, access)
+        
+        yield Member(path, info, file.data)
+
+
+def uef_members(uef, stem = "noname"):
+
+    """Yields Member objects for the files in the contents of the UEFfile
+    object in the order in which they occur on the tape. The NEXT field of
+    each file's meta-data names the file that follows it. Files with the same
+    name as an earlier file are given a numeric suffix, and files without
+    names are named using the stem and a number, as UEF2INF does."""
+    
+    names = []
+    used = {}
+    n = 1
+    
+    for details in uef.contents:
+    
+        name = _host_name(details["name"])
+        
+        if used.has_key(name.upper()):
+            name = name + "-" + str(n)
+            n += 1
+        
+        if name == "":
+            name = stem + str(n)
+            n += 1
+        
+        used[name.upper()] = True
+        names.append(name)
+    
+    for i in range(len(uef.contents)):
+    
+        details = uef.contents[i]
+        info = INFfile.INFfile("$." + names[i], details["load"],
+                               details["exec"], len(details["data"]))
+        
+        if i + 1 < len(names):
+            info.next = "$." + names[i + 1]
+        
+        yield Member(names[i], info, details["data"])
+
+
+class _Output:
+
+    # Wraps a file object that may not support seeking, such as standard
+    # output, recording the number of bytes written so that the zipfile
+    # module can find the position of each member.
+    
+    def __init__(self, file):
+    
+        self.file = file
+        self.position = 0
+    
+    def write(self, data):
+    
+        self.file.write(data)
+        self.position += len(data)
+    
+    def tell(self):
+    
+        return self.position
+    
+    def flush(self):
+    
+        self.file.flush()
+
+
+class ArchiveWriter:
+
+    """writer = ArchiveWriter(file, format = "zip", metadata = "inf")
+    
+    Writes members to a zip or tar archive in the given file object, which
+    does not need to support seeking, so that archives can be written to
+    pipes and standard output. The format is one of "zip", "tar", "tar.gz"
+    or "tar.bz2". Call the close() method to finish the archive; the file
+    object itself is not closed.
+    
+    The metadata argument determines how the load and execution addresses of
+    each file are stored:
+    
+    "inf" stores them in a .inf member following each file, as ADF2INF does
+    on the local filing system.
+    
+    "filetype" appends a ",xxx" filetype suffix to the names of files with
+    filetypes and stores .inf members for other files. Since the suffix only
+    contains the filetype, a .inf member is also stored for files with
+    filetypes if the time stamp of the member in the archive does not hold
+    the file's time stamp exactly, or if the file has access attributes.
+    
+    "riscos" stores them in the RISC OS extra field of each zip member, as
+    the zip tools on RISC OS do. It cannot be used with tar archives.
+    """
+    
+    formats = ("zip", "tar", "tar.gz", "tar.bz2")
+    metadata_types = ("inf", "filetype", "riscos")
+    
+    def __init__(self, file, format = "zip", metadata = "inf"):
+    
+        if format not in self.formats:
+            raise ArchiveError("Unsupported archive format: %s" % format)
+        
+        if metadata not in self.metadata_types:
+            raise ArchiveError("Unsupported meta-data type: %s" % metadata)
+        
+        if metadata == "riscos" and format != "zip":
+            raise ArchiveError("RISC OS meta-data can only be stored in zip files.")
+        
+        self.format = format
+        self.metadata = metadata
+        self.count = 0
+        self._paths = {}
+        
+        if format == "zip":
+            self._zip = zipfile.ZipFile(_Output(file), "w", zipfile.ZIP_DEFLATED)
+            self._tar = None
+        else:
+            mode = "w|" + format[4:]
+            self._tar = tarfile.open(fileobj = file, mode = mode)
+            self._zip = None
+    
+    def add(self, member):
+    
+        """Adds the file described by the Member object to the archive,
+        followed by a .inf member if necessary. An ArchiveError is raised if
+        a member with the same path has already been added."""
+        
+        path = member.path
+        inf = self.metadata == "inf"
+        extra = ""
+        date_time = member.date_time or time.localtime()
+        
+        if self.metadata == "filetype":
+            if member.has_filetype():
+                path = path + "," + member.filetype()
+                inf = not self._holds_metadata(member.info, date_time)
+            else:
+                inf = True
+        
+        elif self.metadata == "riscos":
+            extra = riscos_extra(member.info)
+        
+        self._add(path, member.data, date_time, extra)
+        
+        if inf:
+            self._add(INFfile.inf_path(path, "."),
+                      member.info.line() + "\n", date_time)
+        
+        self.count += 1
+    
+    def _holds_metadata(self, info, date_time):
+    
+        # Return True if the file described by the INFfile object can be
+        # stored using only a filetype suffix, with its time stamp rebuilt
+        # from the given time when the archive is read.
+        if info.access is not None:
+            return False
+        
+        if self._zip is not None:
+            # Zip files store times to the nearest two seconds.
+            date_time = max(tuple(date_time[:6]), (1980, 1, 1, 0, 0, 0))
+            date_time = min(date_time, (2107, 12, 31, 23, 59, 58))
+            date_time = date_time[:5] + (date_time[5] & ~1, 0, 0, -1)
+        
+        seconds = max(int(time.mktime(date_time)), 0)
+        
+        return riscos_time(seconds) == (info.load_address & 0xff,
+                                        info.execution_address)
+    
+    def _add(self, path, data, date_time, extra = ""):
+    
+        if self._paths.has_key(path):
+            raise ArchiveError("The archive already contains a member called %s." % path)
+        
+        self._paths[path] = True
+        
+        if self._zip is not None:
+        
+            # Zip files can only store dates from 1980 to 2107.
+            date_time = max(tuple(date_time[:6]), (1980, 1, 1, 0, 0, 0))
+            date_time = min(date_time, (2107, 12, 31, 23, 59, 58))
+            info = zipfile.ZipInfo(path, date_time)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0644 << 16
+            info.extra = extra
+            self._zip.writestr(info, data)
+        
+        else:
+            info = tarfile.TarInfo(path)
+            info.size = len(data)
+            # Tar files cannot store dates before 1970.
+            info.mtime = max(int(time.mktime(date_time)), 0)
+            info.mode = 0644
+            self._tar.addfile(info, StringIO.StringIO(data))
+    
+    def close(self):
+    
+        """Finishes writing the archive."""
+        
+        if self._zip is not None:
+            self._zip.close()
+        else:
+            self._tar.close()
+    
+    def abort(self):
+    
+        """Stops writing the archive without finishing it, so that an archive
+        with missing members does not appear to be complete. The file object
+        is not closed."""
+        
+        if self._zip is not None:
+            # The central directory is written when a ZipFile with a file
+            # object is closed, including when it is deleted.
+            self._zip.fp = None
+        else:
+            # Mark the archive and the stream that compresses it as closed so
+            # that the end of the archive is not written.
+            self._tar.closed = True
+            self._tar.fileobj.closed = True
+
+
+def riscos_extra(info):
+
+    """Returns a zip extra field containing the load and execution addresses
+    and access attributes in the INFfile object given, in the form used by
+    RISC OS."""
+    
+    if info.access is None:
+        access = 0x03
+    else:
+        access = info.access
+    
+    return struct.pack("<HH4sIIII", riscos_extra_id, 20, riscos_signature,
+                       info.load_address & 0xffffffff,
+                       info.execution_address & 0xffffffff, access, 0)
+
+
+def riscos_time(seconds):
+
+    """Returns a (load address low byte, execution address) tuple containing
+    the RISC OS time stamp for the given number of seconds since the Epoch,
+    as stored in the addresses of files with filetypes."""
+    
+    centiseconds = long(seconds) * 100 + between_epochs
+    return int((centiseconds >> 32) & 0xff), int(centiseconds & 0xffffffff)
+
+
+def read_riscos_extra(extra):
+
+    """Returns the (load address, execution address, access attributes) tuple
+    stored in the RISC OS field of the zip extra data given, or None if there
+    is no such field."""
+    
+    pos = 0
+    
+    while pos + 4 <= len(extra):
+    
+        header_id, size = struct.unpack("<HH", extra[pos:pos + 4])
+        field = extra[pos + 4:pos + 4 + size]
+        
+        if header_id == riscos_extra_id and field[:4] == riscos_signature and \
+           len(field) >= 16:
+            return struct.unpack("<III", field[4:16])
+        
+        pos += 4 + size
+    
+    return None
+
+
+def write_archive(members, file, format = "zip", metadata = "inf"):
+
+    """count = write_archive(members, file, format = "zip", metadata = "inf")
+    
+    Writes the Member objects in the sequence given to an archive in the
+    given file object using an ArchiveWriter with the format and meta-data
+    type given, and returns the number of files written. Members are written
+    as they are produced, so only one file is held in memory at a time when
+    the members are produced by a generator such as adfs_members().
+    
+    If an exception occurs, the archive is left unfinished so that it is not
+    mistaken for a complete archive.
+    """
+    
+    writer = ArchiveWriter(file, format, metadata)
+    
+    try:
+        for member in members:
+            writer.add(member)
+    except:
+        writer.abort()
+        raise
+    
+    writer.close()
+    return writer.count
+
+
+def format_from_name(path):
+
+    """Returns the archive format corresponding to the suffix of the given
+    path, or None if the suffix is not recognised."""
+    
+    lower = path.lower()
+    
+    for suffix, format in ((".zip", "zip"), (".tar", "tar"),
+                           (".tar.gz", "tar.gz"), (".tgz", "tar.gz"),
+                           (".tar.bz2", "tar.bz2"), (".tbz2", "tar.bz2")):
+        if lower.endswith(suffix):
+            return format
+    
+    return None
+
+
+def _acorn_name(path):
+
+    # Convert a path in an archive to an Acorn path in the root directory,
+    # swapping "." and "/" in the pieces of the path.
+    pieces = [piece.replace(".", "/") for piece in path.split("/") if piece]
+    return ".".join(["$"] + pieces)
+
+
+def _archive_entries(file):
+
+    # Return a list of (path, data, extra, seconds) tuples for the regular
+    # files in the zip or tar archive in the given file object, in archive
+    # order, where seconds is the time of each file since the Epoch.
+    entries = []
+    
+    if zipfile.is_zipfile(file):
+    
+        file.seek(0, 0)
+        archive = zipfile.ZipFile(file, "r")
+        try:
+            for info in archive.infolist():
+                if not info.filename.endswith("/"):
+                    seconds = int(time.mktime(info.date_time + (0, 0, -1)))
+                    entries.append((info.filename, archive.read(info),
+                                    info.extra, seconds))
+        finally:
+            archive.close()
+        
+        return entries
+    
+    file.seek(0, 0)
+    
+    try:
+        archive = tarfile.open(fileobj = file, mode = "r|*")
+    except tarfile.TarError:
+        raise ArchiveError("Not a zip or tar archive.")
+    
+    try:
+        for info in archive:
+            if info.isfile():
+                entries.append((info.name, archive.extractfile(info).read(),
+                                "", int(info.mtime)))
+    except tarfile.TarError, e:
+        raise ArchiveError("Failed to read the archive: %s" % e)
+    finally:
+        archive.close()
+    
+    return entries
+
+
+def read_members(file):
+
+    """Returns a list of Member objects for the files in the zip or tar
+    archive in the given file object, which must support seeking, in the
+    order in which they occur in the archive.
+    
+    The load and execution addresses of each file are read from a .inf
+    member with the same name, from the RISC OS extra field of a zip member,
+    or from a ",xxx" filetype suffix or ",load-exec" address suffix on its
+    name, in that order of preference. The time stamps of files with filetype
+    suffixes are taken from the times of their members. Files without
+    meta-data have load and execution addresses of zero. The suffixes are
+    removed from the paths of members, and .inf members are not returned
+    themselves.
+    
+    The name in the info attribute of each member is taken from its .inf
+    member, if present; otherwise, it is the path in the archive treated as
+    a path in the root directory of an ADFS disc.
+    """
+    
+    entries = _archive_entries(file)
+    
+    # Find the .inf members that describe other members, indexed by the
+    # paths of those members. Other .inf members are treated as files.
+    paths = {}
+    for path, data, extra, seconds in entries:
+        paths[path.upper()] = True
+    
+    infs = {}
+    for path, data, extra, seconds in entries:
+        if path.lower().endswith(".inf") and paths.has_key(path[:-4].upper()):
+            infs[path[:-4].upper()] = data
+    
+    members = []
+    
+    for path, data, extra, seconds in entries:
+    
+        if path.startswith("__MACOSX/"):
+            continue
+        
+        if path.lower().endswith(".inf") and infs.has_key(path[:-4].upper()):
+            continue
+        
+        if infs.has_key(path.upper()):
+            inf_line = infs[path.upper()].split("\n")[0]
+            
+            # Files with filetypes may have both a suffix and a .inf member.
+            inf_name = path
+            match = filetype_suffix.search(path)
+            if match:
+                path = path[:match.start()]
+            
+            leaf = path.split("/")[-1]
+            
+            try:
+                info = INFfile.parse(inf_line, leaf)
+            except INFfile.INFfile_error, e:
+                raise ArchiveError("%s.inf: %s" % (inf_name, e))
+            
+            if info.name != leaf and "." not in info.name:
+                info.name = "$." + info.name
+            elif info.name == leaf:
+                info.name = _acorn_name(path)
+            
+            members.append(Member(path, info, data))
+            continue
+        
+        fields = read_riscos_extra(extra)
+        match = filetype_suffix.search(path)
+        address_match = address_suffix.search(path)
+        
+        if fields is not None:
+            load, exec_, access = fields
+        elif match:
+            path = path[:match.start()]
+            low, exec_ = riscos_time(seconds)
+            load = 0xfff00000 | (int(match.group(1), 16) << 8) | low
+            access = None
+        elif address_match:
+            path = path[:address_match.start()]
+            load = int(address_match.group(1), 16)
+            exec_ = int(address_match.group(2), 16)
+            access = None
+        else:
+            load, exec_, access = 0, 0, None
+        
+        info = INFfile.INFfile(_acorn_name(path), load, exec_, len(data), access)
+        members.append(Member(path, info, data))
+    
+    return members
+
+
+def dfs_files(members):
+
+    """Returns a list of makedfs File objects for the Member objects given.
+    Names of the form D.NAME read from .inf members are used as they are;
+    other names are converted using ADFSconvert.dfs_name. A DiskError is
+    raised if two files would have the same name on a DFS disk."""
+    
+    files = []
+    names = {}
+    
+    for member in members:
+    
+        name = member.info.name
+        pieces = name.split(".")
+        
+        if not (len(pieces) == 2 and len(pieces[0]) == 1):
+            name = dfs_name(name)
+        
+        key = name.upper()
+        
+        if names.has_key(key):
+            raise DiskError("Files %s and %s would both be stored as %s." % (
+                names[key], member.path, name))
+        
+        names[key] = member.path
+        files.append(makedfs.File(name, member.data, member.info.load_address,
+                                  member.info.execution_address,
+                                  len(member.data), member.info.locked()))
+    
+    return files
+
+
+def to_dfs(members, format = None, title = ""):
+
+    """disk = to_dfs(members, format = None, title = "")
+    
+    Creates a new makedfs Disk object in the given format containing the
+    files described by the Member objects given, with the given title, and
+    returns it. The image can be obtained by reading the disk's file
+    attribute. A DiskError is raised if the files cannot be stored on the
+    disk.
+    """
+    
+    disk = makedfs.Disk(format)
+    disk.new()
+    disk.catalogue().write(title[:12], dfs_files(members))
+    disk.file.seek(0, 0)
+    
+    return disk
+
+
+def tape_files(members):
+
+    """Yields (name, load, exec, data) tuples for the Member objects given,
+    suitable for passing to the UEFfile.import_files method. The files are
+    ordered using the NEXT fields of their .inf members, if any. Tape file
+    names are the leaf names of files, limited to ten characters."""
+    
+    by_info = {}
+    for member in members:
+        by_info[id(member.info)] = member
+    
+    for info in INFfile.order([member.info for member in members]):
+    
+        member = by_info[id(info)]
+        name = info.name.split(".")[-1]
+        yield (name[:10], info.load_address, info.execution_address, member.data)
+
+
+def to_uef(members, uef = None, gap = True):
+
+    """uef = to_uef(members, uef = None, gap = True)
+    
+    Adds the files described by the Member objects given to the end of a
+    UEFfile object as tape files, creating a new object if uef is None, and
+    returns the UEFfile. Each file is preceded by a gap if gap is True.
+    """
+    
+    if uef is None:
+        uef = UEFfile.UEFfile(creator = "archives " + __version__)
+        uef.minor = 6
+        uef.target_machine = "Electron"
+    
+    infos = list(tape_files(members))
+    if infos:
+        uef.import_files(len(uef.contents), infos, gap)
+    
+    return uef
+
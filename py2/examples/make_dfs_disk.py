@@ -18,7 +18,7 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import os, sys
-import makedfs
+import INFfile, makedfs
 
 version = "1.0"
 
@@ -49,34 +49,26 @@ if __name__ == "__main__":
     
     for name in files:
     
-        inf_name = name + ".inf"
+        inf_name = INFfile.inf_path(name)
         if not os.path.isfile(inf_name):
             error("File '%s' is missing corresponding information file: %s\n" % (name, inf_name))
         
         try:
-            line = open(inf_name).readline().strip()
-            dfs_name, load, exec_, length = line.split()
+            info = INFfile.read(name)
         
-        except IOError:
-            error("Failed to read file: %s" % inf_name)
-        
-        except ValueError:
+        except INFfile.INFfile_error:
             error("Invalid format in file: %s" % inf_name)
         
-        try:
-            load = int(load, 16)
-            exec_ = int(exec_, 16)
-            length = int(length, 16)
-        
-        except ValueError:
-            error("Invalid hexadecimal value used in file: %s" % inf_name)
+        dfs_name = info.name
+        load = info.load_address
+        exec_ = info.execution_address
         
         try:
             data = open(name, "rb").read()
         except IOError:
             error("Failed to read file: %s" % name)
         
-        out_files.append((dfs_name, load, exec_, data))
+        out_files.append((dfs_name, load, exec_, data, info.locked()))
     
     # Write the files to a disk image.
     disk = makedfs.Disk()
@@ -86,12 +78,13 @@ if __name__ == "__main__":
     catalogue.boot_option = 3
     
     disk_files = []
-    for name, load, exec_, data in out_files:
+    for name, load, exec_, data, locked in out_files:
     
         if "." not in name:
             name = "$." + name
         
-        disk_files.append(makedfs.File(name, data, load, exec_, len(data)))
+        disk_files.append(makedfs.File(name, data, load, exec_, len(data),
+                                       locked))
     
     catalogue.write(disk_name, disk_files)
     
@@ -0,0 +1,318 @@
+#!/usr/bin/env python
+
+"""
+imagecache.py - Keep parsed disc and tape images in memory.
+
+Copyright (C) 2026 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "David Boddie <david@boddie.org.uk>"
+__date__ = "2026-10-19"
+__version__ = "0.1"
+__license__ = "GNU General Public License (version 3 or later)"
+
+import hashlib, os, threading
+from collections import OrderedDict
+
+import ADFSlib, diskutils, makedfs, UEFfile
+
+
+def image_key(path, content_hash = False):
+
+    """Returns a key identifying the image stored in the file with the given
+    path. By default, the key is made from the real path of the file, its
+    modification time and its size. If content_hash is True, the key is a
+    hash of the file's contents, so that copies of the same image share an
+    entry in a cache."""
+    
+    if content_hash:
+    
+        digest = hashlib.sha1()
+        f = open(path, "rb")
+        try:
+            while True:
+                data = f.read(65536)
+                if not data:
+                    break
+                digest.update(data)
+        finally:
+            f.close()
+        
+        return ("sha1", digest.hexdigest())
+    
+    path = os.path.realpath(path)
+    st = os.stat(path)
+    return (path, st.st_mtime, st.st_size)
+
+
+def _size_of_files(files, sources):
+
+    # Add the sizes of the data in a list of file and directory objects,
+    # including the contents of directories. Objects that read their contents
+    # on demand keep the disc image data they read from in memory, so the
+    # size of each of these sources is counted once, using the dictionary of
+    # sources already counted.
+    size = 0
+    
+    for obj in files:
+    
+        if isinstance(obj, tuple):
+            obj = obj[-1]
+        
+        source = getattr(obj, "source", None)
+        if source is not None and not sources.has_key(id(source)):
+            sources[id(source)] = source
+            size += len(source)
+        
+        # The contents of these objects are only counted if they have been
+        # read.
+        if hasattr(obj, "loaded") and not obj.loaded():
+            continue
+        
+        if hasattr(obj, "data"):
+            size += len(obj.data)
+        elif hasattr(obj, "files"):
+            size += _size_of_files(obj.files, sources)
+    
+    return size
+
+
+def estimate_size(obj):
+
+    """Returns an estimate of the number of bytes of memory used by the data
+    held by a parsed image, such as an ADFSdisc, a UEFfile or the title and
+    list of files returned by a DFS catalogue.
+    
+    Files and directories that are read on demand are counted using the size
+    of the disc image data they read from, and their contents are only
+    counted once they have been read, so the estimate increases as they are
+    read."""
+    
+    size = 0
+    sources = {}
+    
+    # ADFS discs hold the image and the contents of each file.
+    if hasattr(obj, "sectors") and hasattr(obj.sectors, "__len__"):
+        sources[id(obj.sectors)] = obj.sectors
+        size += len(obj.sectors)
+    
+    # UEF files hold a list of chunks and the data of each file.
+    if hasattr(obj, "chunks"):
+        for chunk_id, data in obj.chunks:
+            size += len(data)
+        for details in getattr(obj, "contents", []):
+            size += len(details["data"])
+    
+    if hasattr(obj, "files"):
+        size += _size_of_files(obj.files, sources)
+    
+    elif isinstance(obj, tuple):
+        for item in obj:
+            if isinstance(item, list):
+                size += _size_of_files(item, sources)
+            elif isinstance(item, str):
+                size += len(item)
+    
+    return size
+
+
+class ImageCache:
+
+    """cache = ImageCache(budget = 64 * 1024 * 1024)
+    
+    Keeps parsed images in memory, identified by keys such as those returned
+    by the image_key() function, until the estimated memory used by them
+    exceeds the budget in bytes. When this happens, the least recently used
+    images are discarded.
+    
+    The cache can be shared between threads. The hits and misses attributes
+    record how often images were found in the cache.
+    """
+    
+    def __init__(self, budget = 64 * 1024 * 1024):
+    
+        self.budget = budget
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+    
+        return len(self._entries)
+    
+    def __contains__(self, key):
+    
+        return key in self._entries
+    
+    def get(self, key, loader, size = None):
+    
+        """Returns the object stored in the cache for the given key. If there
+        is no object, the loader is called with no arguments to create one,
+        which is stored in the cache and returned.
+        
+        The size of the object in bytes is estimated using estimate_size()
+        unless it is given. Since objects may read their contents on demand
+        after they are stored, estimated sizes are updated each time they are
+        found in the cache. Objects larger than the budget are returned but
+        not stored."""
+        
+        self._lock.acquire()
+        try:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                obj, old_size, estimated = entry
+                self.hits += 1
+                if estimated:
+                    new_size = estimate_size(obj)
+                    self.used += new_size - old_size
+                    entry = (obj, new_size, estimated)
+                self._entries[key] = entry
+                # Discard other objects if the object has grown, or this one
+                # if it no longer fits on its own.
+                self._trim()
+                return obj
+            self.misses += 1
+        finally:
+            self._lock.release()
+        
+        # Load the object without holding the lock so that other threads can
+        # use the cache in the meantime.
+        obj = loader()
+        
+        if size is None:
+            self._put(key, obj, estimate_size(obj), True)
+        else:
+            self._put(key, obj, size, False)
+        
+        return obj
+    
+    def put(self, key, obj, size):
+    
+        """Stores the object with the given size in bytes in the cache for the
+        given key, discarding the least recently used objects if necessary to
+        keep within the budget."""
+        
+        self._put(key, obj, size, False)
+    
+    def _put(self, key, obj, size, estimated):
+    
+        self._lock.acquire()
+        try:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.used -= old[1]
+            
+            if size > self.budget:
+                return
+            
+            self._entries[key] = (obj, size, estimated)
+            self.used += size
+            self._trim()
+        finally:
+            self._lock.release()
+    
+    def discard(self, key):
+    
+        """Removes the object for the given key from the cache, if present."""
+        
+        self._lock.acquire()
+        try:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.used -= entry[1]
+        finally:
+            self._lock.release()
+    
+    def clear(self):
+    
+        """Removes all objects from the cache."""
+        
+        self._lock.acquire()
+        try:
+            self._entries.clear()
+            self.used = 0
+        finally:
+            self._lock.release()
+    
+    def set_budget(self, budget):
+    
+        """Changes the budget of the cache, discarding objects if necessary."""
+        
+        self._lock.acquire()
+        try:
+            self.budget = budget
+            self._trim()
+        finally:
+            self._lock.release()
+    
+    def _trim(self):
+    
+        while self.used > self.budget and self._entries:
+            key, (obj, size, estimated) = self._entries.popitem(last = False)
+            self.used -= size
+
+
+# The cache shared by the functions below
+cache = ImageCache()
+
+
+def open_adfs(path, verify = 0, content_hash = False):
+
+    """Returns an ADFSdisc object for the image at the given path, which may
+    be compressed, using the process-wide cache to avoid reading and parsing
+    the image again."""
+    
+    def load():
+        return ADFSlib.ADFSdisc(diskutils.open_image(path), verify)
+    
+    return cache.get(("adfs", image_key(path, content_hash), verify), load)
+
+
+def read_dfs(path, format = None, content_hash = False):
+
+    """Returns the disk title and list of files in the catalogue of the DFS
+    image at the given path, which may be compressed, in the given makedfs
+    format, using the process-wide cache to avoid reading the image again.
+    If no format is given, it is determined from the size and name of the
+    image."""
+    
+    def load():
+        f = diskutils.open_image(path)
+        try:
+            disk_format = format
+            if disk_format is None:
+                f.seek(0, 2)
+                disk_format = (diskutils.image_format(f.tell(), f.name) or ("dfs", None))[1]
+            disk = makedfs.Disk(disk_format)
+            disk.open(f)
+            return disk.catalogue().read()
+        finally:
+            f.close()
+    
+    return cache.get(("dfs", image_key(path, content_hash), format), load)
+
+
+def open_uef(path, content_hash = False):
+
+    """Returns a UEFfile object for the file at the given path, using the
+    process-wide cache to avoid reading and decoding the file again."""
+    
+    def load():
+        return UEFfile.UEFfile(path)
+    
+    return cache.get(("uef", image_key(path, content_hash)), load)
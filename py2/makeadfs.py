@@ -0,0 +1,824 @@
+"""
+makeadfs.py - Create ADFS disc images.
+
+Copyright (C) 2026 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "David Boddie <david@boddie.org.uk>"
+__date__ = "2026-10-19"
+__version__ = "0.1"
+__license__ = "GNU General Public License (version 3 or later)"
+
+import os, struct
+import INFfile
+from ADFSlib import ADFSdirectory, ADFSfile, old_map_checksum, zone_check
+from archives import address_suffix, filetype_suffix
+from diskutils import DiskError, FreeSpace, Geometry
+
+# Layouts of the formats that use the old map, given as the number of tracks
+# on each side, the number of sectors per track, the sector size, the number
+# of sides, whether the sides are interleaved and the address of the root
+# directory.
+old_map_formats = {
+    "ads": (40, 16, 256, 1, False, 0x200),
+    "adm": (80, 16, 256, 1, False, 0x200),
+    "adl": (80, 16, 256, 2, True, 0x200),
+    "adD": (80, 10, 1024, 1, False, 0x400)
+    }
+
+# Layouts of the formats that use the new map, given as the number of tracks,
+# the number of sectors per track on each side, the sector size as a power
+# of two, the number of sides, the density, the number of bytes described by
+# each bit of the map as a power of two, the number of zones in the map and
+# the number of unused bits at the end of each zone.
+new_map_formats = {
+    "adE": (80, 5, 10, 2, 2, 7, 1, 0),
+    "adEbig": (80, 10, 10, 2, 4, 6, 4, 1600)
+    }
+
+# Attributes stored in directory entries. Old directories store the first
+# five of these in the top bits of the first five characters of each name.
+READ = 0x01
+WRITE = 0x02
+LOCKED = 0x04
+DIRECTORY = 0x08
+
+# Characters that cannot be used in names.
+reserved_characters = ' "#$%&*.:@\\^|'
+
+
+def _pad(name, length):
+
+    # Return the name padded to the given length, terminated with a carriage
+    # return if it is shorter than the space available.
+    if len(name) < length:
+        name = name + "\r"
+    
+    return (name + "\x00" * length)[:length]
+
+
+def _three(value):
+
+    # Return the value as a three byte little-endian string.
+    return struct.pack("<I", value)[:3]
+
+
+def _address(address):
+
+    # Return the given byte address as a three byte value in units of 256
+    # bytes.
+    return _three(address >> 8)
+
+
+def _check_name(name, path):
+
+    if not 0 < len(name) <= 10:
+        raise DiskError("The name of %s must contain between 1 and 10 characters." % path)
+    
+    for c in name:
+        if c in reserved_characters or not 32 < ord(c) < 127:
+            raise DiskError("The name of %s contains an invalid character: %s" % (
+                path, repr(c)))
+
+
+def _attributes(obj):
+
+    # Return the attributes for the object's directory entry. Files may have
+    # an access attribute containing RISC OS access flags, as used in .inf
+    # files, in which bit 3 indicates that the file is locked. Flags without
+    # the read or write bits, such as those given by the L token used for
+    # DFS files, only lock the file, which is otherwise readable and
+    # writable.
+    if isinstance(obj, ADFSdirectory):
+        return DIRECTORY | LOCKED | READ
+    
+    access = getattr(obj, "access", None)
+    if access is None:
+        return READ | WRITE
+    
+    atts = access & (READ | WRITE)
+    if atts == 0:
+        atts = READ | WRITE
+    if access & 0x08:
+        atts = atts | LOCKED
+    
+    return atts
+
+
+def dir_check_byte(block, entries):
+
+    """Returns the check byte for the 2048 byte directory block given, which
+    contains the number of entries specified. RISC OS calculates this from
+    the words and bytes of the entries and the words of the tail of the
+    directory, rotating the accumulated value before adding each one, and
+    ignores the byte that marks the end of the entries."""
+    
+    block = str(block)
+    end = 5 + (26 * entries)
+    words = end >> 2
+    
+    values = list(struct.unpack("<%iI" % words, block[:words << 2]))
+    values += map(ord, block[words << 2:end])
+    values += struct.unpack("<9I", block[0x7d8:0x7fc])
+    
+    check = 0
+    for value in values:
+        check = value ^ ((check >> 13) | ((check << 19) & 0xffffffff))
+    
+    return (check ^ (check >> 8) ^ (check >> 16) ^ (check >> 24)) & 0xff
+
+
+class DiscImage:
+
+    """image = DiscImage(format, title, boot_option, disc_id, geometry,
+                         new_directories)
+    
+    Describes an empty ADFS disc image with the given geometry, held in a
+    single bytearray in the data attribute in logical sector order. This is
+    the base class of OldMapImage and NewMapImage, which allocate space for
+    objects and write the map. If new_directories is True, directories are
+    stored in the 2048 byte format used by D, E and F format discs.
+    
+    Call the build() method to store a tree of ADFSfile and ADFSdirectory
+    objects on the disc, then the image() method to obtain the contents of
+    the disc image as a string.
+    """
+    
+    dir_marker = "Hugo"
+    
+    def __init__(self, format, title, boot_option, disc_id, geometry,
+                       new_directories):
+    
+        self.format = format
+        self.title = title
+        self.boot_option = boot_option
+        self.disc_id = disc_id
+        
+        self.geometry = geometry
+        self.sector_size = geometry.sector_size
+        self.size = geometry.size
+        self.data = bytearray(self.size)
+        
+        # New directories hold the attributes of each object in a separate
+        # byte instead of in the top bits of its name.
+        self.new_directories = new_directories
+        if new_directories:
+            self.dir_size = 0x800
+            self.max_entries = 77
+        else:
+            self.dir_size = 0x500
+            self.max_entries = 47
+        
+        self.files = 0
+        self.directories = 0
+    
+    def build(self, files):
+    
+        """Stores the ADFSfile and ADFSdirectory objects in the files list in
+        the root directory of the disc, with the contents of each directory,
+        and writes the map. A DiskError is raised if the objects cannot be
+        stored on the disc."""
+        
+        # Allocate space for the contents of each directory in turn, followed
+        # by the contents of its subdirectories, so that the objects in each
+        # directory are stored together.
+        root, pieces = self._root()
+        pending = [("$", files, root, pieces, root, self.title)]
+        
+        while pending:
+        
+            path, objects, address, pieces, parent, title = pending.pop()
+            self._enter_directory(pieces)
+            entries, subdirectories = self._allocate(path, objects, address)
+            
+            self._write_directory(pieces, entries, path.split(".")[-1],
+                                  parent, title)
+            self.directories += 1
+            
+            subdirectories.reverse()
+            pending += subdirectories
+        
+        self._write_map()
+    
+    def _enter_directory(self, pieces):
+    
+        pass
+    
+    def _allocate(self, path, objects, parent):
+    
+        if len(objects) > self.max_entries:
+            raise DiskError("%s contains %i objects but a directory can only hold %i." % (
+                path, len(objects), self.max_entries))
+        
+        # Directories are sorted by name, ignoring case.
+        objects = map(lambda obj: (obj.name.upper(), obj), objects)
+        objects.sort()
+        
+        entries = []
+        subdirectories = []
+        previous = None
+        
+        for key, obj in objects:
+        
+            obj_path = path + "." + obj.name
+            _check_name(obj.name, obj_path)
+            
+            if key == previous:
+                raise DiskError("%s contains more than one object called %s." % (
+                    path, obj.name))
+            previous = key
+            
+            if isinstance(obj, ADFSdirectory):
+                data = None
+                load = exec_ = 0
+                length = self.dir_size
+            else:
+                data = obj.data
+                load = obj.load_address & 0xffffffff
+                exec_ = obj.execution_address & 0xffffffff
+                length = len(data)
+            
+            address, pieces = self._store(obj_path, length)
+            
+            if data is None:
+                subdirectories.append((obj_path, obj.files, address, pieces,
+                                       parent, obj.name))
+            else:
+                self._write(pieces, data)
+                self.files += 1
+            
+            entries.append((obj.name, load, exec_, length, address,
+                            _attributes(obj)))
+        
+        return entries, subdirectories
+    
+    def _write(self, pieces, data):
+    
+        # Write the data to the list of (start, end) areas of the disc given.
+        p = 0
+        
+        for start, end in pieces:
+        
+            amount = min(end - start, len(data) - p)
+            self.data[start:start + amount] = data[p:p + amount]
+            p += amount
+    
+    def _write_directory(self, areas, entries, name, parent, title):
+    
+        pieces = ["\x00" + self.dir_marker]
+        
+        if self.new_directories:
+        
+            for obj_name, load, exec_, length, address, atts in entries:
+                pieces.append(struct.pack("<10sIII3sB", _pad(obj_name, 10),
+                    load, exec_, length, _three(address), atts))
+            
+            tail = struct.pack("<B2x3s19s10sB4sx", 0, _three(parent),
+                _pad(title, 19), _pad(name, 10), 0, self.dir_marker)
+        
+        else:
+        
+            for obj_name, load, exec_, length, address, atts in entries:
+            
+                # The attributes are stored in the top bits of the name.
+                chars = map(ord, _pad(obj_name, 10))
+                for i in range(5):
+                    if atts & (1 << i):
+                        chars[i] = chars[i] | 0x80
+                
+                pieces.append(struct.pack("<10sIII3sx",
+                    "".join(map(chr, chars)), load, exec_, length,
+                    _three(address)))
+            
+            # The check byte is left as zero, as the 8-bit ADFS does.
+            tail = struct.pack("<B10s3s19s14xB4sx", 0, _pad(name, 10),
+                _three(parent), _pad(title, 19), 0, self.dir_marker)
+        
+        head = "".join(pieces)
+        block = bytearray(head + "\x00" * (self.dir_size - len(head) - len(tail)) + tail)
+        
+        if self.new_directories:
+            block[-1] = dir_check_byte(block, len(entries))
+        
+        self._write(areas, block)
+    
+    def image(self):
+    
+        """Returns the contents of the disc image as a string."""
+        
+        if not self.geometry.interleaved:
+            return str(self.data)
+        
+        # Copy each track to its place in the image.
+        image = bytearray(self.size)
+        p = 0
+        
+        for address, amount in self.geometry.runs(0, self.size):
+            image[address:address + amount] = self.data[p:p + amount]
+            p += amount
+        
+        return str(image)
+
+
+class OldMapImage(DiscImage):
+
+    """image = OldMapImage(format = "adm", title = "", boot_option = 0,
+                           disc_id = 0)
+    
+    Creates an empty ADFS disc image in the given format, which can be "ads",
+    "adm", "adl" or "adD" for S, M, L or D format discs, all of which
+    describe their free space using the old map. The title is used as the
+    disc name and the title of the root directory.
+    
+    Objects are stored in whole 256 byte units using a FreeSpace object. The
+    tracks of L format discs are only interleaved when the image is obtained.
+    """
+    
+    # The number of entries in the free space map.
+    max_free_entries = 82
+    
+    def __init__(self, format = "adm", title = "", boot_option = 0,
+                       disc_id = 0):
+    
+        try:
+            tracks, sectors, sector_size, sides, interleaved, root = \
+                old_map_formats[format]
+        except KeyError:
+            raise DiskError("Unsupported format: %s" % format)
+        
+        DiscImage.__init__(self, format, title, boot_option, disc_id,
+            Geometry(tracks, sectors, sector_size, sides, interleaved),
+            format == "adD")
+        
+        self.root_address = root
+        self.free = FreeSpace([(root + self.dir_size, self.size)])
+    
+    def _root(self):
+    
+        return self.root_address >> 8, [(self.root_address, self.root_address + self.dir_size)]
+    
+    def _store(self, path, length):
+    
+        # Return the address to store in the directory entry for an object
+        # of the given length, in units of 256 bytes, and the area it uses.
+        address = self.free.allocate((length + 0xff) & ~0xff)
+        
+        if address is None:
+            if length > 0:
+                raise DiskError("There is not enough space on the disc for %s." % path)
+            address = 0
+        
+        return address >> 8, [(address, address + length)]
+    
+    def _write_map(self):
+    
+        extents = self.free.extents()
+        
+        if len(extents) > self.max_free_entries:
+            raise DiskError("The free space on the disc is divided into too many areas to be recorded in the map.")
+        
+        starts = []
+        lengths = []
+        for start, end in extents:
+            starts.append(_address(start))
+            lengths.append(_address(end - start))
+        
+        # The characters of the disc name are divided between the sectors.
+        name = _pad(self.title, 10)
+        
+        sector0 = bytearray(struct.pack("<246s x 5s 3s x", "".join(starts),
+                                        name[0::2], _address(self.size)))
+        sector1 = bytearray(struct.pack("<246s 5s H B B x", "".join(lengths),
+                                        name[1::2], self.disc_id & 0xffff,
+                                        self.boot_option & 3, 3 * len(extents)))
+        
+        sector0[0xff] = old_map_checksum(str(sector0))
+        sector1[0xff] = old_map_checksum(str(sector1))
+        
+        self.data[0:0x200] = sector0 + sector1
+
+
+class NewMapImage(DiscImage):
+
+    """image = NewMapImage(format = "adE", title = "", boot_option = 0,
+                           disc_id = 0)
+    
+    Creates an empty ADFS disc image in the given format, which can be "adE"
+    or "adEbig" for E or F format discs, both of which describe their
+    contents using the new map. The title is used as the disc name and the
+    title of the root directory.
+    
+    The new map divides the disc into zones, each described by one sector of
+    the map in which every bit represents a fixed number of bytes on the
+    disc. Each object is stored in one or more fragments identified by the
+    same number, and objects are placed in the zone of their directory where
+    possible, using a FreeSpace object that covers the whole disc with the
+    zones as limits. Files smaller than a fragment share fragments with other
+    files in the same directory.
+    """
+    
+    dir_marker = "Nick"
+    
+    # The number of bits used to identify each fragment and the size of the
+    # disc record, in bits, that precedes the map in the first zone.
+    id_length = 15
+    record_bits = 480
+    
+    def __init__(self, format = "adE", title = "", boot_option = 0,
+                       disc_id = 0):
+    
+        try:
+            tracks, sectors, log2_sector_size, heads, density, \
+                log2_bytes_per_bit, zones, zone_spare = new_map_formats[format]
+        except KeyError:
+            raise DiskError("Unsupported format: %s" % format)
+        
+        DiscImage.__init__(self, format, title, boot_option, disc_id,
+            Geometry(tracks, sectors * heads, 1 << log2_sector_size), True)
+        
+        self.record = (log2_sector_size, sectors, heads, density,
+                       log2_bytes_per_bit, zone_spare)
+        self.log2_bytes_per_bit = log2_bytes_per_bit
+        self.zones = zones
+        
+        # Each zone describes the same number of bits except the first,
+        # which also holds the disc record, and the last, which ends with
+        # the disc.
+        zone_bits = (8 << log2_sector_size) - zone_spare
+        disc_bits = self.size >> log2_bytes_per_bit
+        
+        self.zone_limits = []
+        for zone in range(zones):
+            low = max(zone * zone_bits - self.record_bits, 0)
+            high = min((zone + 1) * zone_bits - self.record_bits, disc_bits)
+            self.zone_limits.append((low << log2_bytes_per_bit,
+                                     high << log2_bytes_per_bit))
+        
+        # RISC OS expects fragments in each zone to use a range of numbers.
+        self.ids_per_zone = zone_bits / (self.id_length + 1)
+        self.next_ids = []
+        for zone in range(zones):
+            self.next_ids.append(max(zone * self.ids_per_zone, 3))
+        
+        # Space is allocated in units of the smallest fragment, rounded up to
+        # a whole number of bytes in the map, so that every fragment and
+        # area of free space can be described.
+        self.unit = ((self.id_length + 8) & ~7) << log2_bytes_per_bit
+        
+        # The map is stored twice in the middle zone, followed by the root
+        # directory, in a fragment with the number 2.
+        self.map_address = self.zone_limits[zones >> 1][0]
+        map_length = 2 * zones * self.sector_size
+        length = (map_length + self.dir_size + self.unit - 1) & ~(self.unit - 1)
+        
+        self.free = FreeSpace([(0, disc_bits << log2_bytes_per_bit)])
+        self.free.claim(self.map_address, length)
+        self.fragments = [(2, self.map_address, self.map_address + length)]
+        
+        self.root_address = self.map_address + map_length
+        self.root_sin = (2 << 8) | ((map_length / self.sector_size) + 1)
+        
+        self._zone = 0
+        self._shared = None
+    
+    def _root(self):
+    
+        return self.root_sin, [(self.root_address, self.root_address + self.dir_size)]
+    
+    def _zone_of(self, address):
+    
+        for zone in range(self.zones):
+            if address < self.zone_limits[zone][1]:
+                return zone
+        
+        return self.zones - 1
+    
+    def _enter_directory(self, pieces):
+    
+        # Prefer the zone containing the directory for its contents, and
+        # start sharing fragments afresh.
+        self._zone = self._zone_of(pieces[0][0])
+        self._shared = None
+    
+    def _new_id(self, zone):
+    
+        # Return an unused fragment number, preferring those for the zone.
+        for i in range(self.zones):
+        
+            z = (zone + i) % self.zones
+            file_no = self.next_ids[z]
+            
+            if file_no < (z + 1) * self.ids_per_zone:
+                self.next_ids[z] = file_no + 1
+                return file_no
+        
+        raise DiskError("There are too many objects to store on the disc.")
+    
+    def _fragments(self, path, length):
+    
+        # Allocate space for an object of the given length, returning its
+        # fragment number and a list of (start, end) areas.
+        length = (length + self.unit - 1) & ~(self.unit - 1)
+        
+        # Use a single fragment in the preferred zone or the zones after it.
+        order = range(self._zone, self.zones) + range(self._zone)
+        
+        for zone in order:
+        
+            start = self.free.allocate(length, limits = self.zone_limits[zone])
+            if start is not None:
+                file_no = self._new_id(zone)
+                self.fragments.append((file_no, start, start + length))
+                return file_no, [(start, start + length)]
+        
+        if self.free.total() < length:
+            raise DiskError("There is not enough space on the disc for %s." % path)
+        
+        # Divide the object between the areas of free space in address
+        # order. Fragments cannot cross the boundaries between zones.
+        pieces = []
+        remaining = length
+        
+        for low, high in self.zone_limits:
+        
+            for start, end in self.free.extents():
+            
+                start, end = max(start, low), min(end, high)
+                if start >= end:
+                    continue
+                
+                amount = min(end - start, remaining)
+                pieces.append((start, start + amount))
+                remaining -= amount
+                
+                if remaining == 0:
+                    break
+            
+            if remaining == 0:
+                break
+        
+        file_no = self._new_id(self._zone_of(pieces[0][0]))
+        
+        for start, end in pieces:
+            self.free.claim(start, end - start)
+            self.fragments.append((file_no, start, end))
+        
+        return file_no, pieces
+    
+    def _store(self, path, length):
+    
+        # Return the system internal number (SIN) to store in the directory
+        # entry for an object of the given length and the areas it uses. The
+        # low byte of the SIN is one more than the sector offset of the
+        # object in a shared fragment, or zero if it is not shared.
+        if length == 0:
+            return 0, []
+        
+        sectors = (length + self.sector_size - 1) / self.sector_size
+        unit_sectors = self.unit / self.sector_size
+        
+        if sectors >= unit_sectors:
+            file_no, pieces = self._fragments(path, length)
+            return file_no << 8, pieces
+        
+        if self._shared is not None:
+        
+            file_no, start, used = self._shared
+            
+            if used + sectors <= unit_sectors:
+                self._shared = (file_no, start, used + sectors)
+                address = start + used * self.sector_size
+                return (file_no << 8) | (used + 1), [(address, address + length)]
+        
+        file_no, pieces = self._fragments(path, self.unit)
+        start = pieces[0][0]
+        self._shared = (file_no, start, sectors)
+        
+        return (file_no << 8) | 1, [(start, start + length)]
+    
+    def _map_bit(self, address):
+    
+        # Return the zone and the offset in bits into that zone that
+        # describes the given address.
+        zone = self._zone_of(address)
+        bit = (address - self.zone_limits[zone][0]) >> self.log2_bytes_per_bit
+        
+        if zone == 0:
+            return zone, bit + 32 + self.record_bits
+        else:
+            return zone, bit + 32
+    
+    def _mark(self, zones, start, end, value):
+    
+        # Record a fragment or area of free space in the map, storing the
+        # value in its first bits and setting its last bit.
+        zone, bit = self._map_bit(start)
+        length = (end - start) >> self.log2_bytes_per_bit
+        
+        map_zone = zones[zone]
+        map_zone[bit >> 3:(bit >> 3) + 2] = struct.pack("<H", value)
+        last = ((bit + length) >> 3) - 1
+        map_zone[last] = map_zone[last] | 0x80
+        
+        return zone, bit
+    
+    def _write_map(self):
+    
+        zones = []
+        for zone in range(self.zones):
+            zones.append(bytearray(self.sector_size))
+        
+        for file_no, start, end in self.fragments:
+            self._mark(zones, start, end, file_no)
+        
+        # The free space in each zone is recorded as a chain of links, in
+        # bits, from the free link in the zone header at bit 8.
+        links = [8] * self.zones
+        link_values = [0] * self.zones
+        free = []
+        
+        for low, high in self.zone_limits:
+            for start, end in self.free.extents():
+                start, end = max(start, low), min(end, high)
+                if start < end:
+                    free.append((start, end))
+        
+        for start, end in free:
+        
+            zone, bit = self._map_bit(start)
+            map_zone = zones[zone]
+            
+            if links[zone] == 8:
+                map_zone[1:3] = struct.pack("<H", 0x8000 | (bit - 8))
+            else:
+                # Keep the last bit of the previous area, which is the top
+                # bit of its link if the area is as short as possible.
+                link = links[zone] >> 3
+                map_zone[link:link + 2] = struct.pack("<H",
+                    (bit - links[zone]) | (map_zone[link + 1] << 8 & 0x8000))
+            
+            self._mark(zones, start, end, 0)
+            links[zone] = bit
+        
+        for zone in range(self.zones):
+            if links[zone] == 8:
+                zones[zone][1:3] = struct.pack("<H", 0x8000)
+        
+        # The disc record follows the header of the first zone.
+        log2_sector_size, sectors, heads, density, log2_bytes_per_bit, \
+            zone_spare = self.record
+        
+        zones[0][4:64] = struct.pack("<BBBBBBBBBBHIIH10sIIBBBBII8x",
+            log2_sector_size, sectors, heads, density, self.id_length,
+            log2_bytes_per_bit, 1, self.boot_option & 3, 0, self.zones,
+            zone_spare, self.root_sin, self.size, self.disc_id & 0xffff,
+            (self.title + " " * 10)[:10], 0, 0, 0, 0, 0, 0, 0, self.dir_size)
+        
+        # The cross check bytes of the zones must combine to give 0xff.
+        zones[-1][3] = 0xff
+        
+        for map_zone in zones:
+            map_zone[0] = zone_check(str(map_zone))
+        
+        disc_map = "".join(map(str, zones))
+        self.data[self.map_address:self.map_address + len(disc_map)] = disc_map
+        self.data[self.map_address + len(disc_map):self.root_address] = disc_map
+
+
+def disc_image(format = "adm", title = "", boot_option = 0, disc_id = 0):
+
+    """image = disc_image(format = "adm", title = "", boot_option = 0,
+                          disc_id = 0)
+    
+    Returns a new OldMapImage or NewMapImage object for a disc in the given
+    format, which is one of "ads", "adm", "adl", "adD", "adE" or "adEbig".
+    """
+    
+    if new_map_formats.has_key(format):
+        return NewMapImage(format, title, boot_option, disc_id)
+    
+    return OldMapImage(format, title, boot_option, disc_id)
+
+
+def create_image(files, format = "adm", title = "", boot_option = 0,
+                 disc_id = 0):
+
+    """image = create_image(files, format = "adm", title = "", boot_option = 0,
+                            disc_id = 0)
+    
+    Returns the contents of a new disc image in the given format containing
+    the ADFSfile and ADFSdirectory objects in the files list, such as the
+    files attribute of an ADFSdisc object or the list returned by
+    read_directory(). A DiskError is raised if the objects cannot be stored
+    on the disc.
+    """
+    
+    disc = disc_image(format, title, boot_option, disc_id)
+    disc.build(files)
+    return disc.image()
+
+
+def _reader(path):
+
+    # Return a function that reads the file with the given path.
+    def read():
+        f = open(path, "rb")
+        try:
+            return f.read()
+        finally:
+            f.close()
+    
+    return read
+
+
+def _inf_name(name, present):
+
+    # Return the name of the .inf file for the file with the given name, or
+    # None if there is none. Files extracted from disc images may use a comma
+    # to separate the suffix instead of the usual separator.
+    for separator in (INFfile.suffix, ","):
+        for suffix in ("inf", "INF"):
+            if present.has_key(name + separator + suffix):
+                return name + separator + suffix
+    
+    return None
+
+
+def read_directory(path):
+
+    """Returns a list of ADFSfile and ADFSdirectory objects describing the
+    files and subdirectories in the directory with the given path. The
+    contents of files and subdirectories are read when they are first needed.
+    
+    The load and execution addresses of each file are read from a .inf file,
+    if present, or from a ",xxx" filetype suffix or ",load-exec" address
+    suffix on its name. Files without meta-data have load and execution
+    addresses of zero. Full stops in names are replaced by forward slashes,
+    as they are when files are extracted from disc images.
+    """
+    
+    names = os.listdir(path)
+    names.sort()
+    
+    present = {}
+    for name in names:
+        present[name] = None
+    
+    objects = []
+    
+    for name in names:
+    
+        full_path = os.path.join(path, name)
+        
+        if os.path.isdir(full_path):
+            objects.append(ADFSdirectory(name.replace(".", "/"),
+                loader = lambda full_path = full_path: read_directory(full_path)))
+            continue
+        
+        if name[-4:].lower() in (INFfile.suffix + "inf", ",inf") and \
+           present.has_key(name[:-4]):
+            continue
+        
+        access = None
+        inf_name = _inf_name(name, present)
+        match = filetype_suffix.search(name)
+        address_match = address_suffix.search(name)
+        
+        if inf_name is not None:
+            try:
+                line = open(os.path.join(path, inf_name), "r").readline()
+                info = INFfile.parse(line, name, full_path)
+            except (IOError, INFfile.INFfile_error), e:
+                raise DiskError("Couldn't read %s: %s" % (inf_name, e))
+            
+            load, exec_, access = info.load_address, info.execution_address, info.access
+            name = info.name.split(".")[-1]
+        elif match:
+            name = name[:match.start()]
+            load, exec_ = 0xfff00000 | (int(match.group(1), 16) << 8), 0
+        elif address_match:
+            name = name[:address_match.start()]
+            load = int(address_match.group(1), 16)
+            exec_ = int(address_match.group(2), 16)
+        else:
+            load, exec_ = 0, 0
+        
+        obj = ADFSfile(name.replace(".", "/"), None, load, exec_,
+                       os.path.getsize(full_path), _reader(full_path))
+        obj.access = access
+        objects.append(obj)
+    
+    return objects
@@ -21,24 +21,48 @@ __version__ = "0.4"
 __license__ = "GNU General Public License (version 3 or later)"
 
 import StringIO
-from diskutils import Directory, DiskError, File, Utilities
+from diskutils import Directory, DiskError, File, Geometry, Index, Utilities
 
 class Catalogue(Utilities):
 
-    def __init__(self, file):
+    """catalogue = Catalogue(file, tracks = 80, sectors_per_track = 10,
+                             interleaved = False, sector_size = 256)
+    
+    Represents the catalogue of an Acorn DFS disk image stored in the given
+    file object. The catalogue holds up to 31 files and occupies the first two
+    sectors of the disk.
+    
+    If interleaved is True, the image is treated as a double-sided (.dsd)
+    image in which the tracks of each side are interleaved, and the catalogue
+    of each side is read.
+    """
+    
+    max_files = 31
+    catalogue_sectors = 2
+    
+    def __init__(self, file, tracks = 80, sectors_per_track = 10,
+                       interleaved = False, sector_size = 256):
     
         self.file = file
-        self.sector_size = 256
-        self.track_size = 10 * self.sector_size
-        self.interleaved = False
+        self.sector_size = sector_size
+        self.sectors_per_track = sectors_per_track
+        self.track_size = sectors_per_track * self.sector_size
+        self.interleaved = interleaved
         
         # The free space map initially contains all the space after the
         # catalogue.
-        self.free_space = [(2, 798)]
-        self.sectors = 800
-        self.tracks = self.sectors / 10
+        self.sectors = tracks * sectors_per_track
+        self.tracks = tracks
+        self.free_space = [(self.catalogue_sectors,
+                            self.sectors - self.catalogue_sectors)]
         self.disk_cycle = 0
         self.boot_option = 0
+        
+        # The geometry of the disk is described when first needed.
+        self._geometry_key = None
+        
+        # The index of file names is created when first needed.
+        self._index = None
     
     def read_free_space(self):
     
@@ -51,13 +75,16 @@ class Catalogue(Utilities):
         disk_title, files = self.read_catalogue(0)
         
         if self.interleaved:
-            other_title, more_files = self.read_catalogue(self.track_size)
+            other_title, more_files = self.read_catalogue(self.track_size, 1)
             files += more_files
         
         return disk_title, files
     
-    def read_catalogue(self, offset):
+    def read_catalogue(self, offset, side = None):
     
+        if side is None:
+            side = self._side(offset)
+        
         disk_title = self._read(offset, 8) + self._read(offset + 0x100, 4)
         self.disk_cycle = self._read_unsigned_byte(self._read(offset + 0x104, 1))
         last_entry = self._read_unsigned_byte(self._read(offset + 0x105, 1))
@@ -66,6 +93,12 @@ class Catalogue(Utilities):
         self.sectors = sectors | ((extra & 0x03) << 8)
         self.boot_option = (extra & 0x30) >> 4
         
+        files = self._read_entries(offset, side, last_entry)
+        
+        return disk_title, files
+    
+    def _read_entries(self, offset, side, last_entry, first_sector = 0):
+    
         files = []
         p = 8
         
@@ -96,46 +129,45 @@ class Catalogue(Utilities):
             
             file_start_sector = self._read_unsigned_byte(self._read(offset + 0x100 + p + 7))
             file_start_sector = file_start_sector | ((extra & 0x03) << 8)
+            file_start_sector += first_sector
             
-            if not self.interleaved:
-                data = self._read(file_start_sector * self.sector_size, length)
-                disk_address = file_start_sector * self.sector_size
-            else:
-                data = ""
-                sector = file_start_sector
-                disk_address = self._disk_address(sector)
-                
-                while len(data) < length:
-                
-                    addr = offset + self._disk_address(sector)
-                    data += self._read(addr, min(self.sector_size, length - len(data)))
-                    sector += 1
+            data = self._read_sectors(side, file_start_sector, length)
+            disk_address = self._disk_address(file_start_sector, side)
             
             files.append(File(prefix + "." + name, data, load, exec_, length, locked,
                               disk_address))
             
             p += 8
         
-        return disk_title, files
+        return files
     
     def write(self, disk_title, files):
     
+        if len(files) > self.max_files:
+            raise DiskError("Too many entries to write.")
+        
+        self.write_catalogue(0, disk_title, files[:31])
+    
+    def write_catalogue(self, offset, disk_title, files, side = 0):
+    
         if len(files) > 31:
             raise DiskError("Too many entries to write.")
         
+        self._index = None
+        
         disk_name = self._pad(self._safe(disk_title), 12, " ")
-        self._write(0, disk_title[:8])
-        self._write(0x100, disk_title[8:12])
+        self._write(offset, disk_title[:8])
+        self._write(offset + 0x100, disk_title[8:12])
         
         # Write the number of files and the disk cycle.
         self.disk_cycle += 1
-        self._write(0x104, self._write_unsigned_byte(self.disk_cycle))
-        self._write(0x105, self._write_unsigned_byte(len(files) * 8))
+        self._write(offset + 0x104, self._write_unsigned_byte(self.disk_cycle))
+        self._write(offset + 0x105, self._write_unsigned_byte(len(files) * 8))
         
         extra = (self.sectors >> 8) & 0x03
         extra = extra | (self.boot_option << 4)
-        self._write(0x106, self._write_unsigned_byte(extra))
-        self._write(0x107, self._write_unsigned_byte(self.sectors & 0xff))
+        self._write(offset + 0x106, self._write_unsigned_byte(extra))
+        self._write(offset + 0x107, self._write_unsigned_byte(self.sectors & 0xff))
         
         # The catalogue contains files in descending disk address order, so
         # allocate files starting at the end of the catalogue and work
@@ -146,33 +178,33 @@ class Catalogue(Utilities):
         
             prefix, name = file.name.split(".")
             name = self._pad(name, 7, " ")
-            self._write(p, name)
+            self._write(offset + p, name)
             
             extra = ord(prefix)
             if file.locked:
                 extra = extra | 128
             
-            self._write(p + 7, self._write_unsigned_byte(extra))
+            self._write(offset + p + 7, self._write_unsigned_byte(extra))
             
             load = file.load_address
             exec_ = file.execution_address
             length = file.length
             
-            self._write(0x100 + p, self._write_unsigned_half_word(load & 0xffff))
-            self._write(0x100 + p + 2, self._write_unsigned_half_word(exec_ & 0xffff))
-            self._write(0x100 + p + 4, self._write_unsigned_half_word(length & 0xffff))
+            self._write(offset + 0x100 + p, self._write_unsigned_half_word(load & 0xffff))
+            self._write(offset + 0x100 + p + 2, self._write_unsigned_half_word(exec_ & 0xffff))
+            self._write(offset + 0x100 + p + 4, self._write_unsigned_half_word(length & 0xffff))
             
             disk_address = self._find_space(file)
             file_start_sector = disk_address / self.sector_size
-            self._write(disk_address, file.data)
+            self._write_sectors(side, file_start_sector, file.data)
             
             extra = ((file_start_sector >> 8) & 0x03)
             extra = extra | ((load >> 14) & 0x0c)
             extra = extra | ((length >> 12) & 0x30)
             extra = extra | ((exec_ >> 10) & 0xc0)
             
-            self._write(0x100 + p + 6, self._write_unsigned_byte(extra))
-            self._write(0x100 + p + 7, self._write_unsigned_byte(file_start_sector & 0xff))
+            self._write(offset + 0x100 + p + 6, self._write_unsigned_byte(extra))
+            self._write(offset + 0x100 + p + 7, self._write_unsigned_byte(file_start_sector & 0xff))
             
             p -= 8
     
@@ -199,43 +231,308 @@ class Catalogue(Utilities):
         
         raise DiskError("Failed to find space for file: %s" % file.name)
     
-    def _disk_address(self, sector):
+    def index(self):
+    
+        """Returns an Index of the files on the disk, reading the catalogue if
+        it has not already been read."""
+        
+        if self._index is None:
+            disk_title, files = self.read()
+            self._index = Index(files)
+        
+        return self._index
+    
+    def _full_name(self, name):
+    
+        # Names without a directory are in the $ directory.
+        if name[1:2] != ".":
+            name = "$." + name
+        return name
+    
+    def lookup(self, name):
+    
+        """Returns the file with the given name, such as "$.ELITE", or None if
+        there is no such file. Names without a directory are assumed to be in
+        the $ directory and are compared without regard to case."""
+        
+        return self.index().lookup(self._full_name(name))
+    
+    def exists(self, name):
+    
+        """Returns True if a file with the given name exists on the disk."""
+        
+        return self.index().exists(self._full_name(name))
+    
+    def glob(self, pattern):
+    
+        """Returns a list of the files with names matching the pattern, which
+        may contain the * and # wildcards, in catalogue order."""
+        
+        return self.index().glob(self._full_name(pattern))
+    
+    def _side(self, offset):
+    
+        # The catalogue of the second side of an interleaved disk starts on
+        # the second track in the image.
+        if self.interleaved and offset >= self.track_size:
+            return 1
+        else:
+            return 0
+    
+    def _geometry(self):
+    
+        # Create a new geometry object if the properties of the disk have
+        # changed, so that its sector address tables can be reused for
+        # subsequent reads and writes.
+        key = (self.tracks, self.sectors_per_track, self.sector_size,
+               self.interleaved)
+        
+        if self._geometry_key != key:
+        
+            if self.interleaved:
+                sides = 2
+            else:
+                sides = 1
+            
+            self._geometry_obj = Geometry(self.tracks, self.sectors_per_track,
+                                          self.sector_size, sides,
+                                          self.interleaved)
+            self._geometry_key = key
+        
+        return self._geometry_obj
+    
+    def _read_sectors(self, side, sector, length):
+    
+        return self._geometry().read(self.file, sector, length, side)
+    
+    def _write_sectors(self, side, sector, data):
+    
+        self._geometry().write(self.file, sector, data, side)
+    
+    def _disk_address(self, sector, side = 0):
+    
+        if not self.interleaved:
+            return sector * self.sector_size
+        
+        return self._geometry().address(sector, side)
+
+
+class WatfordCatalogue(Catalogue):
+
+    """catalogue = WatfordCatalogue(file, tracks = 80, sectors_per_track = 10,
+                                    interleaved = False, sector_size = 256)
+    
+    Represents the 62 file catalogue used by Watford DFS. The first 31 files
+    are described by the standard catalogue in sectors 0 and 1. A second
+    catalogue in sectors 2 and 3, marked by eight &AA bytes in place of the
+    disk title, describes the remaining files.
+    """
+    
+    max_files = 62
+    catalogue_sectors = 4
+    marker = "\xaa" * 8
+    
+    def read_catalogue(self, offset, side = None):
+    
+        if side is None:
+            side = self._side(offset)
+        
+        disk_title, files = Catalogue.read_catalogue(self, offset, side)
+        
+        if self._read(offset + 0x200, 8) == self.marker:
+        
+            last_entry = self._read_unsigned_byte(self._read(offset + 0x305, 1))
+            files += self._read_entries(offset + 0x200, side, last_entry)
+        
+        return disk_title, files
+    
+    def write(self, disk_title, files):
     
-        track = sector/10
-        addr = 0
+        if len(files) > self.max_files:
+            raise DiskError("Too many entries to write.")
         
-        # Handle some .dsd files with interleaved tracks.
-        if track >= self.tracks:
-            track -= self.tracks
-            addr += self.track_size
+        self.write_catalogue(0, disk_title, files[:31])
         
-        addr += (track * self.track_size * 2) + ((sector % 10) * self.sector_size)
+        # Always write the second catalogue so that Watford DFS recognises
+        # the disk as a 62 file disk. Both catalogues share the disk cycle.
+        self.disk_cycle -= 1
+        self.write_catalogue(0x200, disk_title, files[31:])
+        self._write(0x200, self.marker)
+        self._write(0x300, "\x00" * 4)
+
+
+class OpusCatalogue(Catalogue):
+
+    """catalogue = OpusCatalogue(file, tracks = 80, sectors_per_track = 18,
+                                 interleaved = False, sector_size = 256)
+    
+    Represents the catalogues of an Opus DDOS double density disk. The disk is
+    divided into up to eight volumes, A to H, each with its own 31 file
+    catalogue stored in a pair of sectors at the start of track 0. A disk
+    catalogue in sector 16 of track 0 records the track on which each volume
+    starts. The start sector of each file is relative to the start of its
+    volume.
+    
+    The read() method returns the contents of volume A, as DDOS does by
+    default. Use read_volumes() to obtain the contents of all the volumes.
+    """
+    
+    volume_letters = "ABCDEFGH"
+    
+    def __init__(self, file, tracks = 80, sectors_per_track = 18,
+                       interleaved = False, sector_size = 256):
+    
+        Catalogue.__init__(self, file, tracks, sectors_per_track, interleaved,
+                           sector_size)
+    
+    def read(self):
+    
+        volumes = self.read_volumes()
+        
+        try:
+            return volumes["A"]
+        except KeyError:
+            raise DiskError("No volume A found on the disk.")
+    
+    def read_volumes(self, side = 0):
+    
+        """Returns a dictionary mapping the letter of each volume found on the
+        given side of the disk to a tuple containing the volume's title and a
+        list of its files."""
         
-        return addr
+        base = self._disk_address(16, side)
+        
+        volumes = {}
+        
+        for i in range(len(self.volume_letters)):
+        
+            start_track = self._read_unsigned_byte(self._read(base + 8 + (i * 2)))
+            if start_track == 0:
+                continue
+            
+            offset = self._disk_address(i * 2, side)
+            
+            disk_title = self._read(offset, 8) + self._read(offset + 0x100, 4)
+            last_entry = self._read_unsigned_byte(self._read(offset + 0x105, 1))
+            
+            files = self._read_entries(offset, side, last_entry,
+                                       start_track * self.sectors_per_track)
+            
+            volumes[self.volume_letters[i]] = (disk_title, files)
+        
+        return volumes
+    
+    def write(self, disk_title, files):
+    
+        raise DiskError("Writing Opus DDOS disks is not supported.")
 
 
 class Disk:
 
-    DiskSizes = {None: 200 * 1024}
-    SectorSizes = {None: 256}
-    Catalogues = {None: Catalogue}
+    """disk = Disk(format = None)
+    
+    Represents a DFS disk image in one of the formats registered using the
+    register_format() function. The default format is a single-sided, 80
+    track Acorn DFS disk.
+    
+    The lookup(), exists() and glob() methods find files in the catalogue of
+    the disk, which is read when it is first needed and kept until the disk
+    is opened again or a new disk is created.
+    """
+    
+    DiskSizes = {}
+    SectorSizes = {}
+    Geometries = {}
+    Catalogues = {}
     
     def __init__(self, format = None):
     
         self.format = format
+        self._catalogue = None
     
     def new(self):
     
+        self._catalogue = None
         self.size = self.DiskSizes[self.format]
         self.data = "\x00" * self.size
         self.file = StringIO.StringIO(self.data)
     
     def open(self, file_object):
     
+        self._catalogue = None
         self.size = self.DiskSizes[self.format]
         self.file = file_object
     
     def catalogue(self):
     
         sector_size = self.SectorSizes[self.format]
-        return self.Catalogues[self.format](self.file)
+        tracks, sectors_per_track, interleaved = self.Geometries[self.format]
+        return self.Catalogues[self.format](self.file, tracks,
+            sectors_per_track, interleaved, sector_size)
+    
+    def _indexed(self):
+    
+        # Return a catalogue that keeps its index between lookups.
+        if self._catalogue is None:
+            self._catalogue = self.catalogue()
+        
+        return self._catalogue
+    
+    def lookup(self, name):
+    
+        """Returns the file with the given name, or None if there is no such
+        file, as described for Catalogue.lookup()."""
+        
+        return self._indexed().lookup(name)
+    
+    def exists(self, name):
+    
+        """Returns True if a file with the given name exists on the disk."""
+        
+        return self._indexed().exists(name)
+    
+    def glob(self, pattern):
+    
+        """Returns a list of the files with names matching the pattern, as
+        described for Catalogue.glob()."""
+        
+        return self._indexed().glob(pattern)
+
+
+def register_format(format, catalogue_class, tracks, sectors_per_track,
+                    interleaved = False, sector_size = 256):
+
+    """Registers a disk format with the given name so that it can be used with
+    the Disk class. The catalogue_class is the class used to read and write the
+    catalogue of disks in the format. If interleaved is True, the format
+    describes double-sided disks with the tracks of each side interleaved.
+    """
+    
+    if interleaved:
+        sides = 2
+    else:
+        sides = 1
+    
+    Disk.DiskSizes[format] = tracks * sectors_per_track * sector_size * sides
+    Disk.SectorSizes[format] = sector_size
+    Disk.Geometries[format] = (tracks, sectors_per_track, interleaved)
+    Disk.Catalogues[format] = catalogue_class
+
+
+# Acorn DFS single and double-sided disks
+register_format(None, Catalogue, 80, 10)
+register_format("ssd40", Catalogue, 40, 10)
+register_format("ssd80", Catalogue, 80, 10)
+register_format("dsd40", Catalogue, 40, 10, interleaved = True)
+register_format("dsd80", Catalogue, 80, 10, interleaved = True)
+
+# Watford DFS 62 file disks
+register_format("watford40", WatfordCatalogue, 40, 10)
+register_format("watford80", WatfordCatalogue, 80, 10)
+register_format("watford-dsd40", WatfordCatalogue, 40, 10, interleaved = True)
+register_format("watford-dsd80", WatfordCatalogue, 80, 10, interleaved = True)
+
+# Opus DDOS double density disks
+register_format("opus40", OpusCatalogue, 40, 18)
+register_format("opus80", OpusCatalogue, 80, 18)
+register_format("opus-dsd80", OpusCatalogue, 80, 18, interleaved = True)
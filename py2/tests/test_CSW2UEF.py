@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+
+"""
+test_CSW2UEF.py - Tests for the CSW2UEF tool.
+
+Copyright (C) 2026 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os, shutil, subprocess, sys, tempfile, unittest
+
+here = os.path.dirname(os.path.abspath(__file__))
+package = os.path.dirname(here)
+sys.path.insert(0, package)
+
+import CSWfile, UEFfile
+
+
+class CorruptedBlockTest(unittest.TestCase):
+
+    def setUp(self):
+    
+        self.directory = tempfile.mkdtemp()
+    
+    def tearDown(self):
+    
+        shutil.rmtree(self.directory)
+    
+    def _run(self, *args):
+    
+        env = dict(os.environ)
+        env["PYTHONPATH"] = package
+        
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(package, "tools", "CSW2UEF.py")] + list(args),
+            stdout = subprocess.PIPE, stderr = subprocess.PIPE, env = env)
+        output, errors = process.communicate()
+        
+        return process.returncode, output, errors
+    
+    def test_invalid_block_header(self):
+    
+        uef = UEFfile.UEFfile(creator = "test_CSW2UEF")
+        uef.import_files(0, [("PROG", 0x1900, 0x8023, "x" * 600)])
+        
+        # Replace the header of the second block with one that contains no
+        # terminating zero byte after the file name.
+        chunk_id, data = uef.chunks[3]
+        uef.chunks[3] = (chunk_id, "*" + "\xff" * (len(data) - 1))
+        
+        csw_file = os.path.join(self.directory, "tape.csw")
+        uef_file = os.path.join(self.directory, "tape.uef")
+        CSWfile.CSWfile().write_chunks(csw_file, uef.chunks)
+        
+        status, output, errors = self._run(csw_file, uef_file)
+        
+        self.assertEqual(status, 1, errors)
+        self.assertEqual(errors, "")
+        self.assertTrue("invalid block header" in output)
+        self.assertTrue("3 blocks found, 1 with errors." in output)
+        
+        # The blocks on either side of the damaged one are written.
+        new_uef = UEFfile.UEFfile(uef_file)
+        self.assertEqual(len(new_uef.contents), 1)
+        self.assertEqual(new_uef.contents[0]["name"], "PROG")
+        self.assertEqual(new_uef.contents[0]["blocks"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -18,8 +18,8 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 
-import os, string, sys
-import ADFSlib
+import os, re, string, sys
+import ADFSlib, diskutils
 
 try:
 
@@ -63,12 +63,14 @@ def read_cmdsyntax_input(argv, syntax):
 
 def read_getopt_input(argv):
 
-    opts, args = getopt.getopt(argv[1:], "ldts:c:vh")
+    opts, args = getopt.getopt(argv[1:], "ldts:c:vhg:r:y:n:x:")
     
     match = {}
     
     opt_dict = {"-l": "list", "-d": "create-directory", "-t": "file-types", "-s": "separator",
-                "-v": "verify", "-c": "convert", "-h": "help"}
+                "-v": "verify", "-c": "convert", "-h": "help",
+                "-g": "glob", "-r": "regex", "-y": "types",
+                "-n": "min-size", "-x": "max-size"}
     arg_list = ["ADF file", "destination path"]
     
     # Read the options specified.
@@ -119,17 +121,60 @@ def read_getopt_input(argv):
     return match
 
 
+def read_size(value):
+
+    # Sizes may be given in decimal or, with a & prefix, in hexadecimal.
+    if value[:1] == "&":
+        return int(value[1:], 16)
+    else:
+        return int(value)
+
+
+def read_filter(match):
+
+    # Create a filter from the selection options given, or return None if
+    # there are none.
+    patterns = regex = filetypes = min_length = max_length = None
+    
+    if match.has_key("glob"):
+        patterns = string.split(match["glob"], ",")
+    
+    if match.has_key("regex"):
+        regex = match["regex"]
+    
+    if match.has_key("types"):
+        filetypes = string.split(match["types"], ",")
+    
+    if match.has_key("min-size"):
+        min_length = read_size(match["min-size"])
+    
+    if match.has_key("max-size"):
+        max_length = read_size(match["max-size"])
+    
+    if patterns is regex is filetypes is min_length is max_length is None:
+        return None
+    
+    return ADFSlib.ADFSfilter(patterns, regex, filetypes, min_length, max_length)
+
+
 if __name__ == "__main__":
     
     if use_getopt == 0:
     
         syntax = """
-        \r( (-l | --list) [-t | --file-types] <ADF file> ) |
+        \r( (-l | --list) [-t | --file-types]
+        \r  [(-g glob) | --glob=patterns] [(-r regex) | --regex=expression]
+        \r  [(-y types) | --types=types]
+        \r  [(-n min-size) | --min-size=bytes] [(-x max-size) | --max-size=bytes]
+        \r  <ADF file> ) |
         \r
         \r( [-d | --create-directory]
         \r  [ (-t | --file-types) [(-s separator) | --separator=character] ]
         \r  [(-c convert) | --convert=characters]
         \r  [-m | --time-stamps]
+        \r  [(-g glob) | --glob=patterns] [(-r regex) | --regex=expression]
+        \r  [(-y types) | --types=types]
+        \r  [(-n min-size) | --min-size=bytes] [(-x max-size) | --max-size=bytes]
         \r  <ADF file> <destination path> ) |
         \r
         \r( (-v | --verify) <ADF file> ) |
@@ -142,7 +187,8 @@ if __name__ == "__main__":
     else:
     
         syntax = "[-l] [-d] [-t] [-s separator] [-v] [-c characters] [-m] " + \
-                 "<ADF file> <destination path>"
+                 "[-g patterns] [-r regex] [-y types] [-n min-size] " + \
+                 "[-x max-size] <ADF file> <destination path>"
         match = read_getopt_input(sys.argv)
     
     if match == {} or match is None or \
@@ -189,6 +235,25 @@ if __name__ == "__main__":
         print "The -m flag determines whether the files extracted from the disc"
         print "image should retain their time stamps on the target system."
         print
+        print "The -g, -r, -y, -n and -x options select the files to be listed or"
+        print "extracted. Only the disc catalogue is used to select files, so the"
+        print "contents of other files are not read."
+        print
+        print "The -g option takes a comma separated list of wildcard patterns, one"
+        print "of which must match each file. In each pattern, * matches any sequence"
+        print "of characters and # matches a single character. Patterns containing a"
+        print "period are matched against the full path of each file; for example,"
+        print "$.Games.* matches the files in the Games directory."
+        print
+        print "The -r option takes a regular expression that must be found in the full"
+        print "path of each file."
+        print
+        print "The -y option takes a comma separated list of hexadecimal file types,"
+        print "such as FFB, one of which each file must have."
+        print
+        print "The -n and -x options specify the minimum and maximum lengths of files"
+        print "in bytes. Lengths prefixed with & are read as hexadecimal numbers."
+        print
         sys.exit()
     
     
@@ -213,6 +278,15 @@ if __name__ == "__main__":
     else:
         suffix = '.'
     
+    try:
+        file_filter = read_filter(match)
+    except ValueError:
+        print "Invalid file type or size given."
+        sys.exit()
+    except re.error, e:
+        print "Invalid regular expression: %s" % e
+        sys.exit()
+    
     if filetypes == 0 or (filetypes != 0 and use_separator == 0):
 
         # Use the standard suffix separator for the current platform if
@@ -220,10 +294,14 @@ if __name__ == "__main__":
         separator = suffix
     
     
-    # Try to open the ADFS disc image file.
+    # Try to open the ADFS disc image file, which may be compressed.
     
     try:
-        adf = open(adf_file, "rb")
+        adf = diskutils.open_image(adf_file)
+    except diskutils.DiskError, e:
+        print "Couldn't read the ADF file: %s" % e
+        print
+        sys.exit()
     except IOError:
         print "Couldn't open the ADF file: %s" % adf_file
         print
@@ -283,7 +361,11 @@ if __name__ == "__main__":
         print 'Contents of', adfsdisc.disc_name,':'
         print
         
-        adfsdisc.print_catalogue(adfsdisc.files, adfsdisc.root_name, filetypes)
+        files = adfsdisc.files
+        if file_filter is not None:
+            files = adfsdisc.select(file_filter, files)
+        
+        adfsdisc.print_catalogue(files, adfsdisc.root_name, filetypes)
         
         print
         
@@ -328,7 +410,7 @@ if __name__ == "__main__":
     # Extract the files
     adfsdisc.extract_files(
         out_path, adfsdisc.files, filetypes, separator, convert_dict,
-        with_time_stamps
+        with_time_stamps, file_filter
         )
     
     # Exit
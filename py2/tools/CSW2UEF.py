@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+"""
+CSW2UEF.py - Convert CSW files to UEF files.
+
+Copyright (C) 2026 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "David Boddie <david@boddie.org.uk>"
+__date__ = "2026-10-19"
+__version__ = "0.1"
+__license__ = "GNU General Public License (version 3 or later)"
+
+import sys
+import CSWfile, UEFaudio, UEFfile
+
+
+def usage():
+
+    sys.stderr.write("Usage: %s <CSW file> <UEF file>\n\n" % sys.argv[0])
+    sys.stderr.write("Decodes the tape signal stored in the CSW file and writes the data found to\n")
+    sys.stderr.write("the UEF file.\n")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+
+    args = sys.argv[1:]
+    
+    if len(args) != 2:
+        usage()
+    
+    csw_file, uef_file = args
+    
+    try:
+        decoder = CSWfile.CSWfile(csw_file).decode()
+    except CSWfile.CSWfile_error, e:
+        sys.stderr.write(str(e) + "\n")
+        sys.exit(1)
+    
+    # Blocks that cannot be decoded are not included in the chunks, so the
+    # good blocks are written even if others are damaged.
+    uef = UEFaudio.to_uef(decoder.chunks, "CSW2UEF " + __version__)
+    
+    try:
+        uef.write(uef_file, write_emulator_info = False)
+    except UEFfile.UEFfile_error, e:
+        sys.stderr.write(str(e) + "\n")
+        sys.exit(1)
+    
+    for message in decoder.errors:
+        print message
+    
+    print "%i blocks found, %i with errors." % (decoder.blocks, decoder.bad_blocks)
+    if decoder.framing_errors:
+        print "%i framing errors." % decoder.framing_errors
+    
+    if decoder.bad_blocks:
+        sys.exit(1)
+    
+    sys.exit()
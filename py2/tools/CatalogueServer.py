@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+
+"""
+CatalogueServer.py - Serve the catalogues and files of disc and tape images.
+
+Copyright (C) 2026 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "David Boddie <david@boddie.org.uk>"
+__date__ = "2026-10-19"
+__version__ = "0.1"
+__license__ = "GNU General Public License (version 3 or later)"
+
+import json, os, re, sys, urlparse
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+import ADFSlib, diskutils, imagecache, makedfs, UEFfile
+
+
+class ServerError(Exception):
+
+    """Raised with an HTTP status code and message when a request cannot be
+    handled."""
+    
+    def __init__(self, status, message):
+    
+        Exception.__init__(self, message)
+        self.status = status
+
+
+def _text(s):
+
+    # Names in images are byte strings which may contain any character, so
+    # convert them to Unicode using the Latin-1 encoding to make them safe
+    # for encoding as JSON.
+    return s.decode("latin-1")
+
+
+class Image:
+
+    """image = Image(path)
+    
+    Reads the disc or tape image at the given path and provides its catalogue
+    and the contents of its files. Disc images may be compressed.
+    """
+    
+    def __init__(self, path):
+    
+        self.path = path
+        fs, format = diskutils.image_type(path) or (None, None)
+        
+        if fs == "adfs":
+            self.kind = "adfs"
+            disc = ADFSlib.ADFSdisc(diskutils.open_image(path))
+            self.title = disc.disc_name
+            self.files = []
+            self._read_adfs(disc.files, "$")
+        
+        elif fs == "dfs":
+            self.kind = "dfs"
+            disk = makedfs.Disk(format)
+            f = diskutils.open_image(path)
+            try:
+                disk.open(f)
+                self.title, files = disk.catalogue().read()
+            finally:
+                f.close()
+            self.title = self.title.rstrip("\x00 ")
+            self.files = []
+            for file in files:
+                self.files.append((file.name, file))
+        
+        elif fs == "uef":
+            self.kind = "uef"
+            uef = UEFfile.UEFfile(path)
+            self.title = uef.creator
+            self.files = []
+            for details in uef.contents:
+                self.files.append((details["name"], TapeFile(details)))
+        
+        else:
+            suffix = os.path.splitext(diskutils.uncompressed_name(path))[1]
+            raise ServerError(415, "Unsupported image type: %s" % suffix)
+        
+        self.index = diskutils.Index([file for name, file in self.files],
+                                     [name for name, file in self.files])
+    
+    def _read_adfs(self, objects, path):
+    
+        for obj in objects:
+        
+            obj_path = path + "." + obj.name
+            
+            if isinstance(obj, ADFSlib.ADFSdirectory):
+                self._read_adfs(obj.files, obj_path)
+            else:
+                self.files.append((obj_path, obj))
+    
+    def catalogue(self):
+    
+        """Returns a dictionary describing the image and its files, suitable
+        for encoding as JSON."""
+        
+        files = []
+        for index in range(len(self.files)):
+            name, file = self.files[index]
+            files.append({"index": index, "name": _text(name),
+                          "load": file.load_address,
+                          "exec": file.execution_address,
+                          "length": file.length})
+        
+        return {"kind": self.kind, "title": _text(self.title), "files": files}
+    
+    def find(self, name = None, index = None):
+    
+        """Returns the file with the given name, or at the given index in the
+        catalogue. Raises a ServerError if it cannot be found."""
+        
+        if index is not None:
+            try:
+                return self.files[int(index)][1]
+            except (IndexError, ValueError):
+                raise ServerError(404, "No file with index %s." % index)
+        
+        if name is None:
+            raise ServerError(400, "No file specified.")
+        
+        file = self.index.lookup(name)
+        if file is not None:
+            return file
+        
+        raise ServerError(404, "No file called %s." % name)
+
+
+class TapeFile:
+
+    """file = TapeFile(details)
+    
+    Represents a file in the contents list of a UEFfile object using the same
+    attributes as the files in disc images.
+    """
+    
+    def __init__(self, details):
+    
+        self.name = details["name"]
+        self.data = details["data"]
+        self.length = len(self.data)
+        self.load_address = details["load"]
+        self.execution_address = details["exec"]
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+
+    server_version = "CatalogueServer/" + __version__
+    
+    def do_GET(self):
+    
+        url = urlparse.urlparse(self.path)
+        query = urlparse.parse_qs(url.query)
+        
+        try:
+            if url.path == "/catalogue":
+                image = self.server.image(self._image_path(query))
+                self._send_json(image.catalogue())
+            
+            elif url.path == "/file":
+                image = self.server.image(self._image_path(query))
+                file = image.find(self._value(query, "name"),
+                                  self._value(query, "index"))
+                self._send_data(file.data)
+            
+            else:
+                raise ServerError(404, "Unknown request: %s" % url.path)
+        
+        except ServerError, e:
+            self._send_error(e.status, str(e))
+        except (ADFSlib.ADFS_exception, diskutils.DiskError,
+                UEFfile.UEFfile_error, EnvironmentError), e:
+            self._send_error(422, "Failed to read the image: %s" % e)
+        except Exception, e:
+            self._send_error(500, "%s: %s" % (e.__class__.__name__, e))
+    
+    def _value(self, query, key):
+    
+        values = query.get(key)
+        if values:
+            return values[0]
+        return None
+    
+    def _image_path(self, query):
+    
+        # Resolve the image path relative to the root directory and refuse
+        # any path that leads outside it.
+        path = self._value(query, "image")
+        if path is None:
+            raise ServerError(400, "No image specified.")
+        
+        root = self.server.root
+        full_path = os.path.realpath(os.path.join(root, path))
+        
+        if not full_path.startswith(root + os.sep):
+            raise ServerError(403, "Image is outside the served directory.")
+        if not os.path.isfile(full_path):
+            raise ServerError(404, "No such image: %s" % path)
+        
+        return full_path
+    
+    def _send_json(self, obj):
+    
+        body = json.dumps(obj)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _send_data(self, data):
+    
+        # Support single byte ranges so that clients can fetch parts of
+        # large files.
+        length = len(data)
+        header = self.headers.get("Range")
+        match = header and re.match(r"bytes=(\d*)-(\d*)$", header.strip())
+        
+        if match and (match.group(1) or match.group(2)):
+        
+            first, last = match.groups()
+            if first:
+                first = int(first)
+                if last:
+                    last = min(int(last), length - 1)
+                else:
+                    last = length - 1
+            else:
+                first = max(length - int(last), 0)
+                last = length - 1
+            
+            if first >= length or first > last:
+                self.send_response(416)
+                self.send_header("Content-Range", "bytes */%i" % length)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes %i-%i/%i" % (first, last, length))
+            data = data[first:last + 1]
+        else:
+            self.send_response(200)
+        
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def _send_error(self, status, message):
+    
+        body = json.dumps({"error": message})
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class CatalogueServer(ThreadingMixIn, HTTPServer):
+
+    """server = CatalogueServer(address, root, budget = 64 * 1024 * 1024)
+    
+    Serves the catalogues and files of the images in the root directory at the
+    given (host, port) address, handling each request in its own thread.
+    Recently used images are kept in memory until the size of their contents
+    exceeds the budget in bytes.
+    """
+    
+    daemon_threads = True
+    
+    def __init__(self, address, root, budget = 64 * 1024 * 1024):
+    
+        HTTPServer.__init__(self, address, RequestHandler)
+        self.root = os.path.realpath(root)
+        self.cache = imagecache.ImageCache(budget)
+    
+    def image(self, path):
+    
+        """Returns the Image object for the image at the given path, reading
+        it if it is not already in the cache."""
+        
+        return self.cache.get(imagecache.image_key(path), lambda: Image(path))
+
+
+def usage():
+
+    sys.stderr.write("Usage: %s [-p <port>] <directory>\n\n" % sys.argv[0])
+    sys.stderr.write("Serves the catalogues and files of the disc and tape images in the directory\n")
+    sys.stderr.write("on the local host. Requests take the following forms:\n\n")
+    sys.stderr.write("  /catalogue?image=<path>\n")
+    sys.stderr.write("  /file?image=<path>&name=<file name>\n")
+    sys.stderr.write("  /file?image=<path>&index=<catalogue index>\n")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+
+    args = sys.argv[1:]
+    port = 8000
+    
+    if args[:1] == ["-p"]:
+        try:
+            port = int(args[1])
+        except (IndexError, ValueError):
+            usage()
+        args = args[2:]
+    
+    if len(args) != 1 or not os.path.isdir(args[0]):
+        usage()
+    
+    server = CatalogueServer(("127.0.0.1", port), args[0])
+    print "Serving %s on http://127.0.0.1:%i/" % (args[0], port)
+    
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    
+    sys.exit()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+"""
+CheckADF.py - Check the structure of ADFS disc images.
+
+Copyright (C) 2026 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "David Boddie <david@boddie.org.uk>"
+__date__ = "2026-10-19"
+__version__ = "0.1"
+__license__ = "GNU General Public License (version 3 or later)"
+
+import json, os, sys
+import ADFSverify
+from diskutils import uncompressed_name
+
+# Suffixes of the disc images found in directories
+suffixes = (".adf", ".adl", ".adm", ".ads", ".add")
+
+
+def find_images(paths):
+
+    """Returns a list of the disc images given by paths, expanding any
+    directories to the images with recognised suffixes that they contain,
+    including those in subdirectories and compressed images."""
+    
+    images = []
+    
+    for path in paths:
+    
+        if os.path.isdir(path):
+            for dir_path, dir_names, names in os.walk(path):
+                dir_names.sort()
+                names.sort()
+                for name in names:
+                    if os.path.splitext(uncompressed_name(name))[1].lower() in suffixes:
+                        images.append(os.path.join(dir_path, name))
+        else:
+            images.append(path)
+    
+    return images
+
+
+def usage():
+
+    sys.stderr.write("Usage: %s [-j <jobs>] [-q | -J] <image or directory> ...\n\n" % sys.argv[0])
+    sys.stderr.write("Checks the structure of the ADFS disc images given, including those in any\n")
+    sys.stderr.write("directories, using a worker process for each processor or the number of jobs\n")
+    sys.stderr.write("given. A summary of the results is printed for each image, followed by any\n")
+    sys.stderr.write("problems found. The -q option only prints the images that contain errors.\n")
+    sys.stderr.write("The -J option prints the results for each image as a line of JSON.\n\n")
+    sys.stderr.write("The exit status is 1 if errors were found in any image.\n")
+    sys.exit(2)
+
+
+if __name__ == "__main__":
+
+    args = sys.argv[1:]
+    jobs = None
+    quiet = False
+    use_json = False
+    
+    while args[:1] and args[0].startswith("-"):
+    
+        if args[0] == "-j":
+            try:
+                jobs = int(args[1])
+            except (IndexError, ValueError):
+                usage()
+            args = args[2:]
+        elif args[0] == "-q":
+            quiet = True
+            args = args[1:]
+        elif args[0] == "-J":
+            use_json = True
+            args = args[1:]
+        else:
+            usage()
+    
+    if not args:
+        usage()
+    
+    failed = 0
+    
+    for report in ADFSverify.verify_images(find_images(args), jobs):
+    
+        if not report.ok():
+            failed += 1
+        
+        if use_json:
+            print json.dumps(report.as_dict())
+        
+        elif not quiet or not report.ok():
+        
+            print "%s: %s" % (report.path, report.summary())
+            for problem in report.problems:
+                print "   ", problem
+    
+    if failed:
+        sys.exit(1)
+    
+    sys.exit()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+
+"""
+DIR2ADF.py - Create ADFS disc images from directories and other disc images.
+
+Copyright (C) 2026 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "David Boddie <david@boddie.org.uk>"
+__date__ = "2026-10-19"
+__version__ = "0.1"
+__license__ = "GNU General Public License (version 3 or later)"
+
+import os, sys
+import ADFSlib, makeadfs
+from diskutils import DiskError, open_image
+
+# Formats chosen using the suffix of the image file
+format_suffixes = {".ads": "ads", ".adm": "adm", ".adl": "adl"}
+
+
+def usage():
+
+    sys.stderr.write("Usage: %s [-f <format>] [-t <title>] [-b <boot option>] <directory|image file> <image file>\n\n" % sys.argv[0])
+    sys.stderr.write("Creates an ADFS disc image containing the files in a directory, or the files\n")
+    sys.stderr.write("in another ADFS disc image. Load and execution addresses are read from .inf\n")
+    sys.stderr.write("files and ,xxx filetype suffixes.\n\n")
+    sys.stderr.write("The format is one of ads, adm, adl, adD, adE or adEbig (F format). By default,\n")
+    sys.stderr.write("it is chosen using the suffix of the new image file. The boot option is a\n")
+    sys.stderr.write("number from 0 to 3.\n")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+
+    args = sys.argv[1:]
+    format = None
+    title = ""
+    boot_option = 0
+    
+    while args[:1] and args[0].startswith("-"):
+    
+        if args[0] == "-f" and len(args) > 1:
+            format = args[1]
+            args = args[2:]
+        elif args[0] == "-t" and len(args) > 1:
+            title = args[1]
+            args = args[2:]
+        elif args[0] == "-b" and len(args) > 1 and args[1] in ("0", "1", "2", "3"):
+            boot_option = int(args[1])
+            args = args[2:]
+        else:
+            usage()
+    
+    if len(args) != 2:
+        usage()
+    
+    source, image_file = args
+    
+    if format is None:
+        format = format_suffixes.get(os.path.splitext(image_file)[1].lower())
+        if format is None:
+            sys.stderr.write("Please specify the format of the image file with -f.\n")
+            sys.exit(1)
+    
+    if not makeadfs.old_map_formats.has_key(format) and \
+       not makeadfs.new_map_formats.has_key(format):
+        sys.stderr.write("Unsupported format: %s\n" % format)
+        sys.exit(1)
+    
+    try:
+        if os.path.isdir(source):
+            files = makeadfs.read_directory(source)
+        else:
+            disc = ADFSlib.ADFSdisc(open_image(source))
+            files = disc.files
+            if not title:
+                title = disc.disc_name
+        
+        disc = makeadfs.disc_image(format, title, boot_option)
+        disc.build(files)
+        
+        f = open(image_file, "wb")
+        try:
+            f.write(disc.image())
+        finally:
+            f.close()
+    
+    except (ADFSlib.ADFS_exception, DiskError), e:
+        sys.stderr.write(str(e) + "\n")
+        sys.exit(1)
+    except IOError, e:
+        sys.stderr.write("%s\n" % e)
+        sys.exit(1)
+    
+    print "%i files and %i directories written to %s" % (
+        disc.files, disc.directories - 1, image_file)
+    sys.exit()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+
+"""
+DefragADF.py - Report fragmentation in ADFS disc images and compact them.
+
+Copyright (C) 2026 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "David Boddie <david@boddie.org.uk>"
+__date__ = "2026-10-19"
+__version__ = "0.1"
+__license__ = "GNU General Public License (version 3 or later)"
+
+import json, sys
+import ADFSlib, ADFSdefrag, makeadfs
+from diskutils import DiskError, open_image
+
+
+def usage():
+
+    sys.stderr.write("Usage: %s [-J] [-f <format>] <image file> [<new image file>]\n\n" % sys.argv[0])
+    sys.stderr.write("Reports the fragmentation of the files and free space in an ADFS disc image,\n")
+    sys.stderr.write("listing the files that are stored in more than one fragment. The -J option\n")
+    sys.stderr.write("prints the results as a line of JSON.\n\n")
+    sys.stderr.write("If a new image file is given, the files in the disc image are written to it\n")
+    sys.stderr.write("with each file stored in as few fragments as possible and the free space\n")
+    sys.stderr.write("gathered together. The format of the new image is the same as the original\n")
+    sys.stderr.write("unless another is given with the -f option, and is one of ads, adm, adl, adD,\n")
+    sys.stderr.write("adE or adEbig (F format).\n")
+    sys.exit(1)
+
+
+def show(report):
+
+    if use_json:
+        print json.dumps(report.as_dict())
+    else:
+        print "%s: %s" % (report.path, report.summary())
+        for path, fragments in report.fragmented():
+            print "    %s: %i fragments" % (path, fragments)
+
+
+if __name__ == "__main__":
+
+    args = sys.argv[1:]
+    format = None
+    use_json = False
+    
+    while args[:1] and args[0].startswith("-"):
+    
+        if args[0] == "-f" and len(args) > 1:
+            format = args[1]
+            args = args[2:]
+        elif args[0] == "-J":
+            use_json = True
+            args = args[1:]
+        else:
+            usage()
+    
+    if len(args) not in (1, 2):
+        usage()
+    
+    if format is not None and not makeadfs.old_map_formats.has_key(format) \
+       and not makeadfs.new_map_formats.has_key(format):
+        sys.stderr.write("Unsupported format: %s\n" % format)
+        sys.exit(1)
+    
+    try:
+        f = open_image(args[0])
+        try:
+            disc = ADFSlib.ADFSdisc(f)
+        finally:
+            f.close()
+        
+        show(ADFSdefrag.analyse(disc, args[0]))
+        
+        if len(args) == 2:
+        
+            data = ADFSdefrag.compact(disc, format)
+            
+            f = open(args[1], "wb")
+            try:
+                f.write(data)
+            finally:
+                f.close()
+            
+            show(ADFSdefrag.analyse_image(args[1]))
+    
+    except (ADFSlib.ADFS_exception, DiskError), e:
+        sys.stderr.write(str(e) + "\n")
+        sys.exit(1)
+    except IOError, e:
+        sys.stderr.write("%s\n" % e)
+        sys.exit(1)
+    
+    sys.exit()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+
+"""
+IMG2ZIP.py - Store the contents of disc and tape images in zip and tar files.
+
+Copyright (C) 2026 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "David Boddie <david@boddie.org.uk>"
+__date__ = "2026-10-19"
+__version__ = "0.1"
+__license__ = "GNU General Public License (version 3 or later)"
+
+import os, sys
+import ADFSlib, archives, makedfs, UEFfile
+from diskutils import DiskError, image_type, open_image
+
+
+def usage():
+
+    sys.stderr.write("Usage: %s [-f <format>] [-m <meta-data>] <image file> <archive file>\n\n" % sys.argv[0])
+    sys.stderr.write("Stores the files in an ADFS, DFS or UEF image in a zip or tar archive. If the\n")
+    sys.stderr.write("archive file is -, the archive is written to standard output.\n\n")
+    sys.stderr.write("The format is one of zip, tar, tar.gz or tar.bz2. By default, it is chosen\n")
+    sys.stderr.write("using the suffix of the archive file, or zip for standard output.\n\n")
+    sys.stderr.write("The meta-data type determines how load and execution addresses are stored:\n\n")
+    sys.stderr.write("  inf       in .inf members following each file (the default)\n")
+    sys.stderr.write("  filetype  as ,xxx filetype suffixes where possible, otherwise in .inf\n")
+    sys.stderr.write("            members\n")
+    sys.stderr.write("  riscos    in RISC OS extra fields (zip archives only)\n")
+    sys.exit(1)
+
+
+def read_members(path):
+
+    # Return an iterator over the members for the files in the image, which
+    # may be compressed.
+    image = image_type(path)
+    
+    if image is None:
+        sys.stderr.write("Unsupported image type: %s\n" % os.path.splitext(path)[1])
+        sys.exit(1)
+    
+    fs, format = image
+    
+    if fs == "adfs":
+        disc = ADFSlib.ADFSdisc(open_image(path))
+        return archives.adfs_members(disc)
+    
+    elif fs == "dfs":
+        disk = makedfs.Disk(format)
+        f = open_image(path)
+        try:
+            disk.open(f)
+            title, files = disk.catalogue().read()
+        finally:
+            f.close()
+        return archives.dfs_members(files)
+    
+    else:
+        return archives.uef_members(UEFfile.UEFfile(path))
+
+
+if __name__ == "__main__":
+
+    args = sys.argv[1:]
+    format = None
+    metadata = "inf"
+    
+    while args[:1] and args[0].startswith("-") and args[0] != "-":
+    
+        if args[0] == "-f" and len(args) > 1:
+            format = args[1]
+            args = args[2:]
+        elif args[0] == "-m" and len(args) > 1:
+            metadata = args[1]
+            args = args[2:]
+        else:
+            usage()
+    
+    if len(args) != 2:
+        usage()
+    
+    image_file, archive_file = args
+    
+    if format is None:
+        if archive_file == "-":
+            format = "zip"
+        else:
+            format = archives.format_from_name(archive_file) or "zip"
+    
+    try:
+        members = read_members(image_file)
+        
+        if archive_file == "-":
+            out = sys.stdout
+        else:
+            out = open(archive_file, "wb")
+        
+        complete = False
+        try:
+            archives.write_archive(members, out, format, metadata)
+            complete = True
+        finally:
+            if out is not sys.stdout:
+                out.close()
+                # Remove an archive that is missing some of its members.
+                if not complete:
+                    os.remove(archive_file)
+    
+    except (archives.ArchiveError, ADFSlib.ADFS_exception, DiskError,
+            UEFfile.UEFfile_error), e:
+        sys.stderr.write(str(e) + "\n")
+        sys.exit(1)
+    except IOError, e:
+        sys.stderr.write("%s\n" % e)
+        sys.exit(1)
+    
+    sys.exit()
@@ -20,148 +20,23 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-import gzip, os, string, sys
+import mmap, os, string, sys
 import cmdsyntax
+import INFfile, UEFfile
 
-def find_in_list(l, s):
 
-    try:
-        i = l.index(s)
-    except ValueError:
-        return -1
-    
-    return i
-
-
-def number(size, n):
-
-    # Little endian writing
-
-    s = ""
-
-    while size > 0:
-        i = n % 256
-        s = s + chr(i)
-        n = n >> 8
-        size = size - 1
-
-    return s
-
-
-def hex2num(s):
-
-    n = 0
-
-    for i in range(0,len(s)):
-
-        a = ord(s[len(s)-i-1])
-        if (a >= 48) & (a <= 57):
-            n = n | ((a-48) << (i*4))
-        elif (a >= 65) & (a <= 70):
-            n = n | ((a-65+10) << (i*4))
-        elif (a >= 97) & (a <= 102):
-            n = n | ((a-97+10) << (i*4))
-        else:
-            sys.stderr.write("Bad hex: %s\n\n" % s)
-            sys.exit(1)
-
-    return n
-
-
-def chunk(f, n, data):
-
-    # Chunk ID
-    f.write(number(2, n))
-    # Chunk length
-    f.write(number(4, len(data)))
-    # Data
-    f.write(data)
-
-
-def rol(n, c):
-
-    n = n << 1
-
-    if (n & 256) != 0:
-        carry = 1
-        n = n & 255
-    else:
-        carry = 0
-
-    n = n | c
-
-    return n, carry
-
-
-def crc(s):
-
-    high = 0
-    low = 0
-
-    for i in s:
-
-        high = high ^ ord(i)
-
-        for j in range(0,8):
-
-            a, carry = rol(high, 0)
-
-            if carry == 1:
-                high = high ^ 8
-                low = low ^ 16
-
-            low, carry = rol(low, carry)
-            high, carry = rol(high, carry)
-
-    return high | (low << 8)
-
-
-def read_block(f, name, load, exe, length, n):
-
-    block = f.read(256)
-
-    # Write the alignment character
-    out = "*"+name[:10]+"\000"
-
-    # Load address
-    out = out + number(4, load)
-
-    # Execution address
-    out = out + number(4, exe)
-
-    # Block number
-    out = out + number(2, n)
-
-    # Block length
-    out = out + number(2, len(block))
-
-    # Block flag (last block)
-    if f.tell() == length:
-        out = out + number(1, 128)
-        last = 1
-    else:
-        if len(block) == 256:
-            out = out + number(1, 0)
-            last = 0
-        else:
-            out = out + number(1, 128) # shouldn't be needed 
-            last = 1 
+def read_data(path):
 
-    # Next address
-    out = out + number(2, 0)
-
-    # Unknown
-    out = out + number(2, 0)
-
-    # Header CRC
-    out = out + number(2, crc(out[1:]))
-
-    out = out + block
-
-    # Block CRC
-    out = out + number(2, crc(block))
-
-    return out, last
+    # Map the file into memory so that its blocks can be encoded directly
+    # from the file's contents without reading it in small pieces.
+    in_file = open(path, "rb")
+    try:
+        in_file.seek(0, 2)
+        if in_file.tell() == 0:
+            return ""
+        return mmap.mmap(in_file.fileno(), 0, access = mmap.ACCESS_READ)
+    finally:
+        in_file.close()
 
 
 if __name__ == "__main__":
@@ -215,6 +90,9 @@ if __name__ == "__main__":
         compress = 0
     
     
+    # Information read from the .inf files, indexed by file name
+    inf_details = {}
+    
     # See if there is an index file
     
     index_file = in_dir + os.sep + "index" + suffix + "txt"
@@ -242,147 +120,46 @@ if __name__ == "__main__":
     # in which they are to be stored in the UEF file
     if no_index == 1:
     
-        # List all the files
-        files = os.listdir(in_dir)
-    
-        # Keep all the .inf files
-        infs = []
-        for i in files:
-            if string.lower(i[-4:]) == (suffix+"inf"):
-                infs.append(i)
-    
-        # Find the file which follows each file and the real name of the file
-        nexts = []
-        names = []
-        for i in infs:
-            # Read the .inf file
-            details = string.split(open(in_dir+os.sep+i, "r").readline())
-    
-            # First entry may be the name of the file assuming $.name
-            # or similar
-            if string.find(details[0], ".") != -1:
-                # Add the real name to the list of names
-                names.append(details[0])
-                details = details[1:]
-            else:
-                # Add the file name to the list of names
-                names.append("$."+i)
-    
-            # Next two entries should be the load and execution addresses
-            details = details[2:]
-    
-            if len(details) >= 2:
-                # Next file should be the last two entries in the list
-                if string.upper(details[-2]) == "NEXT":
-                    # Next file
-                    nexts.append(details[-1])
-                elif string.upper(details[-1][:5]) == "NEXT=":
-                    # Next file
-                    nexts.append(details[-1][5:])
-                else:
-                    # No next file
-                    nexts.append("")
-    
-            elif len(details) == 1:
-                # Not enough entries for there to be a NEXT <file> entry
-                # Add to the end of the list (could be the last file)
-                if string.upper(details[-1][:5]) == "NEXT=":
-                    # Next file
-                    nexts.append(details[-1][5:])
-                else:
-                    nexts.append("")
-            else:
-                nexts.append("")
+        # Read all the .inf files, using a pool of threads to overlap the
+        # reading of the many small files involved
+        try:
+            infos = INFfile.scan(in_dir, threads = 8)
+        except INFfile.INFfile_error, e:
+            sys.stderr.write("%s\n" % e)
+            sys.exit(1)
     
-        # Determine the order of files
+        # Determine the order of files by following the NEXT references
         index = []
         real_names = []
     
-        # Insert files before the ones they specify as next files
-        # Look through the .inf file list and real name list
-        for i in range(0,len(infs)):
+        for info in INFfile.order(infos):
     
-            # Determine which files precedes this one
-            which = find_in_list(nexts, names[i])
-            if which == -1:
-                # No files precede this one
-                index.insert(0, infs[i][:-4])
-                real_names.insert(0, names[i])
-            else:
-                # Find the preceding file in the new
-                # real names list
-                which = find_in_list(real_names, names[which])
-    
-                if which != -1:
-                    # File is there, so add this one after it
-                    index.insert(which+1, infs[i][:-4])
-                    real_names.insert(which+1, names[i])
-                else:
-                    # File is not (yet) present
-    
-                    # Determine whether there is a file following
-                    # this one
-                    if nexts[i] != "":
-    
-                        # Is the file in the new list?
-                        which = find_in_list(real_names, nexts[i])
+            file_name = os.path.split(info.path)[1]
+            index.append(file_name)
+            inf_details[file_name] = info
             
-                        if which != -1:
-                            # Insert this file before the file in question
-                            index.insert(which, infs[i][:-4])
-                            real_names.insert(which, names[i])
-                        else:
-                            # File isn't in the new list
-                            index.append(infs[i][:-4])
-                            real_names.append(names[i])
-    
-                    else:
-                        # No files follow this one
-                        index.append(infs[i][:-4])
-                        real_names.append(names[i])
+            # The name in the .inf file may be the name of the file assuming
+            # $.name or similar
+            if string.find(info.name, ".") != -1:
+                real_names.append(info.name)
+            else:
+                real_names.append("$."+info.name)
     
     
     
     # Create the UEF file
     
-    try:
-        if compress == 1:
-            uef = gzip.open(uef_file, "wb")
-        else:
-            uef = open(uef_file, "wb")
-    except:
-        sys.stderr.write("Couldn't open the UEF file, %s\n" % uef_file)
-        sys.exit(1)
-    
-    # Write the UEF file header
-    
-    uef.write("UEF File!\000")
-    
-    # Minor and major version numbers
-    
-    uef.write(number(1, 6) + number(1, 0))
-    
-    # Begin writing chunks
-    
-    # Creator chunk
-    
-    we_are = "INF2UEF "+version+"\000"
-    if (len(we_are) % 4) != 0:
-        we_are = we_are + ("\000"*(4-(len(we_are) % 4)))
-    
-    # Write this program's details
-    chunk(uef, 0, we_are)
-    
-    
-    # Platform chunk
-    
-    chunk(uef, 5, number(1, 1))    # Electron with any keyboard layout
+    uef = UEFfile.UEFfile(creator = "INF2UEF "+version)
     
+    # Use the same version number as earlier versions of this tool and
+    # specify an Electron with any keyboard layout
+    uef.minor = 6
+    uef.target_machine = "Electron"
     
     # Specify tape chunks
     
-    chunk(uef, 0x110, number(2,0x05dc))
-    chunk(uef, 0x100, number(1,0xdc))
+    uef.chunks.append((0x110, uef.number(2,0x05dc)))
+    uef.chunks.append((0x100, uef.number(1,0xdc)))
     
     
     # Read the index
@@ -394,80 +171,42 @@ if __name__ == "__main__":
         if real_name[:2] == "$.":
             real_name = real_name[2:]
     
-        details = []
-        try:
-            details = string.split(open(in_dir + os.sep + file_name + suffix + "inf", "r").readline())
-        except IOError:
+        if inf_details.has_key(file_name):
+            info = inf_details[file_name]
+        else:
             try:
-                details = string.split(open(in_dir + os.sep + file_name + suffix + "INF", "r").readline())
-            except IOError:
-                sys.stderr.write("Couldn't find file,\n", file_name+suffix+"inf", "or", file_name+suffix+"INF")
+                info = INFfile.read(in_dir + os.sep + file_name)
+            except INFfile.INFfile_error:
+                sys.stderr.write("Problem with file: %s\n" % (in_dir + os.sep + file_name))
+                sys.stderr.write("Information file may be missing or incorrect.\n")
+                continue
     
-        if details != []:
-            try:
-                in_file = open(in_dir + os.sep + file_name, "rb")
-                in_file.seek(0, 2)
-                length = in_file.tell()
-                in_file.seek(0, 0)
-    
-                if string.find(details[0], ".") != -1:
-                    load, exe = details[1], details[2]
-                else:
-                    load, exe = details[0], details[1]
-    
-    #            if (details[0] == file_name) | (details[0] == "$."+file_name):
-    #                load, exe = details[1], details[2]
-    #            else:
-    #                load, exe = details[0], details[1]
-        
-                try:
-                    load = hex2num(load)
-                    exe = hex2num(exe)
-                except:
-                    sys.stderr.write("Problem with file: %s\n" % (in_dir + os.sep + file_name))
-                    sys.stderr.write("Information file may be incorrect.\n")
-                    sys.exit(1)
-        
-                # Reset the block number to zero
-                n = 0
-        
-                # Long gap
-                gap = 1
-            
-                # Write block details
-                while 1:
-                    block, last = read_block(in_file, real_name, load, exe, length, n)
-            
-                    if gap == 1:
-                        chunk(uef, 0x110, number(2,0x05dc))
-                        gap = 0
-                    else:
-                        chunk(uef, 0x110, number(2,0x0258))
-    
-                    # Write the block to the UEF file
-                    chunk(uef, 0x100, block)
-        
-                    if last == 1:
-                        break
-        
-                    # Increment the block number
-                    n = n + 1
-        
-                # Close the file
-                in_file.close()
-        
-            except IOError:
-                sys.stderr.write("Couldn't find file,\n", file_name)
+        try:
+            data = read_data(in_dir + os.sep + file_name)
+        except (IOError, EnvironmentError):
+            sys.stderr.write("Couldn't find file, %s\n" % file_name)
+            continue
+    
+        # Encode the file's blocks
+        uef.chunks += uef.create_chunks(real_name, info.load_address,
+                                        info.execution_address, data)
     
+        if data:
+            data.close()
     
     
     # Write some finishing bytes to the file
-    chunk(uef, 0x110, number(2,0x0258))
-    chunk(uef, 0x112, number(2,0x0258))
+    uef.chunks.append((0x110, uef.number(2,0x0258)))
+    uef.chunks.append((0x112, uef.number(2,0x0258)))
     
     
-    # Close the UEF file
-    uef.close()
+    # Write the UEF file, compressing it if required
+    try:
+        uef.write(uef_file, write_emulator_info = False,
+                  compress = (compress == 1))
+    except UEFfile.UEFfile_error:
+        sys.stderr.write("Couldn't open the UEF file, %s\n" % uef_file)
+        sys.exit(1)
     
     # Exit
     sys.exit()
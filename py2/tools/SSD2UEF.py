@@ -18,19 +18,246 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 __author__ = "David Boddie <david@boddie.org.uk>"
-__date__ = "2016-12-12"
-__version__ = "0.2"
+__date__ = "2026-10-19"
+__version__ = "0.3"
 __license__ = "GNU General Public License (version 3 or later)"
 
-import sys
-from tools import makedfs, UEFfile
+import os, sys, tempfile
+import diskutils, makedfs, UEFfile
+
+
+def read_catalogue(ssd_file):
+
+    """Returns the title and list of files in the catalogue of the disk image
+    with the given file name, which may be compressed, using the suffix of
+    the uncompressed image's name to determine whether the image is single
+    or double-sided."""
+    
+    f = diskutils.open_image(ssd_file)
+    try:
+        # Treat images with unrecognised suffixes as single-sided.
+        image = diskutils.image_type(f.name)
+        if image is not None and image[0] == "dfs":
+            disk = makedfs.Disk(image[1])
+        else:
+            disk = makedfs.Disk("ssd80")
+        disk.open(f)
+        return disk.catalogue().read()
+    finally:
+        f.close()
+
+
+def select_files(disk_files, names = None):
+
+    """Returns a list of (name, load, exec, data) tuples for the files with
+    the given names, or all the files if names is None, suitable for passing
+    to UEFfile.import_files. Names are compared without regard to case.
+    Raises KeyError if a name is not found."""
+    
+    if names is None:
+        names = []
+        for file in disk_files:
+            names.append(file.name)
+    
+    index = diskutils.Index(disk_files)
+    
+    files = []
+    for name in names:
+        # Names without a directory refer to files in the $ directory.
+        if name[1:2] == ".":
+            file = index.lookup(name)
+        else:
+            file = index.lookup("$." + name)
+        if file is None:
+            raise KeyError(name)
+        
+        # Use the name stored in the catalogue rather than the one given,
+        # leaving out the directory for files in the $ directory.
+        name = file.name
+        if name.startswith("$."):
+            name = name[2:]
+        info = (name, file.load_address, file.execution_address, file.data)
+        files.append(info)
+    
+    return files
+
+
+def write_uef(files, uef_file):
+
+    """Writes a UEF file containing the given files. The file is written to a
+    temporary file in the same directory and renamed when complete, so that
+    the UEF file is never left partially written. The file's permissions are
+    set using the umask, as for files created in the usual way."""
+    
+    u = UEFfile.UEFfile(creator = "SSD2UEF.py " + __version__)
+    u.minor = 6
+    u.target_machine = "Electron"
+    u.import_files(0, files, gap = True)
+    
+    directory = os.path.dirname(os.path.abspath(uef_file))
+    handle, temp_file = tempfile.mkstemp(".uef", ".SSD2UEF-", directory)
+    os.close(handle)
+    
+    try:
+        u.write(temp_file, write_emulator_info = False)
+        
+        # Temporary files are only accessible by their owners, so apply the
+        # permissions that a new file would have been given.
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(temp_file, 0666 & ~umask)
+        
+        # Replacing an existing file with rename is not possible on all
+        # platforms.
+        if sys.platform == "win32" and os.path.exists(uef_file):
+            os.remove(uef_file)
+        
+        os.rename(temp_file, uef_file)
+    except:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+
+
+def convert(ssd_file, uef_file, names = None):
+
+    """Converts the disk image with the given file name to a UEF file,
+    including only the files with the given names if names is not None."""
+    
+    title, disk_files = read_catalogue(ssd_file)
+    write_uef(select_files(disk_files, names), uef_file)
+
+
+def _convert_task(task):
+
+    # Convert an image in a worker process, returning any error as a message
+    # so that one bad image does not stop the whole batch.
+    ssd_file, uef_file = task
+    
+    try:
+        convert(ssd_file, uef_file)
+    except Exception, e:
+        return ssd_file, uef_file, "%s: %s" % (e.__class__.__name__, e)
+    
+    return ssd_file, uef_file, None
+
+
+def find_images(paths):
+
+    """Returns a list of the disk images given by paths, expanding any
+    directories to the images with recognised suffixes that they contain,
+    including compressed images."""
+    
+    images = []
+    
+    for path in paths:
+    
+        if os.path.isdir(path):
+            names = os.listdir(path)
+            names.sort()
+            for name in names:
+                image = diskutils.image_type(name)
+                if image is not None and image[0] == "dfs":
+                    images.append(os.path.join(path, name))
+        else:
+            images.append(path)
+    
+    return images
+
+
+def convert_batch(images, output_dir, jobs = None):
+
+    """Converts each of the disk images to a UEF file in the output directory
+    with the same base name, using a pool of jobs worker processes, or one per
+    processor if jobs is None. Yields an (image, UEF file, error) tuple for
+    each image as it is completed, where error is None if successful.
+    
+    If images have the same base name, a number is added to the names of the
+    UEF files for the second and later images, such as GAME-2.uef, so that
+    each image has its own UEF file. Names are compared without regard to
+    case."""
+    
+    tasks = []
+    used = set()
+    
+    for ssd_file in images:
+        stem = os.path.splitext(os.path.basename(diskutils.uncompressed_name(ssd_file)))[0]
+        
+        name = stem
+        n = 2
+        while name.lower() in used:
+            name = "%s-%i" % (stem, n)
+            n += 1
+        
+        used.add(name.lower())
+        tasks.append((ssd_file, os.path.join(output_dir, name + ".uef")))
+    
+    if jobs == 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield _convert_task(task)
+        return
+    
+    from multiprocessing import Pool
+    
+    pool = Pool(jobs)
+    try:
+        for result in pool.imap_unordered(_convert_task, tasks):
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def batch_main(args):
+
+    jobs = None
+    
+    if args[:1] == ["-j"]:
+        try:
+            jobs = int(args[1])
+        except (IndexError, ValueError):
+            usage()
+        args = args[2:]
+    
+    if len(args) < 2:
+        usage()
+    
+    output_dir = args[0]
+    if not os.path.isdir(output_dir):
+        sys.stderr.write("Output directory not found: %s\n" % output_dir)
+        sys.exit(1)
+    
+    failed = 0
+    for ssd_file, uef_file, error in convert_batch(find_images(args[1:]),
+                                                   output_dir, jobs):
+        if error is None:
+            print ssd_file, "->", uef_file
+        else:
+            sys.stderr.write("Failed to convert %s (%s)\n" % (ssd_file, error))
+            failed += 1
+    
+    if failed:
+        sys.exit(1)
+    
+    sys.exit()
+
+
+def usage():
+
+    sys.stderr.write("Usage: %s <ssd file> <uef file> [file0,...]\n" % sys.argv[0])
+    sys.stderr.write("Usage: %s -l <ssd file>\n" % sys.argv[0])
+    sys.stderr.write("Usage: %s -b [-j <jobs>] <output directory> <ssd file or directory> ...\n" % sys.argv[0])
+    sys.exit(1)
+
 
 if __name__ == "__main__":
 
+    if sys.argv[1:2] == ["-b"]:
+        batch_main(sys.argv[2:])
+    
     if not 3 <= len(sys.argv) <= 4:
-        sys.stderr.write("Usage: %s <ssd file> <uef file> [file0,...]\n" % sys.argv[0])
-        sys.stderr.write("Usage: %s -l <ssd file>\n" % sys.argv[0])
-        sys.exit(1)
+        usage()
     
     if sys.argv[1] == "-l":
         print_catalogue = True
@@ -40,11 +267,7 @@ if __name__ == "__main__":
         ssd_file = sys.argv[1]
         uef_file = sys.argv[2]
     
-    cat = makedfs.Catalogue(open(ssd_file))
-    if ssd_file.endswith(".dsd"):
-        cat.interleaved = True
-    
-    title, disk_files = cat.read()
+    title, disk_files = read_catalogue(ssd_file)
     
     if print_catalogue:
         max_length = 0
@@ -62,31 +285,13 @@ if __name__ == "__main__":
     if len(sys.argv) == 4:
         names = sys.argv[3].split(",")
     else:
-        names = []
-        for file in disk_files:
-            names.append(file.name)
-    
-    index = {}
-    for file in disk_files:
-        index[file.name] = file
+        names = None
     
-    files = []
-    for name in names:
-        try:
-            file = index[name]
-        except KeyError:
-            sys.stderr.write("File '%s' not found in the disk catalogue.\n" % name)
-            sys.exit(1)
-        
-        if "$." in name:
-            name = name.split(".")[-1]
-        info = (name, file.load_address, file.execution_address, file.data)
-        files.append(info)
-    
-    u = UEFfile.UEFfile(creator = "SSD2UEF.py " + __version__)
-    u.minor = 6
-    u.target_machine = "Electron"
-    u.import_files(0, files, gap = True)
+    try:
+        files = select_files(disk_files, names)
+    except KeyError, e:
+        sys.stderr.write("File '%s' not found in the disk catalogue.\n" % e.args[0])
+        sys.exit(1)
     
-    u.write(uef_file, write_emulator_info = False)
+    write_uef(files, uef_file)
     sys.exit()
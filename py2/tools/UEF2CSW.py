@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+"""
+UEF2CSW.py - Convert UEF files to CSW files.
+
+Copyright (C) 2026 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "David Boddie <david@boddie.org.uk>"
+__date__ = "2026-10-19"
+__version__ = "0.1"
+__license__ = "GNU General Public License (version 3 or later)"
+
+import sys
+import CSWfile, UEFfile
+
+
+def usage():
+
+    sys.stderr.write("Usage: %s [-r <sample rate>] [-1 | -u] <UEF file> <CSW file>\n\n" % sys.argv[0])
+    sys.stderr.write("Converts the tape in the UEF file to a CSW file. The sample rate defaults to\n")
+    sys.stderr.write("44100 Hz. Version 2 files compressed with zlib are written unless the -1\n")
+    sys.stderr.write("option is given to write a version 1 file or the -u option is given to write\n")
+    sys.stderr.write("an uncompressed version 2 file.\n")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+
+    args = sys.argv[1:]
+    csw = CSWfile.CSWfile(creator = "UEF2CSW " + __version__)
+    
+    while args[:1] and args[0].startswith("-"):
+    
+        if args[0] == "-r":
+            try:
+                csw.sample_rate = int(args[1])
+            except (IndexError, ValueError):
+                usage()
+            args = args[2:]
+        elif args[0] == "-1":
+            csw.major = 1
+            csw.minor = 1
+            csw.compression = CSWfile.RLE
+            args = args[1:]
+        elif args[0] == "-u":
+            csw.compression = CSWfile.RLE
+            args = args[1:]
+        else:
+            usage()
+    
+    if len(args) != 2:
+        usage()
+    
+    uef_file, csw_file = args
+    
+    try:
+        in_f, minor, major = UEFfile.open_stream(uef_file)
+    except UEFfile.UEFfile_error, e:
+        sys.stderr.write(str(e) + "\n")
+        sys.exit(1)
+    
+    # Read and convert the chunks one at a time so that long tapes do not
+    # need to be held in memory.
+    try:
+        csw.write_chunks(csw_file, UEFfile.read_chunks(in_f), minor, major)
+    except (CSWfile.CSWfile_error, UEFfile.UEFfile_error), e:
+        sys.stderr.write(str(e) + "\n")
+        sys.exit(1)
+    finally:
+        in_f.close()
+    
+    sys.exit()
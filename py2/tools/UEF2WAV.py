@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+
+"""
+UEF2WAV.py - Convert UEF files to WAV files for loading on real machines.
+
+Copyright (C) 2026 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "David Boddie <david@boddie.org.uk>"
+__date__ = "2026-10-19"
+__version__ = "0.1"
+__license__ = "GNU General Public License (version 3 or later)"
+
+import sys
+import UEFaudio, UEFfile
+
+
+def usage():
+
+    sys.stderr.write("Usage: %s [-r <sample rate>] [-8] [-s] <UEF file> <WAV file>\n\n" % sys.argv[0])
+    sys.stderr.write("Converts the tape in the UEF file to audio in a WAV file. The sample rate\n")
+    sys.stderr.write("defaults to 44100 Hz. The -8 option writes 8-bit samples instead of 16-bit\n")
+    sys.stderr.write("samples and the -s option writes square waves instead of sine waves.\n")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+
+    args = sys.argv[1:]
+    sample_rate = 44100
+    sample_width = 2
+    square = False
+    
+    while args[:1] and args[0].startswith("-"):
+    
+        if args[0] == "-r":
+            try:
+                sample_rate = int(args[1])
+            except (IndexError, ValueError):
+                usage()
+            args = args[2:]
+        elif args[0] == "-8":
+            sample_width = 1
+            args = args[1:]
+        elif args[0] == "-s":
+            square = True
+            args = args[1:]
+        else:
+            usage()
+    
+    if len(args) != 2:
+        usage()
+    
+    uef_file, wav_file = args
+    
+    try:
+        in_f, minor, major = UEFfile.open_stream(uef_file)
+    except UEFfile.UEFfile_error, e:
+        sys.stderr.write(str(e) + "\n")
+        sys.exit(1)
+    
+    # Read and convert the chunks one at a time so that long tapes do not
+    # need to be held in memory.
+    renderer = UEFaudio.Renderer(sample_rate, sample_width, square = square)
+    renderer.minor = minor
+    renderer.major = major
+    
+    try:
+        renderer.write(UEFfile.read_chunks(in_f), wav_file)
+    except UEFfile.UEFfile_error, e:
+        sys.stderr.write(str(e) + "\n")
+        sys.exit(1)
+    finally:
+        in_f.close()
+    
+    sys.exit()
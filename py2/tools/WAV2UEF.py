@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+"""
+WAV2UEF.py - Convert recordings of tapes in WAV files to UEF files.
+
+Copyright (C) 2026 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "David Boddie <david@boddie.org.uk>"
+__date__ = "2026-10-19"
+__version__ = "0.1"
+__license__ = "GNU General Public License (version 3 or later)"
+
+import sys, wave
+import UEFaudio, UEFfile
+
+
+def usage():
+
+    sys.stderr.write("Usage: %s [-t <threshold>] <WAV file> <UEF file>\n\n" % sys.argv[0])
+    sys.stderr.write("Decodes the tape signal recorded in the WAV file and writes the data found to\n")
+    sys.stderr.write("the UEF file. The threshold is the fraction of the largest sample value that\n")
+    sys.stderr.write("the signal must exceed to be detected, and defaults to 0.02. NumPy is required.\n")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+
+    args = sys.argv[1:]
+    threshold = 0.02
+    
+    if args[:1] == ["-t"]:
+        try:
+            threshold = float(args[1])
+        except (IndexError, ValueError):
+            usage()
+        args = args[2:]
+    
+    if len(args) != 2:
+        usage()
+    
+    wav_file, uef_file = args
+    
+    try:
+        decoder = UEFaudio.read_wav(wav_file, threshold)
+    except (UEFaudio.UEFaudio_error, wave.Error, EOFError), e:
+        sys.stderr.write(str(e) + "\n")
+        sys.exit(1)
+    except IOError:
+        sys.stderr.write("Failed to read the WAV file: %s\n" % wav_file)
+        sys.exit(1)
+    
+    uef = UEFaudio.to_uef(decoder.chunks, "WAV2UEF " + __version__)
+    
+    try:
+        uef.write(uef_file, write_emulator_info = False)
+    except UEFfile.UEFfile_error, e:
+        sys.stderr.write(str(e) + "\n")
+        sys.exit(1)
+    
+    for message in decoder.errors:
+        print message
+    
+    print "%i blocks found, %i with errors." % (decoder.blocks, decoder.bad_blocks)
+    if decoder.framing_errors:
+        print "%i framing errors." % decoder.framing_errors
+    
+    if decoder.bad_blocks:
+        sys.exit(1)
+    
+    sys.exit()
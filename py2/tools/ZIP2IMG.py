@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+"""
+ZIP2IMG.py - Create disc and tape images from zip and tar files.
+
+Copyright (C) 2026 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "David Boddie <david@boddie.org.uk>"
+__date__ = "2026-10-19"
+__version__ = "0.1"
+__license__ = "GNU General Public License (version 3 or later)"
+
+import os, StringIO, sys
+import archives, UEFfile
+from diskutils import DiskError, image_suffixes
+
+
+def usage():
+
+    sys.stderr.write("Usage: %s [-t <title>] <archive file> <image file>\n\n" % sys.argv[0])
+    sys.stderr.write("Creates a DFS disk image or UEF file containing the files in a zip or tar\n")
+    sys.stderr.write("archive. If the archive file is -, the archive is read from standard input.\n")
+    sys.stderr.write("The type of image is chosen using the suffix of the image file.\n\n")
+    sys.stderr.write("Load and execution addresses are read from .inf members, RISC OS extra\n")
+    sys.stderr.write("fields and ,xxx filetype suffixes. The title is used for disk images.\n")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+
+    args = sys.argv[1:]
+    title = ""
+    
+    if args[:1] == ["-t"]:
+        if len(args) < 2:
+            usage()
+        title = args[1]
+        args = args[2:]
+    
+    if len(args) != 2:
+        usage()
+    
+    archive_file, image_file = args
+    suffix = os.path.splitext(image_file)[1].lower()
+    
+    # Compressed and ADFS images cannot be written.
+    fs, format = image_suffixes.get(suffix, (None, None))
+    
+    if fs not in ("dfs", "uef"):
+        sys.stderr.write("Unsupported image type: %s\n" % suffix)
+        sys.exit(1)
+    
+    try:
+        # The members of zip files can only be found by seeking, so read
+        # standard input into memory.
+        if archive_file == "-":
+            in_f = StringIO.StringIO(sys.stdin.read())
+        else:
+            in_f = open(archive_file, "rb")
+        
+        try:
+            members = archives.read_members(in_f)
+        finally:
+            in_f.close()
+        
+        if fs == "uef":
+            uef = archives.to_uef(members)
+            uef.creator = "ZIP2IMG " + __version__
+            uef.write(image_file, write_emulator_info = False)
+        else:
+            disk = archives.to_dfs(members, format, title)
+            open(image_file, "wb").write(disk.file.read())
+    
+    except (archives.ArchiveError, DiskError, UEFfile.UEFfile_error), e:
+        sys.stderr.write(str(e) + "\n")
+        sys.exit(1)
+    except IOError, e:
+        sys.stderr.write("%s\n" % e)
+        sys.exit(1)
+    
+    print "%i files written to %s" % (len(members), image_file)
+    sys.exit()
@@ -15,7 +15,7 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-import struct, time
+import bisect, bz2, io, os, re, struct, threading, time, zipfile, zlib
 
 # Find the number of centiseconds between 1900 and 1970.
 between_epochs = ((365 * 70) + 17) * 24 * 360000
@@ -217,3 +217,890 @@ class File:
             return time.localtime(centiseconds / 100.0)
         except ValueError:
             return ()
+
+
+class Geometry:
+
+    """geometry = Geometry(tracks, sectors_per_track, sector_size, sides = 1,
+                           interleaved = False)
+    
+    Describes the layout of a disk image with the given number of tracks on
+    each side. If interleaved is True, the tracks of the sides are stored
+    alternately in the image (side 0 track 0, side 1 track 0, side 0 track 1,
+    and so on); otherwise each side is stored after the previous one.
+    
+    For each side, a table containing the offset into the image of each
+    logical sector is created when first needed. Logical sectors run from the
+    first track of the side to its last track, then continue onto the
+    following sides.
+    """
+    
+    def __init__(self, tracks, sectors_per_track, sector_size, sides = 1,
+                       interleaved = False):
+    
+        self.tracks = tracks
+        self.sectors_per_track = sectors_per_track
+        self.sector_size = sector_size
+        self.sides = sides
+        self.interleaved = interleaved
+        
+        self.track_size = sectors_per_track * sector_size
+        self.side_size = tracks * self.track_size
+        self.size = self.side_size * sides
+        self.sectors = tracks * sectors_per_track * sides
+        
+        self._tables = {}
+    
+    def table(self, side = 0):
+    
+        """Returns a list containing the offset into the image of each logical
+        sector, starting at the first sector of the given side."""
+        
+        try:
+            return self._tables[side]
+        except KeyError:
+            pass
+        
+        table = []
+        
+        for i in range(self.sides):
+        
+            s = (side + i) % self.sides
+            
+            for track in range(self.tracks):
+            
+                if self.interleaved:
+                    addr = ((track * self.sides) + s) * self.track_size
+                else:
+                    addr = (s * self.side_size) + (track * self.track_size)
+                
+                table += list(range(addr, addr + self.track_size, self.sector_size))
+        
+        self._tables[side] = table
+        return table
+    
+    def address(self, sector, side = 0):
+    
+        """Returns the offset into the image of the given logical sector."""
+        
+        return self.table(side)[sector]
+    
+    def runs(self, sector, length, side = 0, offset = 0):
+    
+        """Returns a list of (address, length) pairs describing the contiguous
+        runs of bytes in the image that hold length bytes of data, starting at
+        the given offset into the logical sector specified."""
+        
+        if not self.interleaved and side == 0:
+            return [((sector * self.sector_size) + offset, length)]
+        
+        table = self.table(side)
+        runs = []
+        
+        while length > 0 and sector < len(table):
+        
+            start = table[sector] + offset
+            end = table[sector] + self.sector_size
+            sector += 1
+            offset = 0
+            
+            # Extend the run while the following sectors are adjacent in the
+            # image.
+            while end - start < length and sector < len(table) and \
+                  table[sector] == end:
+                
+                end += self.sector_size
+                sector += 1
+            
+            amount = min(end - start, length)
+            runs.append((start, amount))
+            length -= amount
+        
+        return runs
+    
+    def read(self, file, sector, length, side = 0, offset = 0):
+    
+        """Reads length bytes from the image in the given file object, starting
+        at the given offset into the logical sector specified.
+        
+        Where possible, each run of contiguous sectors is read into a single
+        preallocated buffer using a vectored read."""
+        
+        runs = self.runs(sector, length, side, offset)
+        fd = self._fileno(file)
+        
+        if fd is None:
+        
+            pieces = []
+            
+            for address, amount in runs:
+            
+                file.seek(address, 0)
+                pieces.append(file.read(amount))
+            
+            return b"".join(pieces)
+        
+        data = bytearray(sum(amount for address, amount in runs))
+        view = memoryview(data)
+        p = 0
+        
+        for address, amount in runs:
+        
+            read = os.preadv(fd, [view[p:p + amount]], address)
+            p += read
+            
+            if read < amount:
+                break
+        
+        view.release()
+        del data[p:]
+        return bytes(data)
+    
+    def _fileno(self, file):
+    
+        # Only use vectored reads for files that are backed by a file
+        # descriptor, ensuring that any buffered writes are visible.
+        if not hasattr(os, "preadv"):
+            return None
+        
+        try:
+            fd = file.fileno()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            return None
+        
+        file.flush()
+        return fd
+    
+    def write(self, file, sector, data, side = 0, offset = 0):
+    
+        """Writes the data to the image in the given file object, starting at
+        the given offset into the logical sector specified."""
+        
+        p = 0
+        
+        for address, amount in self.runs(sector, len(data), side, offset):
+        
+            file.seek(address, 0)
+            file.write(data[p:p + amount])
+            p += amount
+
+
+class SectorView:
+
+    """view = SectorView(data, geometry, side = 0)
+    
+    Presents the contents of a disk image, held in the data bytes, as a
+    sequence of bytes in logical sector order. Indices and slices are
+    translated using the geometry's sector table so that the sectors of
+    interleaved images do not need to be rearranged in memory.
+    """
+    
+    def __init__(self, data, geometry, side = 0):
+    
+        self.data = data
+        self.geometry = geometry
+        self.side = side
+        self.table = geometry.table(side)
+        self.sector_size = geometry.sector_size
+    
+    def __len__(self):
+    
+        return len(self.table) * self.sector_size
+    
+    def __getitem__(self, index):
+    
+        if isinstance(index, slice):
+        
+            start, stop, step = index.indices(len(self))
+            
+            if step != 1:
+                return bytes(map(self.__getitem__, range(start, stop, step)))
+            elif stop <= start:
+                return b""
+            
+            sector, offset = divmod(start, self.sector_size)
+            pieces = []
+            
+            for address, amount in self.geometry.runs(
+                sector, stop - start, self.side, offset):
+            
+                pieces.append(self.data[address:address + amount])
+            
+            return b"".join(pieces)
+        
+        if index < 0:
+            index += len(self)
+        
+        sector, offset = divmod(index, self.sector_size)
+        return self.data[self.table[sector] + offset]
+
+
+class FreeSpace:
+
+    """free = FreeSpace(extents = ())
+    
+    Records the free areas of a disk as a sorted list of extents, each given
+    by its start and end addresses, so that space can be allocated and
+    released quickly. Adjacent extents are merged as they are added, so the
+    list always contains the fewest extents that describe the free space. The
+    addresses can be in any units, such as bytes or sectors.
+    
+    The extents passed when the object is created may be in any order, but
+    must not overlap.
+    """
+    
+    def __init__(self, extents = ()):
+    
+        self._starts = []
+        self._ends = []
+        
+        for start, end in extents:
+            self.release(start, end - start)
+    
+    def __len__(self):
+    
+        return len(self._starts)
+    
+    def __repr__(self):
+    
+        return "<%s instance, %i extents, at %x>" % (self.__class__, len(self), id(self))
+    
+    def extents(self):
+    
+        """Returns a list of (start, end) tuples for the free extents in
+        order of their addresses."""
+        
+        return list(zip(self._starts, self._ends))
+    
+    def total(self):
+    
+        """Returns the total amount of free space."""
+        
+        return sum(self._ends) - sum(self._starts)
+    
+    def largest(self):
+    
+        """Returns the length of the largest free extent, or zero if there is
+        no free space."""
+        
+        if not self._starts:
+            return 0
+        
+        return max(end - start for start, end in zip(self._starts, self._ends))
+    
+    def is_free(self, start, length):
+    
+        """Returns True if the area of the given length at the start address
+        lies entirely within free space."""
+        
+        i = bisect.bisect_right(self._starts, start) - 1
+        return i >= 0 and start + length <= self._ends[i]
+    
+    def allocate(self, length, best_fit = False, limits = None):
+    
+        """Allocates an area of the given length, returning its start address
+        or None if there is no extent large enough. The first extent that is
+        large enough is used unless best_fit is True, in which case the
+        smallest such extent is used. If limits is given as a (start, end)
+        tuple, the area must lie within those addresses."""
+        
+        if limits is None:
+            first, last = 0, len(self._starts)
+            low, high = None, None
+        else:
+            low, high = limits
+            first = max(bisect.bisect_right(self._starts, low) - 1, 0)
+            last = bisect.bisect_left(self._starts, high)
+        
+        found = None
+        found_length = None
+        
+        for i in range(first, last):
+        
+            start, end = self._starts[i], self._ends[i]
+            if low is not None:
+                start, end = max(start, low), min(end, high)
+            
+            if end - start < length:
+                continue
+            
+            if not best_fit:
+                found = start
+                break
+            
+            if found is None or end - start < found_length:
+                found, found_length = start, end - start
+        
+        if found is not None:
+            self.claim(found, length)
+        
+        return found
+    
+    def claim(self, start, length):
+    
+        """Marks the area of the given length at the start address as used.
+        A DiskError is raised if the area is not entirely free."""
+        
+        if length <= 0:
+            return
+        
+        i = bisect.bisect_right(self._starts, start) - 1
+        
+        if i < 0 or start + length > self._ends[i]:
+            raise DiskError("Area at %x with length %x is not free." % (start, length))
+        
+        end = self._ends[i]
+        
+        # Shorten or remove the extent containing the area, adding a new one
+        # for any space after it.
+        if start == self._starts[i]:
+            if start + length == end:
+                del self._starts[i]
+                del self._ends[i]
+            else:
+                self._starts[i] = start + length
+        else:
+            self._ends[i] = start
+            if start + length < end:
+                self._starts.insert(i + 1, start + length)
+                self._ends.insert(i + 1, end)
+    
+    def release(self, start, length):
+    
+        """Marks the area of the given length at the start address as free,
+        merging it with any adjacent free extents. A DiskError is raised if
+        any part of the area is already free."""
+        
+        if length <= 0:
+            return
+        
+        end = start + length
+        i = bisect.bisect_right(self._starts, start)
+        
+        if (i > 0 and self._ends[i - 1] > start) or \
+           (i < len(self._starts) and self._starts[i] < end):
+            raise DiskError("Area at %x with length %x is already free." % (start, length))
+        
+        before = i > 0 and self._ends[i - 1] == start
+        after = i < len(self._starts) and self._starts[i] == end
+        
+        if before and after:
+            self._ends[i - 1] = self._ends[i]
+            del self._starts[i]
+            del self._ends[i]
+        elif before:
+            self._ends[i - 1] = end
+        elif after:
+            self._starts[i] = start
+        else:
+            self._starts.insert(i, start)
+            self._ends.insert(i, end)
+
+
+# Geometries of common Acorn disk formats, given as the number of tracks on
+# each side, sectors per track, sector size, number of sides and whether the
+# sides are interleaved.
+formats = {
+    "S": (40, 16, 256, 1, False),
+    "M": (80, 16, 256, 1, False),
+    "L": (80, 16, 256, 2, True),
+    "D": (80, 10, 1024, 1, False),
+    "E": (80, 10, 1024, 1, False),
+    "F": (80, 20, 1024, 1, False),
+    "SSD": (80, 10, 256, 1, False),
+    "DSD": (80, 10, 256, 2, True)
+    }
+
+def geometry(format):
+
+    """Returns a Geometry object for the named format in the formats
+    dictionary."""
+    
+    return Geometry(*formats[format])
+
+
+def _bytes(name):
+
+    # Names may be given as strings or bytes; disk images use bytes.
+    if isinstance(name, str):
+        return name.encode("latin1")
+    return name
+
+def acorn_upper(name):
+
+    """Returns the name with its lower case ASCII letters converted to upper
+    case, for comparing names in the way that Acorn filing systems do."""
+    
+    # The upper method of bytes objects only affects ASCII letters.
+    return _bytes(name).upper()
+
+
+def wildcard(pattern):
+
+    """Returns a function that returns a true value if the name passed to it
+    matches the pattern. In the pattern, * matches any sequence of characters
+    and # or ? matches any single character. Names are compared without
+    regard to case."""
+    
+    expr = []
+    for c in acorn_upper(pattern):
+        c = bytes([c])
+        if c == b"*":
+            expr.append(b".*")
+        elif c in b"#?":
+            expr.append(b".")
+        else:
+            expr.append(re.escape(c))
+    
+    match = re.compile(b"".join(expr) + br"\Z", re.DOTALL).match
+    return lambda name: match(acorn_upper(name))
+
+
+class Index:
+
+    """index = Index(files, names = None)
+    
+    Provides lookup of the objects in the files list by their names, which are
+    compared without regard to case. If more than one object has the same
+    name, the first is found. If a list of names is given, the objects are
+    found using the corresponding names in it instead of their own names.
+    """
+    
+    def __init__(self, files, names = None):
+    
+        self.files = files
+        self.names = {}
+        
+        if names is None:
+            names = [file.name for file in files]
+        
+        self._file_names = names
+        
+        for name, file in zip(names, files):
+            self.names.setdefault(acorn_upper(name), file)
+    
+    def lookup(self, name):
+    
+        """Returns the object with the given name, or None if there is no
+        such object."""
+        
+        return self.names.get(acorn_upper(name))
+    
+    def exists(self, name):
+    
+        """Returns True if an object with the given name exists."""
+        
+        return acorn_upper(name) in self.names
+    
+    def glob(self, pattern):
+    
+        """Returns a list of the objects with names that match the pattern,
+        in their original order."""
+        
+        matches = wildcard(pattern)
+        return [file for name, file in zip(self._file_names, self.files)
+                if matches(name)]
+
+
+# Formats of disc images, identified by their sizes in bytes. Single-sided
+# 80 track and double-sided 40 track DFS images have the same size, so the
+# suffix of the image's name is used to distinguish them. ADFS D and E
+# images are distinguished by ADFSlib.
+image_sizes = {
+    102400: ("dfs", "ssd40"),
+    163840: ("adfs", "S"),
+    204800: ("dfs", "ssd80"),
+    327680: ("adfs", "M"),
+    409600: ("dfs", "dsd80"),
+    655360: ("adfs", "L"),
+    819200: ("adfs", "D"),
+    1638400: ("adfs", "F")
+    }
+
+def image_format(size, name = None):
+
+    """Returns a (filing system, format) tuple describing a disc image of the
+    given size in bytes, or None if the size is not recognised. The filing
+    system is "adfs" or "dfs". The format is a key in the formats dictionary
+    for ADFS images or a makedfs format for DFS images. The name of the
+    image, if given, is used to resolve ambiguous sizes."""
+    
+    format = image_sizes.get(size)
+    
+    if format == ("dfs", "ssd80") and name is not None and \
+       os.path.splitext(name)[1].lower() == ".dsd":
+        return ("dfs", "dsd40")
+    
+    return format
+
+
+# Types of images, identified by the suffixes of their names. The format of
+# DFS images is a makedfs format. The formats of ADFS images are found by
+# ADFSlib when they are read.
+image_suffixes = {
+    ".adf": ("adfs", None),
+    ".adl": ("adfs", None),
+    ".adm": ("adfs", None),
+    ".ads": ("adfs", None),
+    ".add": ("adfs", None),
+    ".ssd": ("dfs", "ssd80"),
+    ".dsd": ("dfs", "dsd80"),
+    ".uef": ("uef", None)
+    }
+
+def image_type(name):
+
+    """Returns a (filing system, format) tuple describing the image with the
+    given name using its suffix, ignoring any compression suffix, or None if
+    the suffix is not recognised. The filing system is "adfs", "dfs" or
+    "uef". The format is a makedfs format for DFS images and None for other
+    images."""
+    
+    suffix = os.path.splitext(uncompressed_name(name))[1].lower()
+    return image_suffixes.get(suffix)
+
+
+class BufferPool:
+
+    """pool = BufferPool(limit = 4)
+    
+    Keeps up to limit buffers that are no longer used by ImageBuffer objects
+    so that they can be reused to hold the contents of other images instead
+    of allocating new ones. The pool can be shared between threads.
+    """
+    
+    def __init__(self, limit = 4):
+    
+        self.limit = limit
+        self._buffers = []
+        self._lock = threading.Lock()
+    
+    def acquire(self, size):
+    
+        """Returns a bytearray containing at least size bytes, reusing the
+        smallest suitable buffer in the pool if possible."""
+        
+        self._lock.acquire()
+        try:
+            best = None
+            for i in range(len(self._buffers)):
+                if len(self._buffers[i]) >= size and \
+                   (best is None or len(self._buffers[i]) < len(self._buffers[best])):
+                    best = i
+            
+            if best is not None:
+                return self._buffers.pop(best)
+        finally:
+            self._lock.release()
+        
+        return bytearray(size)
+    
+    def release(self, buffer):
+    
+        """Returns the buffer to the pool, discarding the smallest buffer if
+        the pool is full."""
+        
+        self._lock.acquire()
+        try:
+            self._buffers.append(buffer)
+            if len(self._buffers) > self.limit:
+                self._buffers.sort(key = len)
+                del self._buffers[0]
+        finally:
+            self._lock.release()
+
+
+# The pool used by open_image if no other pool is given
+buffer_pool = BufferPool()
+
+
+class ImageBuffer:
+
+    """buffer = ImageBuffer(data, length, name = None, pool = None)
+    
+    Provides a seekable file-like interface to the first length bytes of the
+    data bytearray, such as the decompressed contents of an image. The name
+    attribute holds the name of the image. When the buffer is closed, the
+    bytearray is returned to the pool, if given, so that the buffer must not
+    be used afterwards.
+    """
+    
+    def __init__(self, data, length, name = None, pool = None):
+    
+        self._data = data
+        self._length = length
+        self._pos = 0
+        self.name = name
+        self.pool = pool
+        self.closed = False
+    
+    def __len__(self):
+    
+        return self._length
+    
+    def read(self, size = -1):
+    
+        start = self._pos
+        
+        if size is None or size < 0:
+            end = self._length
+        else:
+            end = min(start + size, self._length)
+        
+        if end <= start:
+            return b""
+        
+        self._pos = end
+        return bytes(memoryview(self._data)[start:end])
+    
+    def seek(self, offset, whence = 0):
+    
+        if whence == 1:
+            offset += self._pos
+        elif whence == 2:
+            offset += self._length
+        
+        if offset < 0:
+            raise IOError("Invalid seek position: %i" % offset)
+        
+        self._pos = offset
+    
+    def tell(self):
+    
+        return self._pos
+    
+    def write(self, data):
+    
+        end = self._pos + len(data)
+        
+        if end > len(self._data):
+            self._data.extend(bytes(end - len(self._data)))
+        
+        self._data[self._pos:end] = data
+        self._pos = end
+        self._length = max(self._length, end)
+    
+    def flush(self):
+    
+        pass
+    
+    def getvalue(self):
+    
+        """Returns the contents of the buffer as bytes."""
+        
+        return bytes(memoryview(self._data)[:self._length])
+    
+    def close(self):
+    
+        if self.closed:
+            return
+        
+        self.closed = True
+        
+        if self.pool is not None:
+            self.pool.release(self._data)
+        
+        self._data = None
+
+
+# Suffixes of compressed files that open_image can read
+compression_suffixes = (".gz", ".bz2")
+
+# The largest amount of data that open_image decompresses from a file. This
+# is much larger than any floppy disc image but prevents damaged files from
+# exhausting memory.
+max_image_size = 16 * 1024 * 1024
+
+def uncompressed_name(name):
+
+    """Returns the name with any compression suffix removed, so that the
+    suffix of the uncompressed image can be examined."""
+    
+    for suffix in compression_suffixes:
+        if name.lower().endswith(suffix):
+            return name[:-len(suffix)]
+    
+    return name
+
+
+def _fill(pool, size, pieces):
+
+    # Copy the bytes produced by pieces into a buffer from the pool, which
+    # initially contains the expected size, returning the buffer and the
+    # number of bytes stored. The expected size is only a hint, so no more
+    # than the size of the largest disc image is allocated in advance. The
+    # buffer is returned to the pool if an exception occurs.
+    data = pool.acquire(min(size, max(image_sizes)))
+    length = 0
+    
+    try:
+        for piece in pieces:
+        
+            end = length + len(piece)
+            if end > max_image_size:
+                raise DiskError("The decompressed image is larger than %i bytes." % max_image_size)
+            
+            if end > len(data):
+                data.extend(bytes(max(end - len(data), len(data) // 2)))
+            
+            data[length:end] = piece
+            length = end
+    except:
+        pool.release(data)
+        raise
+    
+    return data, length
+
+
+def _gzip_pieces(f, block_size = 65536):
+
+    # Decompress all the members of a gzip file in blocks, producing no more
+    # than block_size bytes at a time.
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    data = f.read(block_size)
+    
+    while data:
+    
+        yield decompressor.decompress(data, block_size)
+        
+        if decompressor.unconsumed_tail:
+        
+            data = decompressor.unconsumed_tail
+        
+        elif decompressor.unused_data:
+        
+            # Another member follows unless the rest of the file is padding.
+            data = decompressor.unused_data
+            yield decompressor.flush()
+            
+            if not data.strip(b"\x00"):
+                return
+            
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        else:
+            data = f.read(block_size)
+    
+    yield decompressor.flush()
+
+
+def _bz2_pieces(f, block_size = 65536):
+
+    # Produce no more than block_size bytes at a time.
+    decompressor = bz2.BZ2Decompressor()
+    
+    while not decompressor.eof:
+    
+        if decompressor.needs_input:
+            data = f.read(block_size)
+            if not data:
+                break
+        else:
+            data = b""
+        
+        yield decompressor.decompress(data, block_size)
+
+
+def _zip_member(archive, member = None):
+
+    # Return the ZipInfo object for the named member or, if no member is
+    # given, the first member with the size of a disc image, or the first
+    # file in the archive.
+    infos = [info for info in archive.infolist() if not info.filename.endswith("/")]
+    
+    if member is not None:
+        for info in infos:
+            if info.filename == member:
+                return info
+        raise DiskError("No member called %s in the archive." % member)
+    
+    for info in infos:
+        if info.file_size in image_sizes:
+            return info
+    
+    if not infos:
+        raise DiskError("The archive contains no files.")
+    
+    return infos[0]
+
+
+def open_image(path, pool = None, member = None):
+
+    """Opens the disc image in the file with the given path for reading,
+    returning a seekable file object with a name attribute.
+    
+    If the file is compressed with gzip or bzip2, or is a zip archive, its
+    contents are decompressed into an ImageBuffer using a buffer from the
+    pool given, or the buffer_pool if no pool is given, and the name is
+    the file's path without its compression suffix. For zip archives, the
+    named member is read or, if no member is given, the first member with the
+    size of a disc image; the name is the name of the member. The buffer
+    should be closed when it is no longer needed so that it can be reused.
+    
+    Uncompressed files are returned as ordinary file objects. The format of
+    the image can be determined by passing its length and name to the
+    image_format function.
+    """
+    
+    if pool is None:
+        pool = buffer_pool
+    
+    f = open(path, "rb")
+    
+    try:
+        magic = f.read(4)
+        
+        if magic[:2] == b"\x1f\x8b":
+        
+            # The size of the uncompressed data, modulo 2**32, is stored at
+            # the end of the file.
+            f.seek(-4, 2)
+            size = struct.unpack("<I", f.read(4))[0]
+            f.seek(0, 0)
+            
+            try:
+                data, length = _fill(pool, size, _gzip_pieces(f))
+            except zlib.error as e:
+                raise DiskError("Failed to decompress %s: %s" % (path, e))
+            
+            name = uncompressed_name(path)
+        
+        elif magic[:3] == b"BZh":
+        
+            f.seek(0, 0)
+            
+            try:
+                data, length = _fill(pool, 819200, _bz2_pieces(f))
+            except (IOError, EOFError) as e:
+                raise DiskError("Failed to decompress %s: %s" % (path, e))
+            
+            name = uncompressed_name(path)
+        
+        elif magic == b"PK\x03\x04":
+        
+            f.seek(0, 0)
+            
+            try:
+                archive = zipfile.ZipFile(f)
+                info = _zip_member(archive, member)
+                member_f = archive.open(info)
+                try:
+                    data, length = _fill(pool, info.file_size,
+                                         iter(lambda: member_f.read(65536), b""))
+                finally:
+                    member_f.close()
+            except (zipfile.BadZipFile, zlib.error) as e:
+                raise DiskError("Failed to read %s: %s" % (path, e))
+            
+            name = info.filename
+        
+        else:
+            f.seek(0, 0)
+            return f
+    
+    except:
+        f.close()
+        raise
+    
+    f.close()
+    return ImageBuffer(data, length, name, pool)
+